@@ -0,0 +1,370 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from storage import storage_backend, write_json_atomic
+from log_setup import LOG_FILE
+from ledger import LEDGER_PATH, day_of
+# Analytics of shopping list: aggregates of app.log and the order ledger.
+#
+# files are read as streams of lines (memory doesn't depend on the size of
+# files) and folded into aggregates:
+#   app.log (text or JSON lines)   records per level and day, logins,
+#                                  failed logins, purchases, items added
+#                                  to carts, discount codes entered
+#   ledger segments (orders)       sold amount and revenue per product
+#                                  (and day), uses of discount codes
+# aggregates and the offset of every file are saved in a checkpoint, so
+# the next run only reads the new bytes. files are known by their inode,
+# so a rotated log (app.log -> app.log.1) continues from its offset.
+# several files are read in parallel by a process pool.
+
+CHECKPOINT_PATH = os.environ.get(
+    'SHOPPING_LIST_ANALYTICS', './json_files/analytics.json'
+    )
+
+# number of rows in the top lists of report
+TOP = 10
+
+# kinds of files
+LOG = 'log'
+ORDERS = 'orders'
+
+# text format of log_configuration.toml:
+# 2023-01-13 20:58:06,553 - 11140 - INFO - User babakzare logged in.
+TEXT_RECORD = re.compile(r'^(\d{4}-\d\d-\d\d) \S+ - \d+ - (\w+) - (.*)$')
+
+# events that are counted (name of group -> event). one pattern with a
+# group for every event, so a message is matched only once
+EVENTS = {
+    'login': 'logins',
+    'failed': 'failed logins',
+    'limited': 'limited logins',
+    'created': 'accounts created',
+    'purchase': 'purchases',
+    'canceled': 'canceled purchases',
+    'expired': 'expired holds',
+    'low': 'low stock warnings',
+}
+MESSAGE = re.compile(
+    r'(?P<login>User \S+ logged in\.)'
+    r'|(?P<failed>Incorrect Username/Pass combination)'
+    r'|(?P<limited>Too many login attempts of )'
+    r'|(?P<created>An account has been created\.)'
+    r'|(?P<expired>Hold of )'
+    r'|(?P<low>Stock of .+ is low: )'
+    r'|User: \S+ (?:'
+    r'(?P<purchase>Finished the buy\.)'
+    r'|(?P<canceled>Canceled the buy\.)'
+    r'|Added (?P<amount>\d+) (?P<item>.+) to the cart\.$'
+    r"|Entered discount code:'(?P<code>.*)'$)"
+    )
+
+
+class Aggregates:
+    """
+    Counters of analytics. every counter can be merged with the counter of
+    another run (parallel files, checkpoint).
+    """
+
+    # counters: name -> key
+    COUNTERS = (
+        'levels',           # level -> records
+        'records_by_day',   # day -> records
+        'warnings_by_day',  # day -> WARNING / ERROR / CRITICAL records
+        'events',           # event -> times
+        'added',            # product -> amount added to carts
+        'codes_entered',    # discount code -> times entered
+        'sold',             # product -> amount sold
+        'revenue',          # product -> tomans
+        'codes_used',       # discount code -> orders
+    )
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, Counter())
+        # day -> product -> amount sold
+        self.sold_by_day = dict()
+
+    def merge(self, other: 'Aggregates'):
+        """add the counters of other aggregates."""
+        for name in self.COUNTERS:
+            getattr(self, name).update(getattr(other, name))
+        for day, sold in other.sold_by_day.items():
+            self.sold_by_day.setdefault(day, Counter()).update(sold)
+
+    def to_dict(self) -> dict:
+        document = {name: dict(getattr(self, name)) for name in self.COUNTERS}
+        document['sold_by_day'] = {
+            day: dict(sold) for day, sold in self.sold_by_day.items()
+        }
+        return document
+
+    @classmethod
+    def from_dict(cls, document: dict) -> 'Aggregates':
+        aggregates = cls()
+        for name in cls.COUNTERS:
+            getattr(aggregates, name).update(document.get(name, {}))
+        for day, sold in document.get('sold_by_day', {}).items():
+            aggregates.sold_by_day[day] = Counter(sold)
+        return aggregates
+
+    def add_log_record(self, day: str, level: str, message: str):
+        """count one record of app.log."""
+        self.levels[level] += 1
+        self.records_by_day[day] += 1
+        if level in ('WARNING', 'ERROR', 'CRITICAL'):
+            self.warnings_by_day[day] += 1
+        found = MESSAGE.match(message)
+        if found is None:
+            return
+        event = found.lastgroup
+        if event in EVENTS:
+            self.events[EVENTS[event]] += 1
+        elif event == 'item':
+            self.added[found.group('item')] += int(found.group('amount'))
+        elif event == 'code':
+            self.codes_entered[found.group('code')] += 1
+
+    def add_order(self, order: dict):
+        """count one order of the ledger."""
+        self.events['orders'] += 1
+        sold = self.sold_by_day.setdefault(day_of(order['time']), Counter())
+        for line in order['lines']:
+            self.sold[line['item']] += line['amount']
+            self.revenue[line['item']] += line['amount'] * line['price']
+            sold[line['item']] += line['amount']
+        if order['code']:
+            self.codes_used[order['code']] += 1
+
+
+def parse_log_line(line: str):
+    """(day, level, message) of a line of app.log (text or JSON), or None."""
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+            return record['time'][:10], record['level'], record['message']
+        except (ValueError, KeyError, TypeError):
+            return None
+    found = TEXT_RECORD.match(line)
+    return found.groups() if found else None
+
+
+def parse_file(path: str, kind: str, offset: int = 0) -> tuple:
+    """
+    Read one file from offset to its last complete line.
+    (runs in worker processes)
+
+    Parameters
+    ----------
+    path: str : path of file
+
+    kind: str : LOG or ORDERS
+
+    offset: int : first byte that hasn't been read (Default value = 0)
+
+
+    Returns
+    -------
+    (offset after the last complete line, Aggregates of the read lines)
+    """
+    aggregates = Aggregates()
+    with open(path, mode='rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                # line that is being written, it's read in the next run
+                break
+            offset += len(line)
+            text = line.decode('utf-8', errors='replace').rstrip('\r\n')
+            if kind == ORDERS:
+                try:
+                    aggregates.add_order(json.loads(text))
+                except (ValueError, KeyError, TypeError):
+                    continue
+            else:
+                record = parse_log_line(text)
+                if record is not None:
+                    aggregates.add_log_record(*record)
+    return offset, aggregates
+
+
+def parse_task(task: tuple) -> tuple:
+    """parse_file() for the process pool: (key, path, kind, offset)."""
+    key, path, kind, offset = task
+    return (key, *parse_file(path, kind, offset))
+
+
+def default_files() -> list:
+    """app.log, its rotated files and the segments of order ledger."""
+    files = [LOG_FILE] + sorted(glob.glob(LOG_FILE + '.[0-9]*'))
+    files += sorted(glob.glob(os.path.join(LEDGER_PATH, 'orders-*.jsonl')))
+    return [path for path in files if os.path.exists(path)]
+
+
+def kind_of(path: str) -> str:
+    """kind of file (segments of ledger are orders)."""
+    name = os.path.basename(path)
+    return ORDERS if name.startswith('orders-') and name.endswith('.jsonl') \
+        else LOG
+
+
+def file_key(path: str) -> str:
+    """key of file in checkpoint (device and inode: same after rename)."""
+    status = os.stat(path)
+    return f"{status.st_dev}:{status.st_ino}"
+
+
+def load_checkpoint(path: str = CHECKPOINT_PATH) -> tuple:
+    """(offsets of files, Aggregates) of the last run."""
+    if not os.path.exists(path):
+        return dict(), Aggregates()
+    with open(path, mode='r') as f:
+        document = json.load(f)
+    return document['files'], Aggregates.from_dict(document['aggregates'])
+
+
+def update(files: list, checkpoint_path: str = CHECKPOINT_PATH,
+           workers: int = None, reset: bool = False) -> Aggregates:
+    """
+    Read the new bytes of files and save the checkpoint.
+
+    Parameters
+    ----------
+    files: list : paths of files (app.log files and ledger segments)
+
+    checkpoint_path: str : path of checkpoint
+        (Default value = CHECKPOINT_PATH)
+
+    workers: int : number of processes (Default value = None, cpu count)
+        0 or 1: files are read in this process
+
+    reset: bool : forget the checkpoint and read every file again
+        (Default value = False)
+
+
+    Returns
+    -------
+    Aggregates of every run (checkpoint + new bytes)
+    """
+    offsets, aggregates = (dict(), Aggregates()) if reset \
+        else load_checkpoint(checkpoint_path)
+    tasks = list()
+    seen = dict()
+    for path in files:
+        key = file_key(path)
+        if key in seen:
+            continue
+        offset = offsets.get(key, {}).get('offset', 0)
+        if os.path.getsize(path) < offset:
+            # file has been truncated
+            offset = 0
+        seen[key] = {"path": path, "offset": offset}
+        tasks.append((key, path, kind_of(path), offset))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(tasks) < 2:
+        results = map(parse_task, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(min(workers, len(tasks)))
+        results = pool.map(parse_task, tasks)
+    try:
+        for key, offset, new in results:
+            seen[key]['offset'] = offset
+            aggregates.merge(new)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # files that don't exist anymore are forgotten
+    write_json_atomic(checkpoint_path, {
+        "files": seen, "aggregates": aggregates.to_dict()
+    })
+    return aggregates
+
+
+def top(counter: Counter, limit: int = TOP) -> str:
+    """'name: count' rows of most common keys."""
+    rows = [f"    {key}: {value}" for key, value in counter.most_common(limit)]
+    return '\n'.join(rows) if rows else "    -"
+
+
+def report(aggregates: Aggregates, day: str, categories: dict,
+           limit: int = TOP) -> str:
+    """
+    Text report of aggregates.
+
+    Parameters
+    ----------
+    aggregates: Aggregates : aggregates of analytics
+
+    day: str : day of daily rows ('YYYY-MM-DD')
+
+    categories: dict : product -> category
+
+    limit: int : rows of top lists (Default value = TOP)
+
+
+    Returns
+    -------
+    report
+    """
+    records = sum(aggregates.levels.values())
+    warnings = sum(aggregates.warnings_by_day.values())
+    day_records = aggregates.records_by_day.get(day, 0)
+    day_warnings = aggregates.warnings_by_day.get(day, 0)
+    by_category = Counter()
+    for product, revenue in aggregates.revenue.items():
+        by_category[categories.get(product, 'unknown')] += revenue
+    return '\n'.join((
+        f"log records: {records}, warnings: {warnings} "
+        f"({warnings / records if records else 0:.1%})",
+        f"{day}: {day_records} records, {day_warnings} warnings "
+        f"({day_warnings / day_records if day_records else 0:.1%})",
+        "events:", top(aggregates.events, len(aggregates.events)),
+        f"top products of {day} (sold):",
+        top(aggregates.sold_by_day.get(day, Counter()), limit),
+        "top products (sold):", top(aggregates.sold, limit),
+        "revenue per product (tomans):", top(aggregates.revenue, limit),
+        "revenue per category (tomans):", top(by_category, limit),
+        "added to carts:", top(aggregates.added, limit),
+        "discount codes (used in orders):", top(aggregates.codes_used, limit),
+        "discount codes (entered):", top(aggregates.codes_entered, limit),
+    ))
+
+
+if __name__ == '__main__':
+    # python analytics.py [files] [--day YYYY-MM-DD] [--top N] [--workers N] [--reset] # noqa E501
+    parser = argparse.ArgumentParser(
+        description="analytics of app.log and the order ledger"
+        )
+    parser.add_argument('files', nargs='*',
+                        help="files to read (default: app.log, rotated "
+                        "logs and segments of the order ledger)")
+    parser.add_argument('--day', default=day_of(time.time()),
+                        help="day of daily rows (default: today)")
+    parser.add_argument('--top', type=int, default=TOP)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (0: no pool)")
+    parser.add_argument('--reset', action='store_true',
+                        help="forget the checkpoint and read every file")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    arguments = parser.parse_args()
+    files = arguments.files or default_files()
+    missing = [path for path in files if not os.path.exists(path)]
+    if missing:
+        sys.exit(f"No such file: {', '.join(missing)}")
+    aggregates = update(files, arguments.checkpoint, arguments.workers,
+                        arguments.reset)
+    storage = storage_backend()
+    products = storage.load_products()
+    categories = {name: products[name]['category'] for name in products}
+    storage.close()
+    print(report(aggregates, arguments.day, categories, arguments.top))
@@ -0,0 +1,243 @@
+import os
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+# Passwords of users: salted hashes, cached verification and rate limiting.
+#
+# stored passwords look like
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# anything else is an old plaintext password, which is still accepted and
+# replaced by a hash after the next successful login.
+
+# hash of new passwords ('scrypt' / 'pbkdf2')
+PASSWORD_HASH = os.environ.get('SHOPPING_LIST_PASSWORD_HASH', 'scrypt').lower()
+if not hasattr(hashlib, 'scrypt'):
+    # python built without OpenSSL scrypt
+    PASSWORD_HASH = 'pbkdf2'
+
+# cost of hashes (every verification without cache pays it)
+SCRYPT_N = int(os.environ.get('SHOPPING_LIST_SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = int(
+    os.environ.get('SHOPPING_LIST_PBKDF2_ITERATIONS', 600000)
+    )
+SALT_BYTES = 16
+
+# number of successful verifications that are remembered
+VERIFY_CACHE_SIZE = int(os.environ.get('SHOPPING_LIST_VERIFY_CACHE_SIZE', 1024)) # noqa E501
+
+# login attempts of one username: `LOGIN_BURST` at once, then
+# `LOGIN_RATE` attempts per second
+LOGIN_RATE = float(os.environ.get('SHOPPING_LIST_LOGIN_RATE', 1))
+LOGIN_BURST = int(os.environ.get('SHOPPING_LIST_LOGIN_BURST', 5))
+# most usernames that the limiter keeps
+LIMITER_SIZE = 100000
+
+# usernames that can use the admin commands (lowstock, restock),
+# separated by commas
+ADMINS = frozenset(
+    username.strip().lower()
+    for username in os.environ.get('SHOPPING_LIST_ADMINS', '').split(',')
+    if username.strip()
+    )
+
+# results of Authenticator.check()
+OK = 'ok'
+DENIED = 'denied'
+LIMITED = 'limited'
+
+
+def is_admin(username) -> bool:
+    """Return True if user can use the admin commands."""
+    return username in ADMINS
+
+
+def hash_password(password: str) -> str:
+    """salted hash of password (PASSWORD_HASH) to store in database."""
+    salt = secrets.token_bytes(SALT_BYTES)
+    if PASSWORD_HASH == 'pbkdf2':
+        digest = hashlib.pbkdf2_hmac(
+            'sha256', password.encode(), salt, PBKDF2_ITERATIONS
+            )
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt.hex()}${digest.hex()}" # noqa E501
+    digest = hashlib.scrypt(
+        password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P
+        )
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}" # noqa E501
+
+
+def is_hashed(stored: str) -> bool:
+    """check if stored password is a hash (not plaintext)."""
+    return stored.startswith(('scrypt$', 'pbkdf2_sha256$'))
+
+
+def needs_rehash(stored: str) -> bool:
+    """
+    check if stored password should be hashed again
+    (plaintext or hashed with other settings).
+    """
+    if PASSWORD_HASH == 'pbkdf2':
+        return not stored.startswith(f"pbkdf2_sha256${PBKDF2_ITERATIONS}$")
+    return not stored.startswith(
+        f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$"
+        )
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """
+    check password with the stored password (hash or plaintext).
+
+    Parameters
+    ----------
+    password : given password
+
+    stored : password of user in database
+
+
+    Returns
+    -------
+    Return True if password is correct.
+    """
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        if stored.startswith('pbkdf2_sha256$'):
+            _, iterations, salt, digest = stored.split('$')
+            computed = hashlib.pbkdf2_hmac(
+                'sha256', password.encode(), bytes.fromhex(salt),
+                int(iterations)
+                )
+        else:
+            _, n, r, p, salt, digest = stored.split('$')
+            computed = hashlib.scrypt(
+                password.encode(), salt=bytes.fromhex(salt),
+                n=int(n), r=int(r), p=int(p)
+                )
+    except ValueError:
+        # broken record
+        return False
+    return hmac.compare_digest(computed.hex(), digest)
+
+
+class VerifyCache:
+    """
+    LRU cache of recent successful verifications (username -> stored
+    password and a keyed digest of the given password). passwords are
+    never kept, the digest key is random for every process.
+    """
+
+    def __init__(self, size: int = VERIFY_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.key = secrets.token_bytes(32)
+        self.lock = threading.Lock()
+
+    def _tag(self, password: str) -> bytes:
+        return hmac.new(self.key, password.encode(), 'sha256').digest()
+
+    def hit(self, username, password: str, stored: str) -> bool:
+        """check if this verification has been done before."""
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is None or entry[0] != stored:
+                return False
+            self.entries.move_to_end(username)
+        return hmac.compare_digest(entry[1], self._tag(password))
+
+    def add(self, username, password: str, stored: str):
+        """remember a successful verification."""
+        if self.size <= 0:
+            return
+        entry = (stored, self._tag(password))
+        with self.lock:
+            self.entries[username] = entry
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """forget all verifications."""
+        with self.lock:
+            self.entries.clear()
+
+
+class LoginLimiter:
+    """
+    Token bucket of login attempts for every username.
+    a bucket has `burst` tokens and gets `rate` tokens per second.
+    """
+
+    def __init__(self, rate: float = LOGIN_RATE, burst: int = LOGIN_BURST,
+                 size: int = LIMITER_SIZE):
+        self.rate = rate
+        self.burst = burst
+        self.size = size
+        # username -> (tokens, time of last update)
+        self.buckets = dict()
+        self.lock = threading.Lock()
+
+    def allow(self, username, now: float = None) -> bool:
+        """take one token of username. (False if bucket is empty)"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, last = self.buckets.get(username, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self.buckets[username] = (tokens - 1 if allowed else tokens, now)
+            if len(self.buckets) > self.size:
+                self._prune(now)
+        return allowed
+
+    def _prune(self, now: float):
+        # full buckets are the same as missing ones
+        for username, (tokens, last) in list(self.buckets.items()):
+            if tokens + (now - last) * self.rate >= self.burst:
+                del self.buckets[username]
+        # still too many usernames: forget the oldest ones
+        for username in list(self.buckets)[:len(self.buckets) - self.size]:
+            del self.buckets[username]
+
+
+class Authenticator:
+    """Checks logins with the verify cache and the login limiter."""
+
+    def __init__(self, cache: VerifyCache = None,
+                 limiter: LoginLimiter = None):
+        self.cache = VerifyCache() if cache is None else cache
+        self.limiter = LoginLimiter() if limiter is None else limiter
+
+    def check(self, username, password: str, stored) -> str:
+        """
+        Check a login.
+
+        Parameters
+        ----------
+        username : given username
+
+        password : given password
+
+        stored : password of user in database (None if there isn't such
+            user)
+
+
+        Returns
+        -------
+        OK, DENIED or LIMITED (too many attempts, password isn't checked)
+        """
+        if stored is None:
+            # unknown usernames are limited too
+            return DENIED if self.limiter.allow(username) else LIMITED
+        if self.cache.hit(username, password, stored):
+            return OK
+        # only attempts that pay the hash cost are limited
+        if not self.limiter.allow(username):
+            return LIMITED
+        if not verify_password(password, stored):
+            return DENIED
+        self.cache.add(username, password, stored)
+        return OK
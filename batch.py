@@ -0,0 +1,378 @@
+import os
+import json
+import logging
+import argparse
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import shopping_list as shop
+from pricing import PricingEngine, to_tomans
+from auth import VerifyCache, verify_password
+from discounts import VALID
+from metrics import metrics
+from ledger import make_order
+# Batch mode of shopping list: replay a JSONL file of orders offline.
+#
+# every line of input is one order of a user:
+#   {"user": "test", "op": "login", "password": "test"}
+#   {"user": "test", "op": "add", "item": "apple", "amount": 2}
+#   {"user": "test", "op": "delete", "item": "apple"}
+#   {"user": "test", "op": "addmoney", "amount": 50000}
+#   {"user": "test", "op": "buy", "code": "shop4spvzftdnpcsc6oq"}  (optional)
+# every line of output is the result of the order with the same number.
+#
+# orders are read in chunks. orders of a chunk are split by user and sent
+# to a process pool, which checks them and prices the carts. then the
+# parent takes the stock and the money of purchases in the order of input
+# and writes the storage once per chunk.
+#
+# unlike the store mode, money and stock are taken at 'buy' (not 'add'),
+# and a rejected purchase (no money / no stock) empties the cart.
+
+# number of orders in one chunk
+CHUNK_SIZE = int(os.environ.get('SHOPPING_LIST_BATCH_CHUNK_SIZE', 10000))
+
+# operations of orders
+OPERATIONS = ('login', 'add', 'delete', 'addmoney', 'buy')
+
+logger = logging.getLogger()
+
+# prices and categories of products and discount codes
+# (set in every worker process)
+prices = dict()
+categories = dict()
+discount_codes = None
+# logins that have been checked by this process
+verified = VerifyCache()
+
+
+def init_worker(product_prices: dict, product_categories: dict, codes):
+    """set the products and discount codes (DiscountBook) of process."""
+    global discount_codes
+    prices.clear()
+    prices.update(product_prices)
+    categories.clear()
+    categories.update(product_categories)
+    discount_codes = codes
+
+
+def positive_amount(value) -> bool:
+    """check if value is an amount (int bigger than zero)."""
+    return isinstance(value, int) and not isinstance(value, bool) \
+        and value > 0
+
+
+def check_order(username, password, state, order: dict):
+    """
+    Check one order of user and change the state of user.
+
+    Parameters
+    ----------
+    username : username of user
+
+    password : stored password of user (None if there isn't such user)
+
+    state : cart of user (name -> amount), None if user isn't logged in
+
+    order: dict : the order
+
+
+    Returns
+    -------
+    (new state, result of order)
+    """
+    op = order.get('op')
+    result = {"user": username, "op": op, "ok": False}
+    if op not in OPERATIONS:
+        result['error'] = "wrong operation"
+        return state, result
+    if op == 'login':
+        given = order.get('password')
+        if password is None or not isinstance(given, str):
+            result['error'] = "wrong username or password"
+            return state, result
+        given = given.lower()
+        if not verified.hit(username, given, password):
+            if not verify_password(given, password):
+                result['error'] = "wrong username or password"
+                return state, result
+            verified.add(username, given, password)
+        result['ok'] = True
+        return (state if state is not None else dict()), result
+    if state is None:
+        result['error'] = "not logged in"
+        return state, result
+
+    if op == 'add':
+        item, amount = order.get('item'), order.get('amount')
+        if item not in prices:
+            result['error'] = "no such product"
+        elif not positive_amount(amount):
+            result['error'] = "wrong amount"
+        else:
+            shop.add_item(item, amount, state)
+            result['ok'] = True
+        return state, result
+
+    if op == 'delete':
+        if order.get('item') not in state:
+            result['error'] = "not in cart"
+        else:
+            del state[order['item']]
+            result['ok'] = True
+        return state, result
+
+    if op == 'addmoney':
+        if not positive_amount(order.get('amount')):
+            result['error'] = "wrong amount"
+        else:
+            result['ok'] = True
+            result['amount'] = order['amount']
+        return state, result
+
+    # buy
+    code = order.get('code')
+    if not state:
+        result['error'] = "your shopping cart is empty"
+        return state, result
+    if code is not None:
+        code = str(code).lower()
+        # uses of code are counted by the parent (in the order of input)
+        code_status = discount_codes.check(code)
+        if code_status != VALID:
+            result['error'] = f"{code_status} code"
+            return state, result
+    pricing = PricingEngine()
+    for name, amount in state.items():
+        pricing.set_line(name, amount, prices[name])
+    discount = 0
+    if code is not None:
+        discount = discount_codes.discount(
+            code, pricing, categories.__getitem__
+            )
+    # the parent takes stock and money (minor units) of purchase
+    result['ok'] = True
+    result['items'] = state
+    result['code'] = code
+    result['total'] = pricing.total()
+    result['discount'] = discount
+    return dict(), result
+
+
+def check_orders(group: tuple) -> tuple:
+    """
+    Check the orders of one user. (runs in worker processes)
+
+    Parameters
+    ----------
+    group: tuple : (username, password, state, [(line number, order)])
+
+
+    Returns
+    -------
+    (username, new state, [(line number, result)])
+    """
+    username, password, state, orders = group
+    results = list()
+    for number, order in orders:
+        state, result = check_order(username, password, state, order)
+        results.append((number, result))
+    return username, state, results
+
+
+def commit_purchase(result: dict, changed_users: set, changed_products: set,
+                    orders: list = None):
+    """
+    Take stock and money of a checked purchase. (parent process)
+    checks stock with the same rule as decrease_stock().
+    the record of purchase is added to orders (for the order ledger).
+    """
+    items = result.pop('items')
+    total, discount = result.pop('total'), result.pop('discount')
+    users_database = shop.context.users
+    username = result['user']
+    for name, amount in items.items():
+        if shop.product_amount(name) - amount <= 0:
+            result.update(ok=False, error="some items are sold out")
+            return
+    paid = to_tomans(total - discount)
+    balance = users_database[username]['balance'] - paid
+    if balance < 0:
+        result.update(ok=False, error="not enough money")
+        return
+    code = result.pop('code')
+    if code is not None and not shop.context.discount_codes.redeem(
+            code, username, defer=True):
+        result.update(ok=False, error="used up code")
+        return
+    for name, amount in items.items():
+        shop.decrease_stock(amount, name)
+    users_database[username]['balance'] = balance
+    changed_users.add(username)
+    changed_products.update(items)
+    result.update(paid=paid, discount=to_tomans(discount))
+    if orders is not None:
+        products_database = shop.context.products
+        orders.append(make_order(
+            username,
+            [(name, amount, products_database[name]['price'])
+             for name, amount in items.items()],
+            to_tomans(total), to_tomans(discount), code
+            ))
+
+
+def run_chunk(lines: list, first_number: int, sessions: dict,
+              pool=None) -> list:
+    """
+    Replay one chunk of orders.
+
+    Parameters
+    ----------
+    lines: list : lines of input
+
+    first_number: int : line number of first line
+
+    sessions: dict : carts of logged in users (changed in place)
+
+    pool : process pool (Default value = None, run in this process)
+
+
+    Returns
+    -------
+    results of orders in the order of input
+    """
+    users_database = shop.context.users
+    results = dict()
+    groups = dict()
+    for number, line in enumerate(lines, start=first_number):
+        try:
+            order = json.loads(line)
+            username = str(order['user']).lower()
+        except (ValueError, TypeError, KeyError):
+            results[number] = {"ok": False, "error": "wrong format"}
+            continue
+        groups.setdefault(username, list()).append((number, order))
+
+    work = [
+        (username,
+         users_database[username]['password']
+         if username in users_database else None,
+         sessions.get(username),
+         orders)
+        for username, orders in groups.items()
+    ]
+    if pool is None:
+        checked = map(check_orders, work)
+    else:
+        chunksize = max(1, len(work) // ((os.cpu_count() or 1) * 4))
+        checked = pool.map(check_orders, work, chunksize=chunksize)
+    for username, state, user_results in checked:
+        if state is None:
+            sessions.pop(username, None)
+        else:
+            sessions[username] = state
+        results.update(user_results)
+
+    # stock and money are taken in the order of input
+    changed_users, changed_products = set(), set()
+    # records of finished purchases (order ledger)
+    orders = list()
+    ordered = list()
+    for number in sorted(results):
+        result = results[number]
+        result['line'] = number
+        ordered.append(result)
+        if not result['ok']:
+            continue
+        if result['op'] == 'addmoney':
+            record = users_database[result['user']]
+            record['balance'] += result.pop('amount')
+            changed_users.add(result['user'])
+        elif result['op'] == 'buy':
+            commit_purchase(result, changed_users, changed_products, orders)
+        if result['ok'] and result['op'] in ('login', 'addmoney', 'buy'):
+            result['balance'] = users_database[result['user']]['balance']
+
+    # one write of storage for the whole chunk
+    with metrics.timer('storage.batch_save'):
+        if changed_products:
+            shop.context.storage.save_products(
+                shop.context.products, changed_products
+                )
+        if changed_users:
+            shop.context.storage.save_users(users_database, changed_users)
+        shop.context.discount_codes.flush()
+        shop.context.ledger.append(orders)
+    return ordered
+
+
+def replay(input_path: str, output_path: str,
+           chunk_size: int = CHUNK_SIZE, workers: int = None) -> dict:
+    """
+    Replay a JSONL file of orders and write results as JSONL.
+
+    Parameters
+    ----------
+    input_path: str : path of orders
+
+    output_path: str : path of results
+
+    chunk_size: int : orders in one chunk (Default value = CHUNK_SIZE)
+
+    workers: int : worker processes (Default value = None, number of CPUs)
+        0 runs everything in this process.
+
+
+    Returns
+    -------
+    number of done and failed orders.
+    """
+    products = shop.context.products
+    product_prices = {name: products[name]['price'] for name in products}
+    product_categories = {
+        name: products[name]['category'] for name in products
+    }
+    codes = shop.context.discount_codes
+    init_worker(product_prices, product_categories, codes)
+    pool = None
+    if workers != 0:
+        pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker,
+            initargs=(product_prices, product_categories, codes)
+            )
+    counts = {"done": 0, "failed": 0}
+    # carts of logged in users, between chunks
+    sessions = dict()
+    number = 1
+    try:
+        with open(input_path, mode='r') as orders, \
+                open(output_path, mode='w') as out:
+            while True:
+                lines = list(islice(orders, chunk_size))
+                if not lines:
+                    break
+                with metrics.timer('batch.chunk'):
+                    results = run_chunk(lines, number, sessions, pool)
+                out.writelines(json.dumps(result) + '\n' for result in results)
+                for result in results:
+                    counts['done' if result['ok'] else 'failed'] += 1
+                logger.info("Batch: replayed lines %s-%s of %s", number, number + len(lines) - 1, input_path) # noqa E501
+                number += len(lines)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return counts
+
+
+if __name__ == '__main__':
+    # python batch.py orders.jsonl results.jsonl [--chunk-size N] [--workers N] # noqa E501
+    parser = argparse.ArgumentParser(description="replay orders (JSONL)")
+    parser.add_argument('input', help="JSONL file of orders")
+    parser.add_argument('output', help="JSONL file of results")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (0: no pool)")
+    arguments = parser.parse_args()
+    shop.configure_logging()
+    counts = replay(arguments.input, arguments.output,
+                    arguments.chunk_size, arguments.workers)
+    print(f"{counts['done']} orders done, {counts['failed']} failed.")
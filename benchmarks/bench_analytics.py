@@ -0,0 +1,73 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+# Benchmark: analytics of app.log files.
+# four logs of random records (the messages of shopping list) are read
+# by one process and by a process pool, then a few lines are appended
+# and the checkpoint run only reads the new bytes.
+# run from the root of project: python benchmarks/bench_analytics.py [lines]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analytics import update  # noqa E402
+from timing import timed  # noqa E402
+
+FILES = 4
+MESSAGES = (
+    ('INFO', "User: user{user} Added {amount} product{product} to the cart."),
+    ('INFO', "User user{user} logged in."),
+    ('INFO', "User: user{user} | Showing Cart."),
+    ('INFO', "User: user{user} Finished the buy."),
+    ('INFO', "User: user{user} Entered discount code:'yalda1405'"),
+    ('WARNING', "Incorrect Username/Pass combination Entered."),
+    ('WARNING', "User: user{user}| Invalid input: {amount}"),
+)
+
+
+def write_log(path: str, lines: int, generator: random.Random):
+    """log file with given number of random records."""
+    with open(path, mode='a') as f:
+        for number in range(lines):
+            level, message = generator.choice(MESSAGES)
+            message = message.format(
+                user=generator.randrange(10000),
+                amount=generator.randrange(1, 10),
+                product=generator.randrange(1000)
+                )
+            f.write(f"2026-10-{1 + number % 28:02d} 12:00:00,000 - 1380 - "
+                    f"{level} - {message}\n")
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    generator = random.Random(1405)
+    directory = tempfile.mkdtemp(prefix='analytics-')
+    checkpoint = os.path.join(directory, 'analytics.json')
+    try:
+        files = [os.path.join(directory, f"app.log.{number}")
+                 for number in range(FILES)]
+        for path in files:
+            write_log(path, lines, generator)
+        size = sum(os.path.getsize(path) for path in files) / 1024 / 1024
+        print(f"{FILES} logs of {lines} lines ({size:.0f} MB)\n")
+
+        _, single = timed(update, files, checkpoint, workers=1, reset=True)
+        single /= 1000
+        print(f"one process:          {single:6.2f} s "
+              f"({FILES * lines / single:,.0f} lines/s)")
+        aggregates, pooled = timed(
+            update, files, checkpoint, workers=FILES, reset=True
+            )
+        pooled /= 1000
+        print(f"pool of {FILES} processes: {pooled:6.2f} s "
+              f"({FILES * lines / pooled:,.0f} lines/s)")
+
+        write_log(files[0], 1000, generator)
+        updated, incremental = timed(update, files, checkpoint, workers=1)
+        print(f"1000 new lines:       {incremental:6.1f} ms "
+              f"(checkpoint)")
+        new = sum(updated.levels.values()) - sum(aggregates.levels.values())
+        assert new == 1000, new
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+# Benchmark: logins per second.
+# plaintext passwords, hashed passwords without / with the verify cache,
+# and a brute-force storm on one username (stopped by the login limiter).
+# run from the root of project: python benchmarks/bench_auth.py [logins]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from auth import (  # noqa E402
+    Authenticator, LoginLimiter, VerifyCache, hash_password, OK, LIMITED
+    )
+
+
+def logins_per_second(authenticator, logins: int, username, password,
+                      stored) -> tuple:
+    """(logins per second, number of each result) of repeated logins."""
+    results = dict()
+    start = time.perf_counter()
+    for _ in range(logins):
+        status = authenticator.check(username, password, stored)
+        results[status] = results.get(status, 0) + 1
+    return logins / (time.perf_counter() - start), results
+
+
+if __name__ == '__main__':
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    stored = hash_password('babak1234')
+    # no rate limit and no cache: every login pays the hash
+    unlimited = LoginLimiter(rate=float('inf'), burst=logins)
+    print(f"{'case':<28} {'logins/s':>12}  results")
+    for case, authenticator, password, record in (
+            ('plaintext', Authenticator(VerifyCache(0), unlimited),
+             'babak1234', 'babak1234'),
+            ('hashed, no cache', Authenticator(VerifyCache(0), unlimited),
+             'babak1234', stored),
+            ('hashed, verify cache', Authenticator(limiter=unlimited),
+             'babak1234', stored),
+            ('storm (wrong password)', Authenticator(),
+             'wrong', stored)):
+        rate, results = logins_per_second(
+            authenticator, logins, 'babak', password, record
+            )
+        print(f"{case:<28} {rate:12.0f}  {results}")
+    assert Authenticator().check('babak', 'babak1234', stored) == OK
+    print(f"\nin the storm only the first attempts pay the hash, the rest are "
+          f"'{LIMITED}'.")
@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+# Benchmark: startup of products.json (json.load + Catalog) versus the
+# memory mapped binary catalog, for growing numbers of products.
+# every startup runs in a fresh interpreter and looks up one product.
+# run from the root of project: python benchmarks/bench_binary_catalog.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from binary_catalog import build_binary_catalog  # noqa E402
+import generate_data  # noqa E402
+
+SIZES = (10000, 100000, 1000000)
+RUNS = 5
+
+JSON_STARTUP = """
+import json
+from catalog import Catalog
+with open({path!r}) as f:
+    products = Catalog(json.load(f))
+products['product00000001']['price']
+"""
+
+BINARY_STARTUP = """
+from binary_catalog import BinaryCatalog
+products = BinaryCatalog({path!r})
+products['product00000001']['price']
+"""
+
+
+def best_of(code: str, runs: int = RUNS) -> float:
+    """best time of given code in a fresh interpreter (milliseconds)."""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == '__main__':
+    baseline = best_of('import catalog, binary_catalog')
+    print(f"{'products':>10} {'json ms':>10} {'binary ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            products = dict(generate_data.products(size))
+            json_path = os.path.join(directory, 'products.json')
+            binary_path = os.path.join(directory, 'products.bin')
+            with open(json_path, mode='w') as f:
+                json.dump(products, f)
+            build_binary_catalog(products, binary_path)
+            del products
+            json_ms = best_of(JSON_STARTUP.format(path=json_path)) - baseline
+            binary_ms = best_of(BINARY_STARTUP.format(path=binary_path)) - baseline # noqa E501
+            print(f"{size:>10} {json_ms:10.1f} {binary_ms:10.2f}")
@@ -0,0 +1,57 @@
+import os
+import sys
+import random
+# Benchmark: showing a cart of 10k lines by name / amount.
+# old quadratic ordering versus the sorted views kept by Cart.
+# run from the root of project: python benchmarks/bench_cart.py [lines]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cart import Cart  # noqa E402
+from shopping_list import order_by_amount, order_by_name  # noqa E402
+from timing import timed  # noqa E402
+
+
+def quadratic_order_by_amount(shopping_list: dict) -> dict:
+    """order_by_amount before the Cart (nested loop)."""
+    result = dict()
+    for value in sorted(list(shopping_list.values())):
+        for name, amount in shopping_list.items():
+            if value == amount:
+                result[name] = amount
+    return result
+
+
+def quadratic_order_by_name(shopping_list: dict) -> dict:
+    """order_by_name before the Cart (nested loop)."""
+    result = dict()
+    for key in sorted(list(shopping_list.keys())):
+        for name, amount in shopping_list.items():
+            if key == name:
+                result[name] = amount
+    return result
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    generator = random.Random(1380)
+    prices = {f"item{index}": generator.randrange(1000, 100000)
+              for index in range(lines)}
+    items = {name: generator.randrange(1, 50) for name in prices}
+
+    cart = Cart(price_of=prices.__getitem__)
+    _, build = timed(
+        lambda: [cart.__setitem__(n, a) for n, a in items.items()]
+        )
+    print(f"cart of {lines} lines built in {build:.1f} ms "
+          f"({build * 1000 / lines:.2f} us per insert)\n")
+    print(f"{'order':<8} {'nested loop ms':>15} {'sorted() ms':>12} "
+          f"{'Cart ms':>10}")
+    for order, quadratic, plain in (
+            ('name', quadratic_order_by_name, order_by_name),
+            ('amount', quadratic_order_by_amount, order_by_amount)):
+        print(f"{order:<8} {timed(quadratic, items)[1]:15.1f} "
+              f"{timed(plain, items)[1]:12.3f} "
+              f"{timed(cart.ordered, order)[1]:10.3f}")
+    for order in ('price', 'total'):
+        print(f"{order:<8} {'-':>15} {'-':>12} "
+              f"{timed(cart.ordered, order)[1]:10.3f}")
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+# Benchmark: indexed Catalog versus linear scans of products dictionary.
+# run from the root of project: python benchmarks/bench_catalog.py [size]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import Catalog  # noqa E402
+from shopping_list import products_by_category  # noqa E402
+import generate_data  # noqa E402
+from timing import best_of  # noqa E402
+
+
+def linear_price_range(products: dict, low, high) -> dict:
+    return {
+        name: information for name, information in products.items()
+        if low <= information['price'] <= high
+    }
+
+
+def linear_prefix(products: dict, prefix: str) -> dict:
+    return {
+        name: information for name, information in products.items()
+        if name.startswith(prefix)
+    }
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    products = dict(generate_data.products(size))
+    start = time.perf_counter()
+    catalog = Catalog(products)
+    print(f"{size} products, catalog built in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms\n")
+    rows = (
+        ('category', products_by_category, ('meat', products),
+         products_by_category, ('meat', catalog)),
+        ('price range', linear_price_range, (products, 5000, 60000),
+         Catalog.by_price, (catalog, 5000, 60000)),
+        ('name prefix', linear_prefix, (products, 'product000012'),
+         Catalog.by_prefix, (catalog, 'product000012')),
+        ('set price', lambda: None, (),
+         Catalog.set_price, (catalog, generate_data.product_name_of(1), 1234)),
+    )
+    print(f"{'query':<12} {'linear ms':>12} {'catalog ms':>12}")
+    for name, linear, linear_args, indexed, indexed_args in rows:
+        print(f"{name:<12} {best_of(linear, *linear_args):12.3f} "
+              f"{best_of(indexed, *indexed_args):12.3f}")
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import random
+# Benchmark: commands per second of store mode.
+# old if/elif chain (split() repeated, tuple membership of Command values)
+# versus tokenize() + CommandTable. handlers do nothing, so only choosing
+# the handler is measured.
+# run from the root of project: python benchmarks/bench_commands.py [lines]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from commands import Command, CommandTable, tokenize  # noqa E402
+
+PRODUCTS = {f"product{index}": None for index in range(1000)}
+INPUTS = (
+    'products', 'show', 'help', 'stats', 'next', 'page 2', 'delete product1',
+    'order name', 'product7', 'product42 3', 'category', 'buy', 'addmoney',
+    'nothing',
+)
+
+
+def old_chain(user_input: str) -> str:
+    """the if/elif chain of store mode before the dispatch table."""
+    if user_input in Command.EXIT.value:
+        return 'exit'
+    elif user_input in Command.LOGOUT.value:
+        return 'logout'
+    elif user_input in Command.ADDMONEY.value:
+        return 'addmoney'
+    elif user_input in Command.PRODUCTS.value:
+        return 'products'
+    elif user_input in Command.CATEGORY.value:
+        return 'category'
+    elif user_input.startswith(Command.PAGE.value + ' '):
+        return 'page'
+    elif user_input == Command.NEXT.value:
+        return 'next'
+    elif (user_input).startswith(Command.DELETE.value):
+        return 'delete'
+    elif len(user_input.split()) > 1:
+        if (user_input.split())[0] == 'order':
+            return 'order'
+    elif user_input == 'order':
+        return 'order'
+    elif user_input == Command.SHOW.value:
+        return 'show'
+    elif user_input == Command.STATS.value:
+        return 'stats'
+    elif user_input == Command.HELP.value:
+        return 'help'
+    elif user_input == Command.BUY.value:
+        return 'buy'
+    elif user_input in PRODUCTS.keys():
+        return 'item'
+    return 'other'
+
+
+def make_table() -> CommandTable:
+    """store table with handlers that only return their name."""
+    table = CommandTable(default=lambda state, command: 'item')
+    for command in Command:
+        name = command.name.lower()
+        table.register(command)(lambda state, command, name=name: name)
+    return table
+
+
+def per_second(function, lines: list) -> float:
+    """commands per second of given function over lines."""
+    start = time.perf_counter()
+    for line in lines:
+        function(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    generator = random.Random(1380)
+    lines = [generator.choice(INPUTS) for _ in range(count)]
+    table = make_table()
+
+    def dispatch(line: str):
+        for command in tokenize(line):
+            table.dispatch(None, command)
+
+    print(f"{count} commands\n")
+    print(f"{'parser':<22} {'commands/s':>12}")
+    print(f"{'if/elif chain':<22} {per_second(old_chain, lines):12,.0f}")
+    print(f"{'tokenize + table':<22} {per_second(dispatch, lines):12,.0f}")
+
+    # the same commands as scripts of 10 commands
+    scripts = ['; '.join(lines[index:index + 10])
+               for index in range(0, count, 10)]
+    start = time.perf_counter()
+    for script in scripts:
+        dispatch(script)
+    rate = count / (time.perf_counter() - start)
+    print(f"{'scripts of 10 (;)':<22} {rate:12,.0f}")
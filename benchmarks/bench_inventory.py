@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import random
+import logging
+# Benchmark: low stock of 1M products.
+# StockMonitor (heap of margins, updated on every change of stock) versus
+# scanning every product for 'lowstock'.
+# run from the root of project: python benchmarks/bench_inventory.py [size]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import Catalog  # noqa E402
+from inventory import StockMonitor  # noqa E402
+import generate_data  # noqa E402
+from timing import timed  # noqa E402
+
+CHANGES = 1000000
+
+
+def scan(catalog, monitor) -> list:
+    """low products by checking every product."""
+    low = list()
+    for name in catalog:
+        amount = catalog[name]['amount']
+        threshold = monitor.threshold(name)
+        if amount <= threshold:
+            low.append((amount - threshold, name))
+    low.sort()
+    return [name for _, name in low]
+
+
+if __name__ == '__main__':
+    # warnings of low products aren't measured
+    logging.disable(logging.WARNING)
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    generator = random.Random(1405)
+    catalog = Catalog(dict(generate_data.products(size)))
+    monitor = StockMonitor().watch(catalog)
+    # the heap is built at the first call of low()
+    _, build = timed(monitor.low)
+    print(f"{size} products, heap built in {build:.0f} ms\n")
+
+    names = [generate_data.product_name_of(generator.randrange(size))
+             for _ in range(CHANGES)]
+    start = time.perf_counter()
+    for name in names:
+        record = catalog[name]
+        if record['amount'] > 1:
+            record['amount'] -= 1
+    seconds = time.perf_counter() - start
+    print(f"{CHANGES} stock changes: {seconds * 1e6 / CHANGES:.2f} us each "
+          f"(monitor followed them), heap of {len(monitor.heap)} entries")
+
+    low, low_ms = timed(monitor.low)
+    scanned, scan_ms = timed(scan, catalog, monitor)
+    assert [name for name, *_ in low] == scanned
+    print(f"{len(low)} low products")
+    print(f"  monitor:            {low_ms:8.2f} ms")
+    print(f"  scan of products:   {scan_ms:8.0f} ms")
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+from itertools import islice
+# Benchmark: order ledger with many orders.
+# appends orders in batches (like batch mode), then reads a page of
+# history of one user from the user index, versus scanning every segment
+# for the orders of that user.
+# run from the root of project: python benchmarks/bench_ledger.py [orders]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ledger import OrderLedger, make_order, day_of  # noqa E402
+from timing import timed  # noqa E402
+
+USERS = 10000
+BATCH = 10000
+PAGE = 20
+DAY = 24 * 60 * 60
+
+
+def make_orders(count: int, generator: random.Random, start: float):
+    """`count` random orders of USERS users during one year."""
+    for number in range(count):
+        lines = [(f"product{generator.randrange(1000)}",
+                  generator.randrange(1, 5), generator.randrange(1000, 90000))
+                 for _ in range(generator.randrange(1, 4))]
+        total = sum(amount * price for _, amount, price in lines)
+        yield make_order(
+            f"user{generator.randrange(USERS)}", lines, total,
+            timestamp=start + number * 365 * DAY / count
+            )
+
+
+def scan(ledger: OrderLedger, username) -> list:
+    """orders of user by reading every segment."""
+    found = list()
+    for segment in ledger.segments():
+        with open(ledger.segment_path(segment), mode='rb') as f:
+            for line in f:
+                order = json.loads(line)
+                if order['user'] == username:
+                    found.append(order)
+    found.reverse()
+    return found
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    generator = random.Random(1405)
+    path = tempfile.mkdtemp(prefix='ledger-')
+    try:
+        ledger = OrderLedger(path)
+        orders = make_orders(count, generator, start=1767225600)
+        start = time.perf_counter()
+        while True:
+            batch = list(islice(orders, BATCH))
+            if not batch:
+                break
+            ledger.append(batch)
+        seconds = time.perf_counter() - start
+        print(f"{count} orders appended in {seconds:.1f} s "
+              f"({count / seconds:,.0f} orders/s), "
+              f"{len(ledger.segments())} segments\n")
+
+        username = 'user42'
+        total = ledger.count(username)
+        first, first_ms = timed(
+            lambda: list(islice(ledger.orders(username), PAGE))
+            )
+        last, last_ms = timed(
+            lambda: list(islice(ledger.orders(username, total - PAGE), PAGE))
+            )
+        scanned, scan_ms = timed(scan, ledger, username)
+        assert first == scanned[:PAGE] and last == scanned[-PAGE:]
+        print(f"history of {username} ({total} orders), page of {PAGE}")
+        print(f"  first page (index):   {first_ms:8.2f} ms")
+        print(f"  last page (index):    {last_ms:8.2f} ms")
+        print(f"  scan of segments:     {scan_ms:8.0f} ms")
+
+        day = day_of(1767225600 + 100 * DAY)
+        day_orders, day_ms = timed(lambda: list(ledger.orders_of_day(day)))
+        print(f"orders of {day} ({len(day_orders)}): {day_ms:.0f} ms")
+    finally:
+        shutil.rmtree(path)
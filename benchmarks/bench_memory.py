@@ -0,0 +1,75 @@
+import os
+import sys
+import gc
+import time
+import resource
+import subprocess
+# Benchmark: memory of 1M products.
+# dict of dicts (products.json as loaded) versus Catalog with ProductRecord
+# objects and Catalog with the struct of arrays store.
+# every case runs in its own process, products are generated one by one,
+# so the peak RSS is the memory of the structure itself.
+# run from the root of project: python benchmarks/bench_memory.py [size]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from catalog import Catalog  # noqa E402
+import generate_data  # noqa E402
+
+CASES = ('dicts', 'records', 'arrays')
+
+
+class GeneratedProducts:
+    """products database that makes its products while being read."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def items(self):
+        for name, record in generate_data.products(self.size):
+            # categories are read from JSON as separate strings
+            record['category'] = ''.join(record['category'])
+            yield name, record
+
+
+def rss_mb() -> float:
+    """current resident memory of process in MB."""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def run_case(case: str, size: int):
+    """build one case and print: build time, RSS and peak RSS."""
+    products = GeneratedProducts(size)
+    start = time.perf_counter()
+    if case == 'dicts':
+        database = dict(products.items())
+    else:
+        database = Catalog(products, store=case)
+    build = time.perf_counter() - start
+    gc.collect()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{case} {build:.2f} {rss_mb():.1f} {peak:.1f} {len(database)}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--case']:
+        run_case(sys.argv[2], int(sys.argv[3]))
+        sys.exit()
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"{size} products\n")
+    print(f"{'store':<10} {'build s':>8} {'RSS MB':>8} {'peak RSS MB':>12}")
+    for case in CASES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--case', case,
+             str(size)],
+            capture_output=True, text=True, check=True
+            ).stdout.split()
+        name, build, rss, peak, _ = output
+        print(f"{name:<10} {float(build):8.2f} {float(rss):8.1f} "
+              f"{float(peak):12.1f}")
+    print("\nCatalog sizes include its indexes (categories, prices, names).")
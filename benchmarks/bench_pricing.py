@@ -0,0 +1,51 @@
+import os
+import sys
+import random
+# Benchmark: total price, discount and repricing of a cart of 10k lines.
+# per-line Python loop over floats versus the columns of PricingEngine.
+# run from the root of project: python benchmarks/bench_pricing.py [lines]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pricing import PricingEngine, DISCOUNT_CAP, to_tomans  # noqa E402
+from timing import best_of  # noqa E402
+
+
+def loop_total(items: dict, prices: dict) -> float:
+    """total price before the pricing engine (show_cart / BUY)."""
+    return float(sum(prices[name] * amount for name, amount in items.items()))
+
+
+def loop_discount(items: dict, prices: dict, percent: int) -> float:
+    """capped discount before the pricing engine."""
+    return min(percent * loop_total(items, prices) / 100, DISCOUNT_CAP)
+
+
+def loop_line_totals(items: dict, prices: dict) -> list:
+    """total price of every line, one by one."""
+    return [prices[name] * amount for name, amount in items.items()]
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    generator = random.Random(1380)
+    prices = {f"item{index}": generator.randrange(1000, 100000)
+              for index in range(lines)}
+    items = {name: generator.randrange(1, 50) for name in prices}
+
+    engine = PricingEngine()
+    for name, amount in items.items():
+        engine.set_line(name, amount, prices[name])
+    assert to_tomans(engine.total()) == loop_total(items, prices)
+
+    print(f"cart of {lines} lines\n")
+    print(f"{'operation':<12} {'loop ms':>10} {'engine ms':>10}")
+    print(f"{'total':<12} {best_of(loop_total, items, prices):10.3f} "
+          f"{best_of(engine.total):10.3f}")
+    print(f"{'discount':<12} "
+          f"{best_of(loop_discount, items, prices, 15):10.3f} "
+          f"{best_of(engine.discount, 15):10.3f}")
+    print(f"{'line totals':<12} "
+          f"{best_of(loop_line_totals, items, prices):10.3f} "
+          f"{best_of(engine.line_totals):10.3f}")
+    print(f"{'reprice':<12} {'-':>10} "
+          f"{best_of(engine.reprice, prices.__getitem__):10.3f}")
@@ -0,0 +1,41 @@
+import io
+import os
+import sys
+# Benchmark: time to first page of 'products' for growing catalogs,
+# versus printing every product with one print() per row.
+# run from the root of project: python benchmarks/bench_render.py
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import Catalog  # noqa E402
+from render import SEPARATOR  # noqa E402
+import shopping_list as shop  # noqa E402
+from timing import timed  # noqa E402
+
+
+def make_catalog(size: int) -> Catalog:
+    return Catalog({
+        f"product{index:07d}": {
+            "category": "food", "price": 1000 + index, "amount": 10
+        }
+        for index in range(size)
+    })
+
+
+def print_all(products, out):
+    """products command before paging: one print() per row."""
+    for name, info in products.items():
+        print(f"Name: {name.capitalize()} | Price: {info['price']} tomans | {info['amount']} in stock", file=out)  # noqa E501
+        print(SEPARATOR, file=out)
+
+
+def first_page(products, out):
+    shop.products_pager(products, "header").show(1, out)
+
+
+if __name__ == '__main__':
+    print(f"{'products':>10} {'print all ms':>14} {'first page ms':>14}")
+    for size in (1000, 10000, 100000, 1000000):
+        products = make_catalog(size)
+        _, print_ms = timed(print_all, products, io.StringIO())
+        _, page_ms = timed(first_page, products, io.StringIO())
+        print(f"{size:>10} {print_ms:14.2f} {page_ms:14.3f}")
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import random
+# Benchmark: fuzzy search of products with the trigram index versus a
+# linear scan (edit distance of every name), for 1M products.
+# names are made of random syllables, searched texts are names with
+# zero, one or two typos.
+# run from the root of project: python benchmarks/bench_search.py [size]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import Catalog  # noqa E402
+from search import (  # noqa E402
+    TrigramIndex, edit_distance, search_products, typos_allowed
+    )
+import generate_data  # noqa E402
+
+CONSONANTS = 'bcdfghjklmnprstvwxz'
+VOWELS = 'aeiou'
+QUERIES = 200
+
+
+def make_names(size: int) -> list:
+    """`size` different names of 3 to 6 syllables (consonant + vowel)."""
+    generator = random.Random(1380)
+    names = dict()
+    while len(names) < size:
+        name = ''.join(
+            generator.choice(CONSONANTS) + generator.choice(VOWELS)
+            for _ in range(generator.randrange(3, 7))
+            )
+        names[name] = None
+    return list(names)
+
+
+def typo(name: str, typos: int, generator: random.Random) -> str:
+    """name with given number of random typos (change, delete, insert)."""
+    letters = list(name)
+    for _ in range(typos):
+        index = generator.randrange(len(letters))
+        kind = generator.randrange(3)
+        if kind == 0:
+            letters[index] = generator.choice('abcdefghijklmnopqrstuvwxyz')
+        elif kind == 1:
+            del letters[index]
+        else:
+            letters.insert(index, generator.choice('aeiou'))
+    return ''.join(letters)
+
+
+def timings(function, queries: list) -> str:
+    """median and 90th percentile of function over queries."""
+    times = list()
+    for text in queries:
+        start = time.perf_counter()
+        function(text)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return (f"median {times[len(times) // 2] * 1000:7.3f} ms   "
+            f"p90 {times[len(times) * 9 // 10] * 1000:7.3f} ms")
+
+
+def linear_similar(names: list, text: str) -> list:
+    """closest names within the typos of text, by checking every name."""
+    typos = typos_allowed(text)
+    distances = {name: edit_distance(text, name, typos) for name in names}
+    closest = min(distances.values())
+    if closest > typos:
+        return list()
+    return sorted(name for name, distance in distances.items()
+                  if distance == closest)
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    generator = random.Random(1405)
+    names = make_names(size)
+    # generated products with pronounceable names
+    catalog = Catalog({
+        name: record
+        for name, (_, record) in zip(names, generate_data.products(size))
+    })
+    start = time.perf_counter()
+    index = catalog.search_index
+    print(f"{size} products, trigram index built in "
+          f"{time.perf_counter() - start:.1f} s\n")
+
+    for typos in (0, 1, 2):
+        queries = [typo(generator.choice(names), typos, generator)
+                   for _ in range(QUERIES)]
+        print(f"{typos} typos, {QUERIES} queries")
+        print(f"  did you mean (index):  "
+              f"{timings(lambda text: index.similar(text, 3), queries)}")
+        print(f"  search command:        "
+              f"{timings(lambda text: search_products(catalog, text), queries)}") # noqa E501
+
+    text = queries[0]
+    start = time.perf_counter()
+    linear = linear_similar(names, text)
+    print(f"\nlinear scan (one query): {(time.perf_counter() - start) * 1000:.0f} ms") # noqa E501
+    found = set(index.similar(text, len(linear)))
+    print(f"closest names found by index: {len(found & set(linear))} of "
+          f"{len(linear)}")
+
+    # incremental changes of catalog
+    start = time.perf_counter()
+    for number in range(1000):
+        catalog[f"newproduct{number}"] = {
+            "category": "food", "price": 1000, "amount": 1
+        }
+    for number in range(1000):
+        del catalog[f"newproduct{number}"]
+    print(f"1000 adds + 1000 deletes (all indexes): "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    assert isinstance(catalog.search_index, TrigramIndex)
@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+import subprocess
+# Benchmark: cost of importing shopping_list versus first use of its data.
+# run from the root of project: python benchmarks/bench_startup.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 20
+
+
+def time_python(code: str) -> float:
+    """run given code in a fresh interpreter, return the seconds it took."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def best_of(code: str, runs: int = RUNS) -> float:
+    """best time of given code in milliseconds."""
+    return min(time_python(code) for _ in range(runs)) * 1000
+
+
+if __name__ == '__main__':
+    baseline = best_of('pass')
+    import_only = best_of('import shopping_list')
+    first_use = best_of(
+        'import shopping_list as s; c = s.context; '
+        'c.users; c.products; c.discount_codes'
+        )
+    print(f"interpreter:        {baseline:8.2f} ms")
+    print(f"import:             {import_only - baseline:8.2f} ms")
+    print(f"import + first use: {first_use - baseline:8.2f} ms")
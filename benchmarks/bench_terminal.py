@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+# Benchmark: commands per second of store mode ('help', 'products',
+# 'show' in a loop), with the old terminal code (os.system('clear') and
+# reading help file for every 'help') versus ANSI clear + cached messages.
+# output is written to /dev/null, but it's treated as a terminal so the
+# screen is cleared in both cases.
+# run from the root of project: python benchmarks/bench_terminal.py [count]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shopping_list as shop  # noqa E402
+from commands import tokenize  # noqa E402
+
+SCRIPT = 'help; products; show'
+
+
+class NullTerminal:
+    """/dev/null that says it's a terminal."""
+
+    def __init__(self):
+        self.file = open(os.devnull, mode='w')
+
+    def write(self, text):
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def isatty(self) -> bool:
+        return True
+
+
+def old_clear_screen():
+    """clear_screen() before ANSI codes."""
+    return os.system('clear')
+
+
+def old_show_help():
+    """show_help() before the message cache."""
+    with open('./message_files/help_message.txt', mode='r') as help_file:
+        help_message = help_file.read()
+    print(help_message)
+
+
+def per_second(session, count: int) -> float:
+    """commands per second of SCRIPT, run `count` times."""
+    commands = tokenize(SCRIPT)
+    start = time.perf_counter()
+    for _ in range(count):
+        for command in commands:
+            shop.store_commands.dispatch(session, command)
+    return count * len(commands) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    os.environ['TERM'] = 'xterm'
+    session = shop.Session('benchmark', 0)
+    shop.add_item('apple', 2, session.choosen_items)
+
+    # 'clear' writes to the real stdout (file descriptor 1)
+    terminal = os.dup(1)
+    null = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(null, 1)
+    sys.stdout = NullTerminal()
+    try:
+        new = per_second(session, count)
+        shop.clear_screen, shop.show_help = old_clear_screen, old_show_help
+        old = per_second(session, count)
+    finally:
+        sys.stdout = sys.__stdout__
+        os.dup2(terminal, 1)
+
+    print(f"{count} x '{SCRIPT}'\n")
+    print(f"{'terminal':<30} {'commands/s':>12}")
+    print(f"{'os.system clear, file reads':<30} {old:12,.0f}")
+    print(f"{'ANSI clear, cached messages':<30} {new:12,.0f}")
+    print(f"speedup: {new / old:.0f}x")
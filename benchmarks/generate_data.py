@@ -0,0 +1,115 @@
+import os
+import json
+import random
+import argparse
+# Synthetic databases for benchmarks: users, products and discount codes
+# in the layout of the project (<directory>/json_files/*.json).
+#
+# the same seed and sizes always give the same files. files are written
+# one record at a time, so 10M users or products don't have to fit in
+# memory. passwords are plaintext like the fixtures of project (they are
+# hashed on the first login).
+# python benchmarks/generate_data.py <directory> [--users N] [--products N] [--codes N] [--seed N] # noqa E501
+
+CATEGORIES = ('fruit', 'meat', 'electric', 'clothes', 'food')
+LETTERS = 'abcdefghijklmnopqrstuvwxyz0123456789'
+SEED = 1405
+
+
+def username_of(index: int) -> str:
+    """username of generated user with given index."""
+    return f"user{index:08d}"
+
+
+def product_name_of(index: int) -> str:
+    """name of generated product with given index."""
+    return f"product{index:08d}"
+
+
+def write_records(path: str, records):
+    """write (key, record) pairs as one JSON object, record by record."""
+    with open(path, mode='w') as f:
+        f.write('{\n')
+        first = True
+        for key, record in records:
+            if not first:
+                f.write(',\n')
+            first = False
+            f.write(f"    {json.dumps(key)}: {json.dumps(record)}")
+        f.write('\n}\n')
+
+
+def users(count: int, seed: int = SEED):
+    generator = random.Random(seed)
+    for index in range(count):
+        yield username_of(index), {
+            "password": ''.join(generator.choices(LETTERS, k=10)),
+            "balance": generator.randrange(0, 10000000)
+        }
+
+
+def products(count: int, seed: int = SEED):
+    generator = random.Random(seed + 1)
+    for index in range(count):
+        yield product_name_of(index), {
+            "category": generator.choice(CATEGORIES),
+            "price": generator.randrange(1000, 10000000),
+            "amount": generator.randrange(1, 1000)
+        }
+
+
+def discount_codes(count: int, seed: int = SEED):
+    # old format (percent) and rules, see discounts.py
+    generator = random.Random(seed + 2)
+    for index in range(count):
+        code = f"code{index:08d}"
+        percent = generator.randrange(5, 60)
+        if generator.random() < 0.5:
+            yield code, percent
+            continue
+        rule = {"percent": percent, "limit": generator.randrange(1, 10000)}
+        if generator.random() < 0.5:
+            rule['expires'] = "2030-01-01T00:00"
+        if generator.random() < 0.5:
+            rule['categories'] = generator.sample(CATEGORIES, 2)
+        if generator.random() < 0.5:
+            rule['cap'] = generator.randrange(10000, 1000000)
+        yield code, rule
+
+
+def generate(directory: str, users_count: int, products_count: int,
+             codes_count: int, seed: int = SEED):
+    """
+    Write the databases of a synthetic shop.
+
+    Parameters
+    ----------
+    directory: str : directory of shop (json_files is made in it)
+
+    users_count: int : number of users
+
+    products_count: int : number of products
+
+    codes_count: int : number of discount codes
+
+    seed: int : seed of random data (Default value = SEED)
+    """
+    path = os.path.join(directory, 'json_files')
+    os.makedirs(path, exist_ok=True)
+    write_records(os.path.join(path, 'users.json'), users(users_count, seed))
+    write_records(os.path.join(path, 'products.json'),
+                  products(products_count, seed))
+    write_records(os.path.join(path, 'discount_codes.json'),
+                  discount_codes(codes_count, seed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="write synthetic databases")
+    parser.add_argument('directory', help="directory of synthetic shop")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--codes', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=SEED)
+    arguments = parser.parse_args()
+    generate(arguments.directory, arguments.users, arguments.products,
+             arguments.codes, arguments.seed)
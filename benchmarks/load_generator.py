@@ -0,0 +1,75 @@
+import time
+import asyncio
+import argparse
+# Load generator for server mode: many concurrent shoppers.
+# start the server first (python server.py), then run from the root of
+# project: python benchmarks/load_generator.py --shoppers 300
+
+
+async def request(reader, writer, line: str, latencies: list) -> str:
+    """send one command and wait for its response."""
+    start = time.perf_counter()
+    writer.write(line.encode() + b"\n")
+    await writer.drain()
+    response = (await reader.readline()).decode()
+    latencies.append(time.perf_counter() - start)
+    return response
+
+
+async def shopper(arguments, latencies: list, errors: list):
+    """one shopper: login, then add / show / delete items repeatedly."""
+    reader, writer = await asyncio.open_connection(
+        arguments.host, arguments.port
+        )
+    response = await request(
+        reader, writer, f"LOGIN {arguments.user} {arguments.password}",
+        latencies
+        )
+    if not response.startswith('OK'):
+        errors.append(response)
+    for _ in range(arguments.rounds):
+        for line in (f"ADD {arguments.product} 1", "SHOW",
+                     f"DELETE {arguments.product}"):
+            response = await request(reader, writer, line, latencies)
+            if not response.startswith('OK'):
+                errors.append(response.strip())
+    writer.write(b"QUIT\n")
+    await writer.drain()
+    writer.close()
+
+
+def percentile(values: list, percent: float) -> float:
+    """percentile of sorted values."""
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+async def main(arguments):
+    latencies, errors = list(), list()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        shopper(arguments, latencies, errors)
+        for _ in range(arguments.shoppers)
+        ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"shoppers:   {arguments.shoppers}")
+    print(f"requests:   {len(latencies)}")
+    print(f"errors:     {len(errors)}")
+    print(f"throughput: {len(latencies) / elapsed:10.1f} requests/s")
+    print(f"p50:        {percentile(latencies, 50) * 1000:10.3f} ms")
+    print(f"p99:        {percentile(latencies, 99) * 1000:10.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='load generator for server mode'
+        )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--shoppers', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--user', default='test')
+    parser.add_argument('--password', default='test')
+    parser.add_argument('--product', default='cake')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,231 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from statistics import median
+from contextlib import redirect_stdout
+# Benchmark suite: hot functions of shopping list on synthetic shops.
+#
+# for every scale a shop with `scale` users and products is generated
+# (generate_data.py) in a temporary directory, then every benchmark runs
+# in fresh interpreters in that directory:
+#   startup                 first use of users, products, discount codes
+#   products_by_category    products of one category
+#   order_by_amount         cart (CART_SIZE items) ordered by amount
+#   order_by_name           cart ordered by name
+#   show_cart               cart printed (to a buffer)
+#   is_authenticated        first login of a user (plaintext password is
+#                           checked and hashed), then a second login
+#   update_products         save of one changed product
+#   update_user_balance     save of one changed balance
+#   create_account          new account (hash and save)
+# results (milliseconds) are written as JSON with the commit and python
+# version, so runs of different commits can be compared (--compare).
+# python benchmarks/run_suite.py [--scale N ...] [--runs N] [--output results.json] [--compare old.json] # noqa E501
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+from generate_data import generate, username_of, product_name_of  # noqa E402
+
+SCALES = (1000, 100000)
+RUNS = 5
+# most items of carts
+CART_SIZE = 1000
+# ratio of best times that is reported as a regression
+# (best time is the least noisy one)
+REGRESSION = 1.2
+
+
+def timings(samples: list) -> dict:
+    """summary of samples (seconds) in milliseconds."""
+    return {
+        "min_ms": min(samples) * 1000,
+        "median_ms": median(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+        "runs": len(samples),
+    }
+
+
+def measure(function, runs: int, argument_of=None) -> dict:
+    """
+    time function `runs` times.
+
+    Parameters
+    ----------
+    function : function to time
+
+    runs: int : number of calls
+
+    argument_of : function(number of run) that returns the arguments of
+        call (Default value = None, no arguments)
+    """
+    samples = list()
+    for number in range(runs):
+        arguments = argument_of(number) if argument_of else ()
+        start = time.perf_counter()
+        function(*arguments)
+        samples.append(time.perf_counter() - start)
+    return timings(samples)
+
+
+def startup_sample() -> float:
+    """first use of shop data (runs in a fresh interpreter)."""
+    start = time.perf_counter()
+    import shopping_list as shop
+    context = shop.context
+    context.users, context.products, context.discount_codes
+    return time.perf_counter() - start
+
+
+def worker(scale: int, runs: int) -> dict:
+    """benchmarks of hot functions (runs in the directory of shop)."""
+    import shopping_list as shop
+    from cart import Cart
+    context = shop.context
+    users, products = context.users, context.products
+    cart = Cart(price_of=shop.product_price)
+    for index in range(min(scale, CART_SIZE)):
+        cart[product_name_of(index)] = 1 + index % 7
+    output = io.StringIO()
+
+    def show_cart():
+        with redirect_stdout(output):
+            shop.show_cart(cart, 'price')
+        output.seek(0)
+        output.truncate()
+
+    def login(number):
+        username = username_of(number % scale)
+        return username, users[username]['password'], users
+
+    # every run logs in another user (limit of login attempts)
+    first_logins = [login(number) for number in range(runs)]
+    results = {
+        "products_by_category": measure(
+            shop.products_by_category, runs, lambda _: ('fruit', products)
+            ),
+        "order_by_amount": measure(
+            shop.order_by_amount, runs, lambda _: (cart,)
+            ),
+        "order_by_name": measure(shop.order_by_name, runs, lambda _: (cart,)),
+        "show_cart": measure(show_cart, runs),
+        "is_authenticated": measure(
+            shop.is_authenticated, runs, first_logins.__getitem__
+            ),
+    }
+    # passwords have been hashed by the first logins
+    results["is_authenticated_again"] = measure(
+        shop.is_authenticated, runs, first_logins.__getitem__
+        )
+    name = product_name_of(0)
+    results["update_products"] = measure(
+        shop.update_products, runs, lambda _: (products, [name])
+        )
+    username = username_of(0)
+    results["update_user_balance"] = measure(
+        shop.update_user_balance, runs,
+        lambda number: (users[username]['balance'] + number, username, users)
+        )
+    results["create_account"] = measure(
+        shop.create_account, runs,
+        lambda number: (f"newuser{number}", "password", users)
+        )
+    return results
+
+
+def run_python(directory: str, code: str) -> str:
+    """run code in a fresh interpreter in directory of shop, return stdout."""
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    done = subprocess.run(
+        [sys.executable, '-c', code], cwd=directory, env=environment,
+        check=True, capture_output=True, text=True
+        )
+    return done.stdout
+
+
+def run_scale(scale: int, runs: int, codes: int) -> dict:
+    """every benchmark with a shop of given scale."""
+    directory = tempfile.mkdtemp(prefix=f'shop-{scale}-')
+    try:
+        start = time.perf_counter()
+        generate(directory, scale, scale, codes)
+        print(f"scale {scale}: data generated in "
+              f"{time.perf_counter() - start:.1f} s", file=sys.stderr)
+        prelude = f"import sys; sys.path.insert(0, {os.path.join(ROOT, 'benchmarks')!r}); import run_suite; " # noqa E501
+        samples = [
+            float(run_python(directory, prelude + "print(run_suite.startup_sample())")) # noqa E501
+            for _ in range(runs)
+        ]
+        results = {"startup": timings(samples)}
+        results.update(json.loads(run_python(
+            directory,
+            prelude + f"import json; print(json.dumps(run_suite.worker({scale}, {runs})))" # noqa E501
+            )))
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+
+def commit() -> str:
+    """commit of project (None outside of git)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, check=True,
+            capture_output=True, text=True
+            ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict) -> str:
+    """table of best times of two result files."""
+    rows = [f"{'scale':>9} {'benchmark':<24} {'old ms':>10} {'new ms':>10} {'ratio':>7}"] # noqa E501
+    for scale, results in new['results'].items():
+        for name, result in results.items():
+            previous = old['results'].get(scale, {}).get(name)
+            if previous is None:
+                continue
+            ratio = result['min_ms'] / previous['min_ms'] \
+                if previous['min_ms'] else float('inf')
+            flag = '  regression' if ratio > REGRESSION else ''
+            rows.append(f"{scale:>9} {name:<24} {previous['min_ms']:10.3f} {result['min_ms']:10.3f} {ratio:7.2f}{flag}") # noqa E501
+    return '\n'.join(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark suite")
+    parser.add_argument('--scale', type=int, action='append',
+                        help="users and products of shop (repeatable, "
+                        f"default: {', '.join(map(str, SCALES))})")
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--codes', type=int, default=1000,
+                        help="number of discount codes")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="results of an older run")
+    arguments = parser.parse_args()
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "runs": arguments.runs,
+        "results": {
+            str(scale): run_scale(scale, arguments.runs, arguments.codes)
+            for scale in arguments.scale or SCALES
+        },
+    }
+    with open(arguments.output, mode='w') as f:
+        json.dump(report, f, indent=4)
+    for scale, results in report['results'].items():
+        for name, result in results.items():
+            print(f"{scale:>9} {name:<24} {result['median_ms']:10.3f} ms (median)") # noqa E501
+    if arguments.compare:
+        with open(arguments.compare, mode='r') as f:
+            print('\n' + compare(json.load(f), report))
@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import random
+import tempfile
+import multiprocessing
+# Stress test: many processes buy from the same JSON databases.
+# every process loads the databases once (its copy gets stale), then buys
+# random items. at the end stock must be conserved:
+#   initial stock == stock in file + items bought by all processes
+# and money too, and no stock may be negative.
+# run from the root of project:
+#   python benchmarks/stress_json_locking.py [processes] [purchases]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import JSONStorage  # noqa E402
+
+PRODUCTS = 5
+STOCK = 200
+PRICE = 100
+BALANCE = 10 ** 9
+
+
+def shopper(number: int, users_path: str, products_path: str,
+            purchases: int) -> tuple:
+    """buy `purchases` times, return (bought items, spent money)."""
+    storage = JSONStorage(users_path, products_path)
+    users = storage.load_users()
+    products = storage.load_products()
+    username = f"user{number}"
+    generator = random.Random(number)
+    bought, spent = dict(), 0
+    for _ in range(purchases):
+        name = f"product{generator.randrange(PRODUCTS)}"
+        amount = generator.randrange(1, 4)
+        # the check of store mode, with the (stale) copy of this process
+        if products[name]['amount'] - amount < 0:
+            continue
+        products[name]['amount'] -= amount
+        users[username]['balance'] -= amount * PRICE
+        if storage.checkout(username, users, products, {name: amount}):
+            bought[name] = bought.get(name, 0) + amount
+            spent += amount * PRICE
+        else:
+            # sold out by other processes
+            products[name]['amount'] += amount
+            users[username]['balance'] += amount * PRICE
+    return bought, spent
+
+
+if __name__ == '__main__':
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    purchases = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    with tempfile.TemporaryDirectory() as directory:
+        users_path = os.path.join(directory, 'users.json')
+        products_path = os.path.join(directory, 'products.json')
+        with open(users_path, mode='w') as f:
+            json.dump({f"user{number}": {"password": "x", "balance": BALANCE}
+                       for number in range(processes)}, f)
+        with open(products_path, mode='w') as f:
+            json.dump({f"product{index}": {"category": "stress",
+                                           "price": PRICE, "amount": STOCK}
+                       for index in range(PRODUCTS)}, f)
+
+        # errors of processes (e.g. reading a half written file) are
+        # raised here
+        with multiprocessing.Pool(processes) as pool:
+            reports = pool.starmap(shopper, [
+                (number, users_path, products_path, purchases)
+                for number in range(processes)
+            ])
+
+        with open(products_path) as f:
+            products = json.load(f)
+        with open(users_path) as f:
+            users = json.load(f)
+        bought = sum(sum(items.values()) for items, _ in reports)
+        spent = sum(money for _, money in reports)
+        left = sum(information['amount'] for information in products.values()) # noqa E501
+        paid = sum(BALANCE - user['balance'] for user in users.values())
+        print(f"{processes} processes x {purchases} purchases")
+        print(f"stock: initial {PRODUCTS * STOCK}, bought {bought}, "
+              f"left {left}")
+        print(f"money: spent {spent}, taken from balances {paid}")
+        conserved = PRODUCTS * STOCK == bought + left and spent == paid and \
+            all(information['amount'] >= 0 for information in products.values()) # noqa E501
+        print("OK: stock and money are conserved." if conserved
+              else "FAILED: updates have been lost!")
+        sys.exit(0 if conserved else 1)
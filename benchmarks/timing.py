@@ -0,0 +1,19 @@
+import time
+# Timing helpers of benchmarks (times are in milliseconds).
+
+
+def timed(function, *args, **kwargs):
+    """result of one call of function and its time."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def best_of(function, *args, runs: int = 20) -> float:
+    """best time of `runs` calls of function."""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import mmap
+import zlib
+import struct
+from functools import cached_property
+from collections.abc import MutableMapping
+from catalog import Catalog, ProductRow
+from pricing import to_minor, to_tomans
+# Binary catalog: products in a memory mapped file.
+#
+# layout of file (little endian):
+#   header          magic, version, number of products, number of index
+#                   slots, width of names, offsets of the parts below
+#   records         one fixed width record per product (in the order of
+#                   products.json): name (utf-8, padded with zeros),
+#                   price (minor units), amount, number of category
+#   index           open addressing hash table (crc32 of name), every slot
+#                   is number of record + 1 (0 is empty)
+#   categories      JSON list of category names
+# opening the file only reads the header and the categories, a lookup
+# reads one slot of index and one record, so startup doesn't depend on
+# the number of products.
+
+BINARY_CATALOG_PATH = os.environ.get(
+    'SHOPPING_LIST_BINARY_CATALOG', './json_files/products.bin'
+    )
+
+MAGIC = b'SLCATLG\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIIQQQ')
+# price, amount, number of category (after the name)
+FIELDS = struct.Struct('<qqI')
+SLOT = struct.Struct('<I')
+
+
+def record_struct(name_width: int) -> struct.Struct:
+    """struct of one record with given width of names."""
+    return struct.Struct(f'<{name_width}sqqI')
+
+
+def build_binary_catalog(products_database: dict,
+                         path: str = BINARY_CATALOG_PATH):
+    """
+    Write products to a binary catalog file.
+
+    Parameters
+    ----------
+    products_database: dict : database of products
+
+    path: str : path of binary catalog (Default value = BINARY_CATALOG_PATH)
+
+
+    Returns
+    -------
+
+    """
+    names = [name.encode() for name in products_database]
+    name_width = max((len(name) for name in names), default=1)
+    record = record_struct(name_width)
+    # index is at most half full
+    slots = max(8, 2 * len(names))
+    categories = list()
+    category_numbers = dict()
+    records_offset = HEADER.size
+    index_offset = records_offset + record.size * len(names)
+    categories_offset = index_offset + SLOT.size * slots
+
+    index = bytearray(SLOT.size * slots)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, mode='wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(names), slots, name_width,
+                            records_offset, index_offset, categories_offset))
+        for number, (name, encoded) in enumerate(
+                zip(products_database, names)):
+            information = products_database[name]
+            category = information['category']
+            if category not in category_numbers:
+                category_numbers[category] = len(categories)
+                categories.append(category)
+            f.write(record.pack(
+                encoded, to_minor(information['price']),
+                information['amount'], category_numbers[category]
+                ))
+            slot = zlib.crc32(encoded) % slots
+            while SLOT.unpack_from(index, slot * SLOT.size)[0]:
+                slot = (slot + 1) % slots
+            SLOT.pack_into(index, slot * SLOT.size, number + 1)
+        f.write(index)
+        f.write(json.dumps(categories).encode())
+    os.replace(temporary_path, path)
+
+
+class BinaryProducts(MutableMapping):
+    """
+    Products of a binary catalog (name -> ProductRow).
+    the file is mapped copy-on-write: changes of stock in memory don't
+    reach the file until they are written by write_fields(). stock is
+    written as a change of the amount in file, so sales of other processes
+    are kept.
+    products can be changed, but not added or removed (build the file
+    again for that).
+    """
+
+    def __init__(self, path: str = BINARY_CATALOG_PATH, catalog=None):
+        self.path = path
+        self.catalog = catalog
+        self.file = open(path, mode='r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+        (magic, version, self.count, self.slots, self.name_width,
+         self.records_offset, self.index_offset,
+         categories_offset) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} isn't a binary catalog")
+        self.record = record_struct(self.name_width)
+        self.category_names = [
+            sys.intern(category)
+            for category in json.loads(self.map[categories_offset:])
+        ]
+        self.category_number_of = {
+            category: number
+            for number, category in enumerate(self.category_names)
+        }
+        # name -> offset of record, for names that have been looked up
+        self.offsets = dict()
+        # name -> amount as this process has seen it (before its first
+        # change, or at its last write), the base of merges
+        self.base = dict()
+
+    def _offset(self, name: str) -> int:
+        offset = self.offsets.get(name)
+        if offset is not None:
+            return offset
+        encoded = name.encode() if isinstance(name, str) else b''
+        if not encoded or len(encoded) > self.name_width:
+            raise KeyError(name)
+        padded = encoded.ljust(self.name_width, b'\0')
+        slot = zlib.crc32(encoded) % self.slots
+        while True:
+            number = SLOT.unpack_from(
+                self.map, self.index_offset + slot * SLOT.size
+                )[0]
+            if not number:
+                raise KeyError(name)
+            offset = self.records_offset + (number - 1) * self.record.size
+            if self.map[offset:offset + self.name_width] == padded:
+                self.offsets[name] = offset
+                return offset
+            slot = (slot + 1) % self.slots
+
+    def field(self, name: str, key):
+        """value of one field of product."""
+        price, amount, category = FIELDS.unpack_from(
+            self.map, self._offset(name) + self.name_width
+            )
+        if key == 'amount':
+            return amount
+        if key == 'price':
+            return to_tomans(price)
+        if key == 'category':
+            return self.category_names[category]
+        raise KeyError(key)
+
+    def set_field(self, name: str, key, value):
+        """change one field of product (in memory)."""
+        offset = self._offset(name) + self.name_width
+        price, amount, category = FIELDS.unpack_from(self.map, offset)
+        if key == 'amount':
+            self.base.setdefault(name, amount)
+            amount = value
+        elif key == 'price':
+            price = to_minor(value)
+        elif key == 'category':
+            if value not in self.category_number_of:
+                raise ValueError(f"new category {value!r} (build the binary catalog again)") # noqa E501
+            category = self.category_number_of[value]
+        else:
+            raise KeyError(key)
+        FIELDS.pack_into(self.map, offset, price, amount, category)
+
+    def write_fields(self, products_database, names,
+                     check_stock: bool = False) -> bool:
+        """
+        Write fields of given products to the file, in place.
+        the file lock of catalog must be held (see storage.file_locks).
+        amounts are merged: the change of amount since the base is added
+        to the amount in file.
+
+        Parameters
+        ----------
+        products_database : products whose values are written (e.g. the
+            catalog, or PersistedStock of it)
+
+        names : names of products
+
+        check_stock: bool : write nothing if an amount would be less than
+            zero (Default value = False)
+
+
+        Returns
+        -------
+        Return False if other processes have sold the stock.
+        """
+        records = list()
+        for name in names:
+            information = products_database[name]
+            offset = self._offset(name) + self.name_width
+            amount = information['amount']
+            theirs = FIELDS.unpack(
+                os.pread(self.file.fileno(), FIELDS.size, offset)
+                )[1]
+            merged = theirs + (amount - self.base.get(name, amount))
+            if check_stock and merged < 0:
+                return False
+            records.append((name, offset, information, amount, merged))
+        for name, offset, information, amount, merged in records:
+            self.file.seek(offset)
+            self.file.write(FIELDS.pack(
+                to_minor(information['price']), merged,
+                self.category_number_of[information['category']]
+                ))
+            self.base[name] = amount
+        self.file.flush()
+        return True
+
+    def __getitem__(self, name: str) -> ProductRow:
+        self._offset(name)
+        return ProductRow(self, name)
+
+    def __setitem__(self, name: str, information):
+        self._offset(name)
+        for key in ('category', 'price', 'amount'):
+            self.set_field(name, key, information[key])
+
+    def __delitem__(self, name: str):
+        raise TypeError("products of binary catalog can't be removed")
+
+    def __iter__(self):
+        for number in range(self.count):
+            offset = self.records_offset + number * self.record.size
+            yield self.map[offset:offset + self.name_width].rstrip(b'\0').decode() # noqa E501
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, name) -> bool:
+        try:
+            self._offset(name)
+        except KeyError:
+            return False
+        return True
+
+    def close(self):
+        """unmap and close the file."""
+        self.map.close()
+        self.file.close()
+
+
+class BinaryCatalog(Catalog):
+    """
+    Catalog of a binary catalog file.
+    indexes (categories, prices, names) are built on their first use,
+    so opening the catalog costs the same for any number of products.
+    """
+
+    def __init__(self, path: str = BINARY_CATALOG_PATH):
+        self.products = BinaryProducts(path, catalog=self)
+
+    @cached_property
+    def categories(self) -> dict:
+        categories = dict()
+        for name in self.products:
+            categories.setdefault(self.products.field(name, 'category'), dict())[name] = None # noqa E501
+        return categories
+
+    @cached_property
+    def names(self) -> list:
+        return sorted(self.products)
+
+    @cached_property
+    def price_order(self) -> list:
+        return sorted(
+            self.names, key=lambda name: self.products.field(name, 'price')
+            )
+
+    def __setitem__(self, name: str, information: dict):
+        record = self.products[name]
+        for key in ('category', 'price', 'amount'):
+            record[key] = information[key]
+
+    def __delitem__(self, name: str):
+        raise TypeError("products of binary catalog can't be removed")
+
+    def close(self):
+        """close the file of catalog."""
+        self.products.close()
+
+
+if __name__ == '__main__':
+    # python binary_catalog.py build [products.json] [products.bin]
+    if sys.argv[1:2] == ['build']:
+        source = sys.argv[2] if len(sys.argv) > 2 else './json_files/products.json' # noqa E501
+        target = sys.argv[3] if len(sys.argv) > 3 else BINARY_CATALOG_PATH
+        with open(source, mode='r') as f:
+            build_binary_catalog(json.load(f), target)
+        print(f"{source} converted to {target}")
+    else:
+        print("usage: python binary_catalog.py build [products.json] [products.bin]") # noqa E501
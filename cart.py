@@ -0,0 +1,147 @@
+from bisect import bisect_left, insort
+from collections.abc import MutableMapping
+from pricing import PricingEngine, to_tomans
+# Cart of store mode with sorted views that are kept up to date.
+
+# orders of showing items in cart
+ORDERS = ('default', 'name', 'amount', 'price', 'total')
+
+
+class Cart(MutableMapping):
+    """
+    Items of cart (name -> amount).
+    besides the order of adding (default), the cart keeps sorted lists of
+    items by name, amount, price and total price (price * amount).
+    adding or removing an item updates them with a binary search, so
+    showing the cart in any order is O(n).
+    price of an item is read when it's added to the cart, changing the
+    amount of it later keeps that price (reprice() reads them again).
+    amounts and prices are also kept in a PricingEngine, which computes
+    the total price in integer minor units.
+    """
+
+    def __init__(self, price_of, items: dict = None):
+        """
+        Parameters
+        ----------
+        price_of : function that returns the price of given product
+
+        items: dict : first items of cart (Default value = None)
+        """
+        self.price_of = price_of
+        self.amounts = dict()
+        # price of items when they were added
+        self.prices = dict()
+        self.by_name = list()
+        self.by_amount = list()
+        self.by_price = list()
+        self.by_total = list()
+        # columns of amounts and prices (total price, discounts)
+        self.pricing = PricingEngine()
+        for name, amount in (items or dict()).items():
+            self[name] = amount
+
+    def _keys(self, name: str) -> tuple:
+        amount, price = self.amounts[name], self.prices[name]
+        return (
+            (self.by_name, name),
+            (self.by_amount, (amount, name)),
+            (self.by_price, (price, name)),
+            (self.by_total, (price * amount, name)),
+        )
+
+    def __getitem__(self, name: str) -> int:
+        return self.amounts[name]
+
+    def _unindex(self, name: str):
+        for view, key in self._keys(name):
+            del view[bisect_left(view, key)]
+
+    def __setitem__(self, name: str, amount: int):
+        # changed item keeps its place in default order
+        # and its price, more units are charged with the same price
+        if name in self.amounts:
+            self._unindex(name)
+        else:
+            self.prices[name] = self.price_of(name)
+        self.amounts[name] = amount
+        for view, key in self._keys(name):
+            insort(view, key)
+        self.pricing.set_line(name, amount, self.prices[name])
+
+    def __delitem__(self, name: str):
+        self._unindex(name)
+        del self.amounts[name]
+        del self.prices[name]
+        self.pricing.remove_line(name)
+
+    def __iter__(self):
+        return iter(self.amounts)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __contains__(self, name) -> bool:
+        return name in self.amounts
+
+    def clear(self):
+        """remove all items."""
+        for items in (self.amounts, self.prices):
+            items.clear()
+        for view in (self.by_name, self.by_amount,
+                     self.by_price, self.by_total):
+            view.clear()
+        self.pricing.clear()
+
+    @property
+    def total_price(self):
+        """total price of items in cart (tomans)."""
+        return to_tomans(self.pricing.total())
+
+    def reprice(self):
+        """
+        Read the prices of all items again (after price updates).
+        the sorted views are built again with one sort each.
+        """
+        for name in self.amounts:
+            self.prices[name] = self.price_of(name)
+        self.pricing.reprice(self.prices.__getitem__)
+        views = (self.by_name, self.by_amount, self.by_price, self.by_total)
+        for view in views:
+            view.clear()
+        for name in self.amounts:
+            for view, key in self._keys(name):
+                view.append(key)
+        for view in views:
+            view.sort()
+
+    def names_in_order(self, order: str = 'default'):
+        """
+        generator of names of items in given order (increasing).
+        unknown orders are shown as default.
+        """
+        if order == 'name':
+            return iter(self.by_name)
+        if order == 'amount':
+            return (name for _, name in self.by_amount)
+        if order == 'price':
+            return (name for _, name in self.by_price)
+        if order == 'total':
+            return (name for _, name in self.by_total)
+        return iter(self.amounts)
+
+    def ordered(self, order: str = 'default') -> dict:
+        """
+        Items of cart in given order.
+
+        Parameters
+        ----------
+        order: str : one of ORDERS (Default value = 'default')
+            unknown orders are shown as default.
+
+
+        Returns
+        -------
+        dictionary of items (name -> amount) in given order (increasing).
+        """
+        return {name: self.amounts[name] for name in self.names_in_order(order)} # noqa E501
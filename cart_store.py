@@ -0,0 +1,125 @@
+import os
+import json
+from urllib.parse import quote
+from storage import file_locks
+# Saved carts (store mode) and shopping lists (list mode) of users.
+#
+# every user has a small JSONL file in CARTS_PATH (not in users.json), and
+# every change of a line is appended to it:
+#   {"kind": "cart", "item": "apple", "amount": 3}
+#   {"kind": "list", "item": "milk", "price": 100, "amount": 2}
+#   {"kind": "cart", "item": "apple", "amount": 0}      (removed / bought)
+#   {"kind": "cart", "clear": true}                     (cleared)
+# loading a cart reads only the file of that user (the last change of a
+# line wins). files with many old changes are rewritten when loaded.
+
+CARTS_PATH = os.environ.get('SHOPPING_LIST_CARTS', './json_files/carts')
+
+# file of user is rewritten when it has this many more changes than lines
+COMPACT_SLACK = 64
+
+# kinds of lines
+CART = 'cart'
+LIST = 'list'
+
+
+class CartStore:
+    """Saved lines of carts and shopping lists (one file per user)."""
+
+    def __init__(self, path: str = CARTS_PATH):
+        self.path = path
+
+    def user_path(self, username) -> str:
+        """path of the file of user (username is quoted for file names)."""
+        return os.path.join(self.path, quote(username, safe='') + '.jsonl')
+
+    def _append(self, username, records: list):
+        os.makedirs(self.path, exist_ok=True)
+        path = self.user_path(username)
+        with file_locks(path), open(path, mode='a') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+
+    def load(self, username) -> dict:
+        """
+        Saved lines of user.
+
+        Parameters
+        ----------
+        username : username of user
+
+
+        Returns
+        -------
+        {CART: {item: record}, LIST: {item: record}}
+        (record is the last change of line, with 'amount' and 'price')
+        """
+        lines = {CART: dict(), LIST: dict()}
+        path = self.user_path(username)
+        if not os.path.exists(path):
+            return lines
+        changes = 0
+        with file_locks(path):
+            with open(path, mode='r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # last line of a crashed write
+                        continue
+                    changes += 1
+                    kind = lines.setdefault(record['kind'], dict())
+                    if record.get('clear'):
+                        kind.clear()
+                    elif record.get('amount'):
+                        kind[record['item']] = record
+                    else:
+                        kind.pop(record['item'], None)
+            live = sum(len(kind) for kind in lines.values())
+            if changes > live + COMPACT_SLACK:
+                self._rewrite(path, lines)
+        return lines
+
+    def _rewrite(self, path: str, lines: dict):
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, mode='w') as f:
+            for kind in lines.values():
+                f.write(''.join(
+                    json.dumps(record) + '\n' for record in kind.values()
+                    ))
+        os.replace(temporary_path, path)
+
+    def save_line(self, username, kind: str, item: str, amount: int,
+                  price=None):
+        """
+        Save the new amount of one line (0 removes the line).
+
+        Parameters
+        ----------
+        username : username of user
+
+        kind: str : CART or LIST
+
+        item: str : name of item
+
+        amount: int : amount of item
+
+        price : price of item (shopping lists) (Default value = None)
+        """
+        record = {"kind": kind, "item": item, "amount": amount}
+        if price is not None:
+            record['price'] = price
+        self._append(username, [record])
+
+    def remove_line(self, username, kind: str, item: str):
+        """remove one line."""
+        self.save_line(username, kind, item, 0)
+
+    def remove_lines(self, username, kind: str, items):
+        """remove given lines in one write (e.g. bought items of cart)."""
+        self._append(username, [
+            {"kind": kind, "item": item, "amount": 0} for item in items
+        ])
+
+    def clear(self, username, kind: str):
+        """remove every line of given kind (e.g. cart after purchase)."""
+        self._append(username, [{"kind": kind, "clear": True}])
@@ -0,0 +1,381 @@
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import cached_property
+from collections.abc import Mapping, MutableMapping
+from pricing import to_minor, to_tomans
+from search import TrigramIndex
+# Catalog of products with secondary indexes.
+
+# how products are kept in memory:
+#   'records' (default): one small ProductRecord object per product
+#   'arrays': columns of prices, amounts and category numbers (ProductArrays)
+CATALOG_STORE = os.environ.get('SHOPPING_LIST_CATALOG', 'records').lower()
+
+# fields of a product
+FIELDS = ('category', 'price', 'amount')
+
+
+class ProductRecord(Mapping):
+    """
+    Information of one product ({'category', 'price', 'amount'}).
+    changing the category or price updates the indexes of its catalog.
+    fields are slots, so a record is much smaller than a dictionary.
+    """
+
+    __slots__ = ('catalog', 'name', 'category', 'price', 'amount')
+
+    def __init__(self, catalog, name: str, information: Mapping):
+        self.catalog = catalog
+        self.name = name
+        # categories are repeated a lot, every one is kept once
+        self.category = sys.intern(information['category'])
+        self.price = information['price']
+        self.amount = information['amount']
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in FIELDS:
+            raise KeyError(key)
+        if key != 'amount' and self.catalog is not None:
+            self.catalog._unindex(self.name, self)
+            setattr(self, key, value)
+            self.catalog._index(self.name, self)
+        else:
+            old = self.amount
+            setattr(self, key, value)
+            if self.catalog is not None:
+                self.catalog._stock_changed(self.name, value, old)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __reduce__(self):
+        # copies and pickles are plain dictionaries
+        return dict, (dict(self),)
+
+
+class ProductRow(Mapping):
+    """
+    Information of one product of ProductArrays (same as ProductRecord).
+    rows are made on access and only keep the name of product.
+    """
+
+    __slots__ = ('store', 'name')
+
+    def __init__(self, store, name: str):
+        self.store = store
+        self.name = name
+
+    def __getitem__(self, key):
+        return self.store.field(self.name, key)
+
+    def __setitem__(self, key, value):
+        catalog = self.store.catalog
+        if key != 'amount' and catalog is not None:
+            catalog._unindex(self.name, self)
+            self.store.set_field(self.name, key, value)
+            catalog._index(self.name, self)
+        else:
+            old = self.store.field(self.name, 'amount')
+            self.store.set_field(self.name, key, value)
+            if catalog is not None:
+                catalog._stock_changed(self.name, value, old)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class ProductArrays(MutableMapping):
+    """
+    Products (name -> ProductRow) kept as a struct of arrays:
+        names                   row -> name of product
+        prices                  array of prices (minor units)
+        amounts                 array of amounts
+        category_numbers        array of numbers of categories
+    every category name is kept once (category_names).
+    removing a product moves the last row into its place.
+    """
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog
+        self.names = list()
+        self.rows = dict()
+        self.prices = array('q')
+        self.amounts = array('q')
+        self.category_numbers = array('I')
+        self.category_names = list()
+        self.category_number_of = dict()
+
+    def _category_number(self, category: str) -> int:
+        number = self.category_number_of.get(category)
+        if number is None:
+            number = self.category_number_of[category] = len(self.category_names) # noqa E501
+            self.category_names.append(sys.intern(category))
+        return number
+
+    def field(self, name: str, key):
+        """value of one field of product."""
+        row = self.rows[name]
+        if key == 'amount':
+            return self.amounts[row]
+        if key == 'price':
+            return to_tomans(self.prices[row])
+        if key == 'category':
+            return self.category_names[self.category_numbers[row]]
+        raise KeyError(key)
+
+    def set_field(self, name: str, key, value):
+        """change one field of product."""
+        row = self.rows[name]
+        if key == 'amount':
+            self.amounts[row] = value
+        elif key == 'price':
+            self.prices[row] = to_minor(value)
+        elif key == 'category':
+            self.category_numbers[row] = self._category_number(value)
+        else:
+            raise KeyError(key)
+
+    def __getitem__(self, name: str) -> ProductRow:
+        if name not in self.rows:
+            raise KeyError(name)
+        return ProductRow(self, name)
+
+    def __setitem__(self, name: str, information: Mapping):
+        row = self.rows.get(name)
+        if row is None:
+            self.rows[name] = len(self.names)
+            self.names.append(name)
+            self.prices.append(to_minor(information['price']))
+            self.amounts.append(information['amount'])
+            self.category_numbers.append(
+                self._category_number(information['category'])
+                )
+        else:
+            self.prices[row] = to_minor(information['price'])
+            self.amounts[row] = information['amount']
+            self.category_numbers[row] = self._category_number(
+                information['category']
+                )
+
+    def __delitem__(self, name: str):
+        row = self.rows.pop(name)
+        last = len(self.names) - 1
+        if row != last:
+            moved = self.names[last]
+            self.names[row] = moved
+            self.prices[row] = self.prices[last]
+            self.amounts[row] = self.amounts[last]
+            self.category_numbers[row] = self.category_numbers[last]
+            self.rows[moved] = row
+        self.names.pop()
+        self.prices.pop()
+        self.amounts.pop()
+        self.category_numbers.pop()
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, name) -> bool:
+        return name in self.rows
+
+
+class Catalog(MutableMapping):
+    """
+    Products database (name -> information) with indexes:
+        category -> names           (products of category in O(1))
+        names sorted by price       (products in a price range)
+        sorted names                (products whose name starts with text)
+        trigrams of names           (names with typos, built on first use)
+    indexes are updated on every change of a product. the amount of
+    products is only followed by a StockMonitor (inventory.py), if the
+    catalog has one.
+    """
+
+    # monitor of low stock (set by StockMonitor.watch)
+    stock_monitor = None
+
+    def __init__(self, products_database: dict = None,
+                 store: str = CATALOG_STORE):
+        """
+        Parameters
+        ----------
+        products_database: dict : products (Default value = None)
+
+        store: str : 'records' or 'arrays' (Default value = CATALOG_STORE)
+        """
+        if store == 'arrays':
+            self.products = ProductArrays(self)
+        else:
+            self.products = dict()
+        # category -> {name: None} (dict keeps the order of products)
+        self.categories = dict()
+        # bulk load: indexes are sorted once at the end
+        for name, information in (products_database or dict()).items():
+            record = self._store(name, information)
+            self.categories.setdefault(record['category'], dict())[name] = None # noqa E501
+        self.names = sorted(self.products)
+        # names sorted by (price, name), prices are read from the records
+        # (no tuple per product). sort is stable, so sorting the sorted
+        # names by price is enough.
+        self.price_order = sorted(
+            self.names, key=lambda name: self.products[name]['price']
+            )
+
+    def _store(self, name: str, information: Mapping):
+        if isinstance(self.products, ProductArrays):
+            self.products[name] = information
+        else:
+            self.products[name] = ProductRecord(self, name, information)
+        return self.products[name]
+
+    def _price_key(self, name: str) -> tuple:
+        return self.products[name]['price'], name
+
+    def _index(self, name: str, information: dict):
+        self.categories.setdefault(information['category'], dict())[name] = None # noqa E501
+        insort(self.price_order, name, key=self._price_key)
+
+    def _unindex(self, name: str, information: dict):
+        category = self.categories[information['category']]
+        del category[name]
+        if not category:
+            del self.categories[information['category']]
+        del self.price_order[bisect_left(
+            self.price_order, (information['price'], name), key=self._price_key
+            )]
+
+    def __getitem__(self, name: str) -> ProductRecord:
+        return self.products[name]
+
+    def __setitem__(self, name: str, information: dict):
+        if name in self.products:
+            del self[name]
+        self._index(name, self._store(name, information))
+        insort(self.names, name)
+        if 'search_index' in self.__dict__:
+            self.search_index.add(name)
+        if self.stock_monitor is not None:
+            self.stock_monitor.update(name, information['amount'])
+
+    def __delitem__(self, name: str):
+        record = self.products[name]
+        self._unindex(name, record)
+        del self.products[name]
+        del self.names[bisect_left(self.names, name)]
+        if 'search_index' in self.__dict__:
+            self.search_index.remove(name)
+        if self.stock_monitor is not None:
+            self.stock_monitor.remove(name)
+        if isinstance(record, ProductRecord):
+            record.catalog = None
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def __contains__(self, name) -> bool:
+        return name in self.products
+
+    @cached_property
+    def search_index(self) -> TrigramIndex:
+        """trigram index of names (see search.py)."""
+        return TrigramIndex(self.names)
+
+    def by_category(self, category_name: str) -> dict:
+        """
+        products of given category.
+
+        Parameters
+        ----------
+        category_name : name of category
+
+
+        Returns
+        -------
+        dictionary of products in given category
+        """
+        return {
+            name: self.products[name]
+            for name in self.categories.get(category_name, ())
+        }
+
+    def names_of_category(self, category_name: str):
+        """names of products in given category (without copying)."""
+        return iter(self.categories.get(category_name, ()))
+
+    def count_of_category(self, category_name: str) -> int:
+        """number of products in given category."""
+        return len(self.categories.get(category_name, ()))
+
+    def by_price(self, low: float, high: float) -> dict:
+        """
+        products whose price is between low and high (increasing price).
+
+        Parameters
+        ----------
+        low: float : lowest price
+
+        high: float : highest price
+
+
+        Returns
+        -------
+        dictionary of products in given price range
+        """
+        start = bisect_left(self.price_order, (low, ''), key=self._price_key)
+        stop = bisect_right(
+            self.price_order, (high, chr(0x10ffff)), key=self._price_key
+            )
+        return {name: self.products[name] for name in self.price_order[start:stop]} # noqa E501
+
+    def by_prefix(self, prefix: str) -> dict:
+        """
+        products whose name starts with given prefix (alphabetic).
+
+        Parameters
+        ----------
+        prefix : start of name
+
+
+        Returns
+        -------
+        dictionary of products whose name starts with prefix
+        """
+        start = bisect_left(self.names, prefix)
+        stop = bisect_left(self.names, prefix + chr(0x10ffff))
+        return {name: self.products[name] for name in self.names[start:stop]}
+
+    def _stock_changed(self, name: str, amount: int, old: int):
+        if self.stock_monitor is not None:
+            self.stock_monitor.update(name, amount, old)
+
+    def set_price(self, name: str, price):
+        """change the price of product. (indexes are updated)"""
+        self.products[name]['price'] = price
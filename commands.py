@@ -0,0 +1,137 @@
+from enum import Enum
+from typing import NamedTuple
+# Commands: tokenizer and dispatch tables of commands.
+#
+# a line of input is split once into commands (separated by ';') and every
+# command into its words. the first word (verb) selects the handler of
+# command with one dictionary lookup:
+#   apple 3; tea 2; show   -->   ('apple', ('3',)), ('tea', ('2',)),
+#                                ('show', ())
+# store mode, list mode and server mode have their own CommandTable.
+
+# separator of commands in one line (scripts)
+SEPARATOR = ';'
+
+# signals that handlers return to the loop of mode
+# (None means continue with the next command)
+LEAVE = 'leave'   # leave the mode (exit, logout, after purchase)
+QUIT = 'quit'     # quit the program
+
+
+# Commands of program (Using Enum)
+class Command(Enum):
+    EXIT = ('quit', 'q', 'ex', 'exit')
+    PRODUCTS = ('prods', 'products', 'product')
+    DELETE = "delete"
+    SHOW = "show"
+    HELP = "help"
+    BUY = 'buy'
+    ADDMONEY = "addmoney"
+    CATEGORY = ('category', 'categories')
+    LOGOUT = 'logout'
+    PAGE = 'page'
+    NEXT = 'next'
+    STATS = 'stats'
+    ORDER = 'order'
+    SEARCH = 'search'
+    HISTORY = 'history'
+    LOWSTOCK = 'lowstock'
+    RESTOCK = 'restock'
+
+
+def verbs_of(command: Command) -> tuple:
+    """every verb (alias) of given command."""
+    values = command.value
+    return values if isinstance(values, tuple) else (values,)
+
+
+# verb -> Command
+VERBS = {verb: command for command in Command for verb in verbs_of(command)}
+
+
+class ParsedCommand(NamedTuple):
+    """One command of input."""
+    verb: str
+    arguments: tuple
+    text: str
+
+
+def parse_command(text: str) -> ParsedCommand:
+    """
+    split one command into its verb and arguments.
+
+    Parameters
+    ----------
+    text: str : one command (without separators)
+
+
+    Returns
+    -------
+    ParsedCommand (verb is '' for an empty command)
+    """
+    words = text.split()
+    if not words:
+        return ParsedCommand('', (), '')
+    return ParsedCommand(words[0].lower(), tuple(words[1:]), ' '.join(words))
+
+
+def tokenize(line: str) -> list:
+    """
+    split a line of input into its commands. (empty commands are skipped)
+
+    Parameters
+    ----------
+    line: str : line of input ('apple 3; tea 2; show')
+
+
+    Returns
+    -------
+    list of ParsedCommand
+    """
+    commands = list()
+    for text in line.split(SEPARATOR):
+        command = parse_command(text)
+        if command.verb:
+            commands.append(command)
+    return commands
+
+
+class CommandTable:
+    """
+    Handlers of the commands of one mode (verb -> handler).
+    every handler is called as handler(state, command) and its result is
+    returned by dispatch().
+    """
+
+    def __init__(self, default=None):
+        """
+        Parameters
+        ----------
+        default : handler of verbs that haven't handler (Default value = None)
+        """
+        self.handlers = dict()
+        self.default = default
+
+    def register(self, *verbs):
+        """
+        decorator that sets the handler of given verbs.
+        a Command registers every verb of it.
+        """
+        def decorator(handler):
+            for verb in verbs:
+                for word in (verbs_of(verb) if isinstance(verb, Command)
+                             else (verb,)):
+                    self.handlers[word] = handler
+            return handler
+        return decorator
+
+    def __contains__(self, verb) -> bool:
+        return verb in self.handlers
+
+    def handler(self, command: ParsedCommand):
+        """handler of given command (default handler for unknown verbs)."""
+        return self.handlers.get(command.verb, self.default)
+
+    def dispatch(self, state, command: ParsedCommand):
+        """run the handler of given command."""
+        return self.handler(command)(state, command)
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import threading
+from array import array
+from datetime import datetime
+from pricing import DISCOUNT_CAP
+from storage import file_locks
+# Discount codes: rules, usage counters and expiry.
+#
+# codes are loaded from ./json_files/discount_codes.json. a code is
+# either a percent (old format) or a rule:
+#   "shop4spvzftdnpcsc6oq": 20,
+#   "yalda1405": {
+#       "percent": 30,
+#       "limit": 1000,                  number of uses (no limit if missing)
+#       "expires": "2026-12-22T00:00",  ISO time or unix timestamp
+#       "categories": ["fruit"],        (every category if missing)
+#       "cap": 100000                   (DISCOUNT_CAP if missing)
+#   }
+# every use of a code is appended to a redemptions log, so a purchase
+# never rewrites the codes file. the counters are read back from the log.
+# a use is checked and logged under the file lock of the log, after reading
+# the uses of other processes, so a limited code isn't used too many times.
+
+DISCOUNT_CODES_PATH = './json_files/discount_codes.json'
+REDEMPTIONS_PATH = os.environ.get(
+    'SHOPPING_LIST_REDEMPTIONS', './json_files/discount_redemptions.jsonl'
+    )
+
+# results of DiscountBook.check()
+VALID = 'valid'
+UNKNOWN = 'unknown'
+EXPIRED = 'expired'
+USED_UP = 'used up'
+
+
+class DiscountRule:
+    """Rule of one discount code."""
+
+    __slots__ = ('code', 'percent', 'limit', 'expires', 'categories', 'cap')
+
+    def __init__(self, code: str, percent, limit: int = None,
+                 expires: float = None, categories=None,
+                 cap=DISCOUNT_CAP):
+        self.code = code
+        self.percent = percent
+        self.limit = limit
+        self.expires = expires
+        # None means every category
+        self.categories = frozenset(categories) if categories else None
+        self.cap = cap
+
+    @classmethod
+    def from_record(cls, code: str, record):
+        """rule of code from its record in codes file (int or dict)."""
+        if not isinstance(record, dict):
+            return cls(code, record)
+        expires = record.get('expires')
+        if isinstance(expires, str):
+            expires = datetime.fromisoformat(expires).timestamp()
+        return cls(
+            code, record['percent'], record.get('limit'), expires,
+            record.get('categories'), record.get('cap', DISCOUNT_CAP)
+            )
+
+    def applies_to(self, category) -> bool:
+        """check if the rule applies to products of given category."""
+        return self.categories is None or category in self.categories
+
+
+class DiscountBook:
+    """
+    Index of discount codes (code -> rule) with counters of uses.
+    checking a code is one dictionary lookup.
+    """
+
+    def __init__(self, codes: dict, log_path: str = REDEMPTIONS_PATH):
+        """
+        Parameters
+        ----------
+        codes: dict : records of codes file (code -> percent or rule)
+
+        log_path: str : path of redemptions log
+            (Default value = REDEMPTIONS_PATH)
+        """
+        self.rules = {
+            code.lower(): DiscountRule.from_record(code.lower(), record)
+            for code, record in codes.items()
+        }
+        self.log_path = log_path
+        self.used = dict()
+        # bytes of log that are counted in used
+        self.offset = 0
+        # redemptions are written but not synced to disk (flush())
+        self.unsynced = False
+        self.lock = threading.Lock()
+        self._replay()
+
+    @classmethod
+    def load(cls, path: str = DISCOUNT_CODES_PATH,
+             log_path: str = REDEMPTIONS_PATH):
+        """load discount codes from codes file."""
+        with open(path, mode='r') as f:
+            return cls(json.load(f), log_path)
+
+    def _replay(self):
+        # count the records that are added to log since the last read
+        if not os.path.exists(self.log_path):
+            return
+        if os.path.getsize(self.log_path) < self.offset:
+            # log is replaced, count it again
+            self.used, self.offset = dict(), 0
+        with open(self.log_path, mode='rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # line is being written
+                    break
+                self.offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # last line of a crashed write
+                    continue
+                code = record['code']
+                self.used[code] = self.used.get(code, 0) + record['delta']
+
+    def _log(self, record: dict, sync: bool = True):
+        # under the file lock of log, after _replay()
+        # short lines in append mode: writes of processes don't mix
+        with open(self.log_path, mode='ab') as f:
+            f.write(json.dumps(record).encode() + b'\n')
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+            self.offset = f.tell()
+        code = record['code']
+        self.used[code] = self.used.get(code, 0) + record['delta']
+
+    def __getstate__(self) -> dict:
+        # sent to worker processes (batch mode) without the lock
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def __contains__(self, code) -> bool:
+        return code in self.rules
+
+    def __getitem__(self, code) -> DiscountRule:
+        return self.rules[code]
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def check(self, code, now: float = None) -> str:
+        """
+        check if given code can be used now.
+
+        Returns
+        -------
+        VALID, UNKNOWN, EXPIRED or USED_UP
+        """
+        rule = self.rules.get(code)
+        if rule is None:
+            return UNKNOWN
+        now = time.time() if now is None else now
+        if rule.expires is not None and now >= rule.expires:
+            return EXPIRED
+        if rule.limit is not None and self.used.get(code, 0) >= rule.limit:
+            return USED_UP
+        return VALID
+
+    def discount(self, code, pricing, category_of) -> int:
+        """
+        discount of code for the lines of a cart (minor units).
+
+        Parameters
+        ----------
+        code : discount code (must be in book)
+
+        pricing : PricingEngine of cart
+
+        category_of : function that returns the category of product
+
+
+        Returns
+        -------
+        discount (cap of rule at most)
+        """
+        rule = self.rules[code]
+        mask = None
+        if rule.categories is not None:
+            mask = array('q', (
+                rule.applies_to(category_of(name)) for name in pricing.names
+                ))
+        return pricing.discount(rule.percent, rule.cap, mask)
+
+    def redeem(self, code, username, now: float = None,
+               defer: bool = False) -> bool:
+        """
+        Count one use of code (if it can be used) and log it.
+
+        Parameters
+        ----------
+        code : discount code
+
+        username : username of buyer
+
+        now : time of use (Default value = None, current time)
+
+        defer: bool : don't sync the log record to disk until flush()
+            (Default value = False)
+
+
+        Returns
+        -------
+        Return False if code can't be used (expired / used up).
+        """
+        with self.lock, file_locks(self.log_path):
+            # uses of other processes
+            self._replay()
+            if self.check(code, now) != VALID:
+                return False
+            self._log({"code": code, "delta": 1, "user": username,
+                       "time": time.time()}, sync=not defer)
+            self.unsynced = self.unsynced or defer
+        return True
+
+    def release(self, code, username):
+        """take back one use of code. (purchase failed after redeem)"""
+        with self.lock, file_locks(self.log_path):
+            self._replay()
+            self._log({"code": code, "delta": -1, "user": username,
+                       "time": time.time()})
+
+    def flush(self):
+        """sync the deferred redemptions to disk with one fsync."""
+        with self.lock:
+            if self.unsynced:
+                with open(self.log_path, mode='ab') as f:
+                    os.fsync(f.fileno())
+                self.unsynced = False
@@ -0,0 +1,190 @@
+import os
+import json
+import heapq
+import logging
+# Inventory: low stock monitor and restock plans.
+#
+# every product has a threshold (and a target of restock). the margin of
+# product is amount - threshold, a product is low when its margin is 0 or
+# less. margins are kept in a min-heap, built from the catalog when low
+# products are asked for the first time (not at startup):
+#   - every change of stock pushes the new margin (O(log n)), the old entry
+#     stays in heap and is skipped (its margin isn't the current one).
+#     the heap is built again when old entries are more than products.
+#   - a change of stock before that only checks if product became low.
+#   - low products are the top of heap: only entries with margin <= 0 and
+#     their children are visited, not every product.
+# thresholds are read from ./json_files/stock_thresholds.json (optional):
+#   "apple": 10,                             threshold
+#   "tea": {"threshold": 3, "target": 40}    amount after restock
+# products that aren't in the file have LOW_STOCK threshold, the default
+# target is RESTOCK_FACTOR * threshold.
+
+STOCK_THRESHOLDS_PATH = os.environ.get(
+    'SHOPPING_LIST_STOCK_THRESHOLDS', './json_files/stock_thresholds.json'
+    )
+LOW_STOCK = int(os.environ.get('SHOPPING_LIST_LOW_STOCK', 5))
+RESTOCK_FACTOR = int(os.environ.get('SHOPPING_LIST_RESTOCK_FACTOR', 4))
+
+# heap is built again when it has this many more entries than products
+COMPACT_SLACK = 1024
+
+logger = logging.getLogger()
+
+
+class StockMonitor:
+    """Products ordered by their margin of stock (amount - threshold)."""
+
+    def __init__(self, thresholds: dict = None, default: int = LOW_STOCK):
+        """
+        Parameters
+        ----------
+        thresholds: dict : name -> threshold or {'threshold', 'target'}
+            (Default value = None)
+
+        default: int : threshold of other products (Default value = LOW_STOCK)
+        """
+        self.default = default
+        # name -> (threshold, target)
+        self.rules = dict()
+        for name, rule in (thresholds or dict()).items():
+            if isinstance(rule, dict):
+                threshold = rule.get('threshold', default)
+                target = rule.get('target', threshold * RESTOCK_FACTOR)
+            else:
+                threshold, target = rule, rule * RESTOCK_FACTOR
+            self.rules[name] = (threshold, target)
+        # name -> current margin
+        self.margins = dict()
+        # (margin, name), with old entries (None until it's built)
+        self.heap = None
+        # catalog that is followed
+        self.catalog = None
+
+    @classmethod
+    def load(cls, path: str = STOCK_THRESHOLDS_PATH):
+        """monitor with the thresholds of given file (if it exists)."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, mode='r') as f:
+            return cls(json.load(f))
+
+    def threshold(self, name: str) -> int:
+        """threshold of product."""
+        return self.rules.get(name, (self.default,))[0]
+
+    def target(self, name: str) -> int:
+        """amount of product after a restock."""
+        rule = self.rules.get(name)
+        return rule[1] if rule else self.default * RESTOCK_FACTOR
+
+    def watch(self, catalog) -> 'StockMonitor':
+        """
+        Follow the stock changes of catalog. (nothing is read now, the
+        heap is built at the first call of low())
+        """
+        self.catalog = catalog
+        self.margins = dict()
+        self.heap = None
+        catalog.stock_monitor = self
+        return self
+
+    def _build(self):
+        self.heap = [(margin, name) for name, margin in self.margins.items()]
+        heapq.heapify(self.heap)
+
+    def _ensure_heap(self):
+        # the only full pass over products
+        if self.heap is None:
+            self.margins = {
+                name: self.catalog[name]['amount'] - self.threshold(name)
+                for name in self.catalog
+            } if self.catalog is not None else dict()
+            self._build()
+
+    def update(self, name: str, amount: int, old: int = None):
+        """
+        new amount of product. (called by catalog on every change)
+
+        Parameters
+        ----------
+        name: str : name of product
+
+        amount: int : new amount
+
+        old: int : amount before the change (Default value = None)
+        """
+        margin = amount - self.threshold(name)
+        if self.heap is None:
+            # heap reads the amounts when it's built
+            old = None if old is None else old - self.threshold(name)
+        else:
+            old = self.margins.get(name)
+            if old == margin:
+                return
+            self.margins[name] = margin
+            heapq.heappush(self.heap, (margin, name))
+            if len(self.heap) > 2 * len(self.margins) + COMPACT_SLACK:
+                self._build()
+        if margin <= 0 and (old is None or old > 0):
+            logger.warning("Stock of %s is low: %s left (threshold %s).", name, amount, self.threshold(name), extra={'item': name, 'amount': amount}) # noqa E501
+
+    def remove(self, name: str):
+        """product has been removed from catalog."""
+        if self.margins.pop(name, None) is not None and \
+                len(self.heap) > 2 * len(self.margins) + COMPACT_SLACK:
+            self._build()
+
+    def is_low(self, name: str) -> bool:
+        """Return True if stock of product is at its threshold or less."""
+        margin = self.margins.get(name)
+        return margin is not None and margin <= 0
+
+    def low(self, limit: int = None) -> list:
+        """
+        Low products, lowest margin first.
+
+        Parameters
+        ----------
+        limit: int : most products (Default value = None, all of them)
+
+
+        Returns
+        -------
+        list of (name, amount, threshold)
+        """
+        self._ensure_heap()
+        found = dict()
+        # children of an entry have bigger margins, so the walk stops at
+        # the first entry with a positive margin
+        stack = [0] if self.heap else []
+        while stack:
+            index = stack.pop()
+            margin, name = self.heap[index]
+            if margin > 0:
+                continue
+            if self.margins.get(name) == margin:
+                found[name] = margin
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(self.heap):
+                    stack.append(child)
+        names = sorted(found, key=lambda name: (found[name], name))
+        return [(name, found[name] + self.threshold(name),
+                 self.threshold(name))
+                for name in names[:limit]]
+
+    def restock_plan(self, limit: int = None) -> list:
+        """
+        Restock of low products (up to their target), lowest first.
+
+        Parameters
+        ----------
+        limit: int : most products (Default value = None, all of them)
+
+
+        Returns
+        -------
+        list of (name, amount, amount to add)
+        """
+        return [(name, amount, max(self.target(name) - amount, 0))
+                for name, amount, _ in self.low(limit)]
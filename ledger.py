@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import struct
+from urllib.parse import quote
+from storage import file_locks
+# Order ledger: one record for every finished purchase.
+#
+# orders are appended as JSON lines to segment files in LEDGER_PATH
+# (orders-000001.jsonl, orders-000002.jsonl, ...). a new segment is
+# started when the last one is bigger than SEGMENT_SIZE. orders are never
+# changed or removed:
+#   {"user": "babakzare", "time": 1792300000.0,
+#    "lines": [{"item": "apple", "amount": 2, "price": 15000}],
+#    "code": null, "total": 30000, "discount": 0, "paid": 30000}
+# besides segments there are two kinds of offset indexes, every entry is
+# (number of segment, offset of order in segment) in 12 bytes:
+#   users/<username>.idx    orders of one user (in the order of purchase)
+#   days/<YYYY-MM-DD>.idx   orders of one day (local time)
+# a page of history reads a few entries from the end of index of user and
+# one line of segment for every order, so it doesn't depend on the size of
+# ledger. indexes can be built again from segments (rebuild_indexes).
+
+LEDGER_PATH = os.environ.get('SHOPPING_LIST_LEDGER', './json_files/ledger')
+
+# a new segment is started when the last one is bigger than this (bytes)
+SEGMENT_SIZE = int(
+    os.environ.get('SHOPPING_LIST_LEDGER_SEGMENT_SIZE', 64 * 1024 * 1024)
+    )
+
+# entry of indexes: number of segment, offset of order
+ENTRY = struct.Struct('<IQ')
+
+# number of index entries that are read at once
+READ_BATCH_SIZE = 64
+
+
+def make_order(username, lines: list, total, discount=0, code=None,
+               timestamp: float = None) -> dict:
+    """
+    Record of one purchase.
+
+    Parameters
+    ----------
+    username : username of buyer
+
+    lines: list : (name, amount, unit price) of purchased items
+
+    total : total price before discount (tomans)
+
+    discount : discount of purchase (tomans) (Default value = 0)
+
+    code : discount code (Default value = None)
+
+    timestamp: float : time of purchase (Default value = None, now)
+
+
+    Returns
+    -------
+    order record
+    """
+    return {
+        "user": username,
+        "time": time.time() if timestamp is None else timestamp,
+        "lines": [{"item": name, "amount": amount, "price": price}
+                  for name, amount, price in lines],
+        "code": code,
+        "total": total,
+        "discount": discount,
+        "paid": total - discount,
+    }
+
+
+def day_of(timestamp: float) -> str:
+    """day of timestamp (local time) as 'YYYY-MM-DD'."""
+    return time.strftime('%Y-%m-%d', time.localtime(timestamp))
+
+
+class OrderLedger:
+    """Append-only ledger of orders with per-user and per-day indexes."""
+
+    def __init__(self, path: str = LEDGER_PATH,
+                 segment_size: int = SEGMENT_SIZE):
+        self.path = path
+        self.segment_size = segment_size
+        # number of last segment (checked again before every append)
+        self.segment = max(self.segments(), default=1)
+
+    def segments(self) -> list:
+        """numbers of segment files (sorted)."""
+        if not os.path.isdir(self.path):
+            return list()
+        return sorted(
+            int(name[len('orders-'):-len('.jsonl')])
+            for name in os.listdir(self.path)
+            if name.startswith('orders-') and name.endswith('.jsonl')
+            )
+
+    def segment_path(self, number: int) -> str:
+        return os.path.join(self.path, f"orders-{number:06d}.jsonl")
+
+    def user_index_path(self, username) -> str:
+        return os.path.join(
+            self.path, 'users', quote(username, safe='') + '.idx'
+            )
+
+    def day_index_path(self, day: str) -> str:
+        return os.path.join(self.path, 'days', day + '.idx')
+
+    def _last_segment(self) -> int:
+        # other processes may have started new segments
+        while os.path.exists(self.segment_path(self.segment + 1)):
+            self.segment += 1
+        path = self.segment_path(self.segment)
+        if os.path.exists(path) and \
+                os.path.getsize(path) >= self.segment_size:
+            self.segment += 1
+        return self.segment
+
+    def append(self, orders: list):
+        """
+        Append orders to the ledger (one write and one fsync for all).
+
+        Parameters
+        ----------
+        orders: list : order records (make_order)
+        """
+        if not orders:
+            return
+        for directory in ('users', 'days'):
+            os.makedirs(os.path.join(self.path, directory), exist_ok=True)
+        with file_locks(os.path.join(self.path, 'ledger')):
+            segment = self._last_segment()
+            lines = [(json.dumps(order) + '\n').encode() for order in orders]
+            with open(self.segment_path(segment), mode='a+b') as f:
+                offset = f.tell()
+                if offset:
+                    # last line of a crashed write is closed first
+                    f.seek(offset - 1)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                        offset += 1
+                f.write(b''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            indexes = dict()
+            for order, line in zip(orders, lines):
+                entry = ENTRY.pack(segment, offset)
+                offset += len(line)
+                for path in (self.user_index_path(order['user']),
+                             self.day_index_path(day_of(order['time']))):
+                    indexes.setdefault(path, list()).append(entry)
+            self._write_indexes(indexes)
+
+    def _write_indexes(self, indexes: dict):
+        for path, entries in indexes.items():
+            with open(path, mode='ab') as f:
+                f.write(b''.join(entries))
+
+    def record(self, username, lines: list, total, discount=0,
+               code=None) -> dict:
+        """save one purchase (see make_order) and return its record."""
+        order = make_order(username, lines, total, discount, code)
+        self.append([order])
+        return order
+
+    def _count(self, index_path: str) -> int:
+        try:
+            # a half written entry (crash) isn't counted
+            return os.path.getsize(index_path) // ENTRY.size
+        except FileNotFoundError:
+            return 0
+
+    def count(self, username) -> int:
+        """number of orders of user."""
+        return self._count(self.user_index_path(username))
+
+    def _entries(self, index_path: str, start: int, stop: int) -> list:
+        # entries from start to stop of index
+        with open(index_path, mode='rb') as f:
+            f.seek(start * ENTRY.size)
+            data = f.read((stop - start) * ENTRY.size)
+        return list(ENTRY.iter_unpack(data))
+
+    def _read(self, entries, files: dict):
+        # orders of (segment, offset) entries
+        for segment, offset in entries:
+            f = files.get(segment)
+            if f is None:
+                f = files[segment] = open(self.segment_path(segment), 'rb')
+            f.seek(offset)
+            yield json.loads(f.readline())
+
+    def orders(self, username, start: int = 0):
+        """
+        Orders of user, newest first.
+
+        Parameters
+        ----------
+        username : username of user
+
+        start: int : number of newest orders to skip (Default value = 0)
+
+
+        Returns
+        -------
+        generator of order records
+        """
+        index_path = self.user_index_path(username)
+        stop = self._count(index_path) - start
+        files = dict()
+        try:
+            while stop > 0:
+                first = max(0, stop - READ_BATCH_SIZE)
+                entries = self._entries(index_path, first, stop)
+                yield from self._read(reversed(entries), files)
+                stop = first
+        finally:
+            for f in files.values():
+                f.close()
+
+    def orders_of_day(self, day: str):
+        """orders of given day ('YYYY-MM-DD'), in the order of purchase."""
+        index_path = self.day_index_path(day)
+        total = self._count(index_path)
+        files = dict()
+        try:
+            for first in range(0, total, READ_BATCH_SIZE):
+                entries = self._entries(
+                    index_path, first, min(total, first + READ_BATCH_SIZE)
+                    )
+                yield from self._read(entries, files)
+        finally:
+            for f in files.values():
+                f.close()
+
+    def rebuild_indexes(self):
+        """build every index again from segments (e.g. after a crash)."""
+        with file_locks(os.path.join(self.path, 'ledger')):
+            for directory in ('users', 'days'):
+                directory = os.path.join(self.path, directory)
+                os.makedirs(directory, exist_ok=True)
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+            for segment in self.segments():
+                indexes = dict()
+                offset = 0
+                with open(self.segment_path(segment), mode='rb') as f:
+                    for line in f:
+                        entry = ENTRY.pack(segment, offset)
+                        offset += len(line)
+                        try:
+                            order = json.loads(line)
+                        except ValueError:
+                            # line of a crashed write
+                            continue
+                        for path in (
+                                self.user_index_path(order['user']),
+                                self.day_index_path(day_of(order['time']))):
+                            indexes.setdefault(path, list()).append(entry)
+                self._write_indexes(indexes)
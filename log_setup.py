@@ -0,0 +1,107 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import logging.config
+import logging.handlers
+# Logging configuration of shopping list.
+#
+# 'file' mode (default): Custom TOML config file (log_configuration.toml)
+# 'queue' mode: records go through a queue to a listener thread that writes
+#     them as JSON lines to a rotating app.log, so the program never waits
+#     for the disk.
+
+LOG_MODE = os.environ.get('SHOPPING_LIST_LOG_MODE', 'file').lower()
+LOG_FILE = os.environ.get('SHOPPING_LIST_LOG_FILE', 'app.log')
+
+# rotation of log file in queue mode ('size' / 'time')
+LOG_ROTATION = os.environ.get('SHOPPING_LIST_LOG_ROTATION', 'size').lower()
+LOG_MAX_BYTES = int(os.environ.get('SHOPPING_LIST_LOG_MAX_BYTES', 10 * 1024 * 1024)) # noqa E501
+LOG_BACKUP_COUNT = int(os.environ.get('SHOPPING_LIST_LOG_BACKUP_COUNT', 5))
+# when the log is rotated in 'time' rotation (see TimedRotatingFileHandler)
+LOG_ROTATION_WHEN = os.environ.get('SHOPPING_LIST_LOG_ROTATION_WHEN', 'midnight') # noqa E501
+
+# fields of records that are written to JSON logs (if they are set)
+STRUCTURED_FIELDS = ('user', 'command', 'item', 'amount', 'latency')
+
+# listener of queue mode (None in file mode)
+listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "time": self.formatTime(record),
+            "process": record.process,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                document[field] = value
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        return json.dumps(document)
+
+
+class SessionLogger(logging.LoggerAdapter):
+    """
+    Logger of one session: adds the session fields (user, ...)
+    to every record, besides the fields given by `extra`.
+    """
+
+    def process(self, msg, kwargs):
+        kwargs['extra'] = {**self.extra, **kwargs.get('extra', {})}
+        return msg, kwargs
+
+
+def rotating_handler() -> logging.Handler:
+    """file handler of queue mode (rotated by size or time)."""
+    if LOG_ROTATION == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATION_WHEN, backupCount=LOG_BACKUP_COUNT
+            )
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+        )
+
+
+def configure_logging(mode: str = LOG_MODE):
+    """
+    Configure the root logger.
+
+    Parameters
+    ----------
+    mode: str : 'file' or 'queue' (Default value = LOG_MODE)
+
+
+    Returns
+    -------
+
+    """
+    global listener
+    if mode != 'queue':
+        # Configuration logging using Custom TOML config file
+        logging.config.fileConfig(fname='log_configuration.toml', disable_existing_loggers=False) # noqa E501
+        return
+    if listener is not None:
+        return
+    records = queue.SimpleQueue()
+    handler = rotating_handler()
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    listener = logging.handlers.QueueListener(
+        records, handler, respect_handler_level=True
+        )
+    listener.start()
+    # write the records left in queue before exit
+    atexit.register(listener.stop)
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import atexit
+import cProfile
+import threading
+from itertools import count
+from functools import wraps
+from contextlib import contextmanager, nullcontext
+# Metrics of shopping list: counters and latency histograms.
+
+# file that metrics are dumped to periodically (not dumped if empty)
+METRICS_FILE = os.environ.get('SHOPPING_LIST_METRICS_FILE', '')
+METRICS_DUMP_INTERVAL = float(
+    os.environ.get('SHOPPING_LIST_METRICS_INTERVAL', 60)
+    )
+
+# directory of cProfile captures, one file per session (off if empty)
+PROFILE_DIRECTORY = os.environ.get('SHOPPING_LIST_PROFILE', '')
+
+# number of profiled sessions (keeps file names unique)
+profile_numbers = count(1)
+
+# values below 2 ** SUB_BUCKET_BITS are exact, bigger values are kept with
+# 2 ** (SUB_BUCKET_BITS - 1) buckets per power of two (< 1% error)
+SUB_BUCKET_BITS = 7
+
+
+class Histogram:
+    """
+    HDR-style histogram of latencies in microseconds.
+    buckets are log-linear, so recording is O(1) and memory is bounded
+    by the range of values, not by the number of values.
+    """
+
+    def __init__(self):
+        self.counts = dict()
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        """index of bucket of given value."""
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        """lowest value of bucket with given index."""
+        shift, sub_bucket = divmod(index, 1 << SUB_BUCKET_BITS)
+        return sub_bucket << shift
+
+    def record(self, microseconds: int):
+        """add one value to the histogram."""
+        microseconds = max(0, int(microseconds))
+        index = self.bucket(microseconds)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += microseconds
+        self.maximum = max(self.maximum, microseconds)
+        if self.minimum is None or microseconds < self.minimum:
+            self.minimum = microseconds
+
+    def percentile(self, percent: float) -> int:
+        """value (microseconds) that `percent`% of values are below."""
+        if not self.count:
+            return 0
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.bucket_value(index), self.maximum)
+        return self.maximum
+
+    def summary(self) -> dict:
+        """count, mean and percentiles of histogram (microseconds)."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "min": self.minimum or 0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.maximum,
+        }
+
+
+class Metrics:
+    """Registry of counters and histograms."""
+
+    def __init__(self):
+        self.counters = dict()
+        self.histograms = dict()
+        self.lock = threading.Lock()
+        self.dumper = None
+
+    def increment(self, name: str, value: int = 1):
+        """add value to the counter with given name."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        """record a latency (in seconds) in histogram with given name."""
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(seconds * 1000000)
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        time the block and record it in histogram with given name.
+        yields a dictionary whose 'latency' is set (seconds) at the end.
+        """
+        result = dict()
+        start = time.perf_counter()
+        try:
+            yield result
+        finally:
+            result['latency'] = time.perf_counter() - start
+            self.observe(name, result['latency'])
+
+    def timed(self, name: str):
+        """decorator that times every call of function."""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        """current counters and summaries of histograms."""
+        with self.lock:
+            return {
+                "time": time.time(),
+                "counters": dict(self.counters),
+                "latency_us": {
+                    name: histogram.summary()
+                    for name, histogram in sorted(self.histograms.items())
+                },
+            }
+
+    def report(self) -> str:
+        """metrics as a table (stats command)."""
+        snapshot = self.snapshot()
+        lines = [f"{'name':<32} {'count':>7} {'mean':>9} {'p50':>9} "
+                 f"{'p99':>9} {'max':>9}  (microseconds)"]
+        for name, summary in snapshot['latency_us'].items():
+            lines.append(
+                f"{name:<32} {summary['count']:>7} {summary['mean']:>9.0f} "
+                f"{summary['p50']:>9} {summary['p99']:>9} {summary['max']:>9}" # noqa E501
+                )
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"{name:<32} {value:>7}")
+        return '\n'.join(lines)
+
+    def dump(self, path: str = METRICS_FILE):
+        """write the snapshot of metrics to given file (JSON)."""
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, mode='w') as f:
+            json.dump(self.snapshot(), f, indent=4)
+        os.replace(temporary_path, path)
+
+    def start_dumper(self, path: str = METRICS_FILE,
+                     interval: float = METRICS_DUMP_INTERVAL):
+        """dump metrics to file every `interval` seconds and at exit."""
+        if not path or self.dumper is not None:
+            return
+        stop = threading.Event()
+
+        def dump_forever():
+            while not stop.wait(interval):
+                self.dump(path)
+
+        self.dumper = threading.Thread(
+            target=dump_forever, name='metrics-dumper', daemon=True
+            )
+        self.dumper.start()
+        atexit.register(self.dump, path)
+        atexit.register(stop.set)
+
+
+# metrics of the running program
+metrics = Metrics()
+
+
+@contextmanager
+def profiled(path: str):
+    """capture a cProfile of the block into given file."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def session_profile(username: str):
+    """
+    cProfile capture of one session (if SHOPPING_LIST_PROFILE is set).
+
+    Parameters
+    ----------
+    username : username of session
+
+
+    Returns
+    -------
+    context manager that profiles the block
+    """
+    if not PROFILE_DIRECTORY:
+        return nullcontext()
+    os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+    path = os.path.join(
+        PROFILE_DIRECTORY, f"{username}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(profile_numbers)}.prof" # noqa E501
+        )
+    return profiled(path)
@@ -0,0 +1,137 @@
+import os
+from array import array
+from operator import mul
+# Pricing engine: prices of cart lines in columns of integer minor units.
+#
+# prices are kept as integers (hundredths of toman), so totals and
+# discounts are exact. columns are `array` arrays and totals are computed
+# with map() / sum() over them, which runs in C without Python objects
+# for every line.
+
+# minor units in one toman
+MINOR_UNITS = 100
+
+# discount of one purchase can't be more than 300,000 tomans (by default)
+DISCOUNT_CAP = int(os.environ.get('SHOPPING_LIST_DISCOUNT_CAP', 300000))
+
+
+def to_minor(tomans) -> int:
+    """price in tomans -> integer minor units."""
+    return round(tomans * MINOR_UNITS)
+
+
+def to_tomans(minor_units: int):
+    """integer minor units -> price in tomans. (int if it's whole)"""
+    tomans, rest = divmod(minor_units, MINOR_UNITS)
+    return tomans if not rest else minor_units / MINOR_UNITS
+
+
+class PricingEngine:
+    """
+    Lines of a cart in columns:
+        names            list of product names
+        quantities       array of amounts
+        unit_prices      array of prices (minor units)
+    removing a line moves the last line into its place, so every change
+    is O(1).
+    """
+
+    def __init__(self):
+        self.names = list()
+        self.positions = dict()
+        self.quantities = array('q')
+        self.unit_prices = array('q')
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def set_line(self, name: str, amount: int, price):
+        """
+        Add line or change its amount and price.
+
+        Parameters
+        ----------
+        name: str : name of product
+
+        amount: int : amount of product
+
+        price : unit price of product (tomans)
+        """
+        position = self.positions.get(name)
+        if position is None:
+            self.positions[name] = len(self.names)
+            self.names.append(name)
+            self.quantities.append(amount)
+            self.unit_prices.append(to_minor(price))
+        else:
+            self.quantities[position] = amount
+            self.unit_prices[position] = to_minor(price)
+
+    def remove_line(self, name: str):
+        """remove line of given product."""
+        position = self.positions.pop(name)
+        last = len(self.names) - 1
+        if position != last:
+            moved = self.names[last]
+            self.names[position] = moved
+            self.quantities[position] = self.quantities[last]
+            self.unit_prices[position] = self.unit_prices[last]
+            self.positions[moved] = position
+        self.names.pop()
+        self.quantities.pop()
+        self.unit_prices.pop()
+
+    def clear(self):
+        """remove all lines."""
+        self.names.clear()
+        self.positions.clear()
+        self.quantities = array('q')
+        self.unit_prices = array('q')
+
+    def line_totals(self) -> array:
+        """price * amount of every line (minor units)."""
+        return array('q', map(mul, self.unit_prices, self.quantities))
+
+    def total(self, mask=None) -> int:
+        """
+        total price of lines (minor units).
+
+        Parameters
+        ----------
+        mask : iterable of 0 / 1 for every line, only lines with 1 are
+            counted (Default value = None, all lines)
+        """
+        if mask is None:
+            return sum(map(mul, self.unit_prices, self.quantities))
+        return sum(map(mul, map(mul, self.unit_prices, mask),
+                       self.quantities))
+
+    def discount(self, percent, cap=DISCOUNT_CAP, mask=None) -> int:
+        """
+        discount of lines (minor units).
+
+        Parameters
+        ----------
+        percent : percent of discount
+
+        cap : most discount in tomans (Default value = DISCOUNT_CAP)
+            None means no cap.
+
+        mask : lines that the discount applies to (see total())
+        """
+        discount = self.total(mask) * percent // 100
+        if cap is not None:
+            discount = min(discount, to_minor(cap))
+        return discount
+
+    def reprice(self, price_of):
+        """
+        Read the prices of all lines again (after price updates).
+
+        Parameters
+        ----------
+        price_of : function that returns the price of product (tomans)
+        """
+        self.unit_prices = array(
+            'q', (to_minor(price_of(name)) for name in self.names)
+            )
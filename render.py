@@ -0,0 +1,245 @@
+import os
+import sys
+import time
+from functools import lru_cache
+from itertools import islice
+# Rendering of listings (products, categories, cart) page by page.
+#
+# rows are made lazily by generators and written in buffered batches, so
+# showing the first page costs the same for any size of products database.
+#
+# the screen is cleared with ANSI escape codes (no 'clear' process for
+# every command), and only when output is a terminal: piped / scripted
+# output is plain text. messages (banner, help) are read once.
+
+# number of rows in one page
+PAGE_SIZE = int(os.environ.get('SHOPPING_LIST_PAGE_SIZE', 20))
+
+# number of rows in one write to the terminal
+WRITE_BATCH_SIZE = 256
+
+SEPARATOR = "______________________________________________________"
+
+# cursor to top-left, clear the screen and the scrollback (like 'clear')
+CLEAR = '\033[H\033[2J\033[3J'
+
+# directory of message files (banner, help)
+MESSAGES_PATH = './message_files'
+
+
+def is_terminal(out=None) -> bool:
+    """Return True if output is a terminal that understands ANSI codes."""
+    out = sys.stdout if out is None else out
+    if os.environ.get('TERM') == 'dumb':
+        return False
+    try:
+        return out.isatty()
+    except (AttributeError, ValueError):
+        # closed or not a real file
+        return False
+
+
+def clear_screen(out=None):
+    """clear the terminal (nothing for pipes and files)."""
+    out = sys.stdout if out is None else out
+    if is_terminal(out):
+        out.write(CLEAR)
+        out.flush()
+
+
+@lru_cache(maxsize=None)
+def message(name: str) -> str:
+    """text of message file (e.g. 'help_message'), read once."""
+    path = os.path.join(MESSAGES_PATH, name + '.txt')
+    with open(path, mode='r') as message_file:
+        return message_file.read()
+
+
+def product_rows(names, products_database):
+    """
+    rows of given products. (products / category commands)
+
+    Parameters
+    ----------
+    names : iterable of product names
+
+    products_database : database of products
+
+
+    Returns
+    -------
+    generator of rows
+    """
+    for name in names:
+        info = products_database[name]
+        yield f"Name: {name.capitalize()} | Price: {info['price']} tomans | {info['amount']} in stock\n{SEPARATOR}" # noqa E501
+
+
+def cart_rows(names, cart, price_of, start: int = 0):
+    """
+    rows of items in cart. (store mode)
+
+    Parameters
+    ----------
+    names : iterable of names of items (in the order of showing)
+
+    cart : cart of user (name -> amount)
+
+    price_of : function that returns the price of item
+
+    start: int : index of first row (Default value = 0)
+
+
+    Returns
+    -------
+    generator of rows
+    """
+    for index, name in enumerate(names, start=start + 1):
+        amount = cart[name]
+        pure_item_price = price_of(name)
+        price = pure_item_price * amount  # Price of item
+        yield f"{index}. Name: {name.capitalize()} ][ Price: {pure_item_price} tomans ][ amount: {amount} | Total Price: {price}" # noqa E501
+
+
+def list_rows(shopping_list: dict):
+    """rows of items in shopping list. (list mode)"""
+    for index, (name, information) in enumerate(shopping_list.items(), 1):
+        pure_item_price, amount = information[0], information[1]
+        price = pure_item_price * amount  # Price of item
+        yield f" {index}. Name: {name.capitalize()} | Price: {pure_item_price} tomans | amount: {amount} | Total Price: {price}" # noqa E501
+
+
+def order_rows(orders, start: int = 0):
+    """
+    rows of orders of user. (history command)
+
+    Parameters
+    ----------
+    orders : iterable of order records (newest first)
+
+    start: int : index of first row (Default value = 0)
+
+
+    Returns
+    -------
+    generator of rows
+    """
+    for index, order in enumerate(orders, start=start + 1):
+        bought = time.strftime('%Y-%m-%d %H:%M', time.localtime(order['time'])) # noqa E501
+        items = ', '.join(
+            f"{line['item'].capitalize()} x{line['amount']} ({line['price']})"
+            for line in order['lines']
+            )
+        discount = f" | Code: {order['code']} -{order['discount']}" if order['code'] else '' # noqa E501
+        yield f"{index}. {bought} | {items} | Total: {order['total']}{discount} | Paid: {order['paid']} tomans" # noqa E501
+
+
+def stock_rows(plan, start: int = 0):
+    """
+    rows of restock plan. (lowstock command)
+
+    Parameters
+    ----------
+    plan : iterable of (name, amount, amount to add)
+
+    start: int : index of first row (Default value = 0)
+
+
+    Returns
+    -------
+    generator of rows
+    """
+    for index, (name, amount, restock) in enumerate(plan, start=start + 1):
+        yield f"{index}. Name: {name.capitalize()} | {amount} in stock | restock: {restock}" # noqa E501
+
+
+def write_rows(rows, out=None, batch_size: int = WRITE_BATCH_SIZE) -> int:
+    """
+    Write rows to the output in batches.
+
+    Parameters
+    ----------
+    rows : iterable of rows
+
+    out : output file (Default value = None, sys.stdout)
+
+    batch_size: int : rows in one write (Default value = WRITE_BATCH_SIZE)
+
+
+    Returns
+    -------
+    number of written rows
+    """
+    out = sys.stdout if out is None else out
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        out.write('\n'.join(batch) + '\n')
+        count += len(batch)
+    out.flush()
+    return count
+
+
+class Pager:
+    """
+    Listing that is shown page by page ('page N' / 'next' commands).
+    """
+
+    def __init__(self, rows, total_rows: int, header: str = '',
+                 footer: str = '', page_size: int = PAGE_SIZE):
+        """
+        Parameters
+        ----------
+        rows : function(start) that returns a generator of rows from
+            index `start`
+
+        total_rows: int : number of rows of listing
+
+        header: str : line that is written above every page
+
+        footer: str : line that is written under every page
+
+        page_size: int : rows in one page (Default value = PAGE_SIZE)
+        """
+        self.rows = rows
+        self.total_rows = total_rows
+        self.header = header
+        self.footer = footer
+        self.page_size = max(1, page_size)
+        self.page = 0
+
+    @property
+    def pages(self) -> int:
+        """number of pages."""
+        return max(1, -(-self.total_rows // self.page_size))
+
+    def show(self, number: int, out=None) -> bool:
+        """
+        Write page with given number (starts from 1).
+
+        Returns
+        -------
+        Return False if there isn't such page.
+        """
+        if not 1 <= number <= self.pages:
+            return False
+        self.page = number
+        start = (number - 1) * self.page_size
+        out = sys.stdout if out is None else out
+        if self.header:
+            out.write(self.header + '\n')
+        write_rows(islice(self.rows(start), self.page_size), out)
+        if self.pages > 1:
+            out.write(f"-- page {number}/{self.pages} "
+                      f"('next' / 'page <number>') --\n")
+        if self.footer:
+            out.write(self.footer + '\n')
+        out.flush()
+        return True
+
+    def next(self, out=None) -> bool:
+        """write the next page. (False if it was the last page)"""
+        return self.show(self.page + 1, out)
@@ -0,0 +1,194 @@
+import os
+import time
+import heapq
+import threading
+from collections.abc import Mapping
+# Stock reservations: items in carts hold the stock for a limited time.
+
+# seconds that an item in cart holds the stock
+HOLD_TTL = float(os.environ.get('SHOPPING_LIST_HOLD_TTL', 15 * 60))
+
+# seconds between two runs of the expiry sweeper
+SWEEP_INTERVAL = float(os.environ.get('SHOPPING_LIST_SWEEP_INTERVAL', 5))
+
+
+class ReservationBook:
+    """
+    Holds of stock that items in carts have.
+
+    every hold belongs to an owner (session of user) and a product.
+    an expiry heap keyed by deadline lets the sweeper find expired holds
+    in O(log n). heap entries of extended or dropped holds are skipped
+    when they are popped.
+    """
+
+    def __init__(self, on_expire, ttl: float = HOLD_TTL):
+        """
+        Parameters
+        ----------
+        on_expire : function(owner, product_name, amount) that is called
+            for every expired hold (it must return the stock).
+
+        ttl: float : lifetime of holds in seconds (Default value = HOLD_TTL)
+        """
+        self.on_expire = on_expire
+        self.ttl = ttl
+        # (owner, product name) -> [amount, deadline]
+        self.holds = dict()
+        # product name -> total amount held
+        self.held_amounts = dict()
+        # heap of (deadline, sequence, (owner, product name))
+        self.expiry = list()
+        self.sequence = 0
+        self.lock = threading.Lock()
+        self.sweeper = None
+        self.stop_sweeper = threading.Event()
+
+    def hold(self, owner, product_name: str, amount: int):
+        """
+        Add a hold (or add amount to the hold) and extend its deadline.
+
+        Parameters
+        ----------
+        owner : owner of hold (session)
+
+        product_name: str : name of product
+
+        amount: int : amount of product that has been taken from stock
+        """
+        key = (owner, product_name)
+        deadline = time.monotonic() + self.ttl
+        with self.lock:
+            hold = self.holds.setdefault(key, [0, deadline])
+            hold[0] += amount
+            hold[1] = deadline
+            self.held_amounts[product_name] = \
+                self.held_amounts.get(product_name, 0) + amount
+            self.sequence += 1
+            heapq.heappush(self.expiry, (deadline, self.sequence, key))
+
+    def _pop(self, key) -> int:
+        hold = self.holds.pop(key, None)
+        if hold is None:
+            return 0
+        self.held_amounts[key[1]] -= hold[0]
+        if not self.held_amounts[key[1]]:
+            del self.held_amounts[key[1]]
+        return hold[0]
+
+    def drop(self, owner, product_name: str) -> int:
+        """
+        Remove a hold without touching the stock.
+        (caller has returned the stock itself)
+
+        Returns
+        -------
+        amount of dropped hold (0 if there was no hold)
+        """
+        with self.lock:
+            return self._pop((owner, product_name))
+
+    def commit(self, owner) -> dict:
+        """
+        Turn all holds of owner into sold items. (stock stays decreased)
+
+        Returns
+        -------
+        dictionary of committed holds (product name -> amount)
+        """
+        with self.lock:
+            keys = [key for key in self.holds if key[0] is owner]
+            return {key[1]: self._pop(key) for key in keys}
+
+    def held(self, product_name: str, owner=None) -> int:
+        """
+        amount of product that is held by carts.
+
+        Parameters
+        ----------
+        product_name: str : name of product
+
+        owner : only count this owner's hold (Default value = None)
+        """
+        if owner is not None:
+            hold = self.holds.get((owner, product_name))
+            return hold[0] if hold else 0
+        return self.held_amounts.get(product_name, 0)
+
+    def sweep(self, now: float = None) -> int:
+        """
+        Release expired holds.
+
+        Parameters
+        ----------
+        now : current time.monotonic() (Default value = None)
+
+        Returns
+        -------
+        number of released holds
+        """
+        now = time.monotonic() if now is None else now
+        expired = list()
+        with self.lock:
+            while self.expiry and self.expiry[0][0] <= now:
+                deadline, _, key = heapq.heappop(self.expiry)
+                hold = self.holds.get(key)
+                # stale entry: hold has been extended or dropped
+                if hold is None or hold[1] != deadline:
+                    continue
+                expired.append((key, self._pop(key)))
+        # callbacks run outside of the lock, they may touch holds again
+        for (owner, product_name), amount in expired:
+            self.on_expire(owner, product_name, amount)
+        return len(expired)
+
+    def start_sweeper(self, interval: float = SWEEP_INTERVAL):
+        """sweep expired holds every `interval` seconds in background."""
+        if self.sweeper is not None:
+            return
+        self.sweeper = threading.Thread(
+            target=self._sweep_forever, args=(interval,),
+            name='reservation-sweeper', daemon=True
+            )
+        self.sweeper.start()
+
+    def _sweep_forever(self, interval: float):
+        while not self.stop_sweeper.wait(interval):
+            self.sweep()
+
+
+class PersistedStock(Mapping):
+    """
+    Products database as it must be saved: amounts held by carts
+    are still in stock (only bought items leave the stock).
+    """
+
+    def __init__(self, products_database: Mapping, book: ReservationBook,
+                 buyer=None):
+        """
+        Parameters
+        ----------
+        products_database: Mapping : database of products (in memory)
+
+        book: ReservationBook : holds of carts
+
+        buyer : owner whose holds are being bought (Default value = None)
+        """
+        self.products_database = products_database
+        self.book = book
+        self.buyer = buyer
+
+    def __getitem__(self, product_name: str) -> dict:
+        information = self.products_database[product_name]
+        held = self.book.held(product_name)
+        if self.buyer is not None:
+            held -= self.book.held(product_name, self.buyer)
+        if not held:
+            return information
+        return dict(information, amount=information['amount'] + held)
+
+    def __iter__(self):
+        return iter(self.products_database)
+
+    def __len__(self) -> int:
+        return len(self.products_database)
@@ -0,0 +1,296 @@
+import os
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+# Search of products: prefix, category and fuzzy (typos) search.
+#
+# fuzzy search uses a trigram index: every name is split into the
+# trigrams of '$name$' ('tea' -> '$te' at 0, 'tea' at 1, 'ea$' at 2), and
+# the index keeps the numbers of names that have a trigram at a position
+# (per length of names). a name that is N typos (edits) away from text:
+#   - is at most N letters shorter or longer than text
+#   - has one of N + 1 pieces of text without typo, so it has every
+#     trigram of that piece, moved by the same shift (N at most)
+#   - has every trigram of text, except 3 * N of them, at most N
+#     positions away from its position in text
+# candidates are found by intersecting the lists of the pieces, only
+# CANDIDATES names (with most trigrams of text) are checked with the edit
+# distance. the cost depends on the size of a few lists, not on the
+# number of products.
+# prefix search uses the sorted names of catalog (bisect).
+
+# most results of one search
+SEARCH_LIMIT = int(os.environ.get('SHOPPING_LIST_SEARCH_LIMIT', 50))
+# most names that are checked by edit distance (names with most trigrams
+# of text are checked first)
+CANDIDATES = int(os.environ.get('SHOPPING_LIST_SEARCH_CANDIDATES', 100))
+
+
+def trigrams(text: str) -> list:
+    """(trigram, position) of text (with '$' at start and end)."""
+    padded = f"${text}$"
+    return [(padded[index:index + 3], index)
+            for index in range(len(padded) - 2)]
+
+
+def typos_allowed(text: str) -> int:
+    """number of typos that fuzzy search accepts for text."""
+    return 1 if len(text) <= 4 else 2
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """
+    Edit distance of strings (insert, delete or change of letters).
+
+    Parameters
+    ----------
+    first: str : first string
+
+    second: str : second string
+
+    limit: int : stop when distance is bigger than limit
+
+
+    Returns
+    -------
+    distance, or limit + 1 if it's bigger than limit
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    # only cells near the diagonal can be within limit
+    far = limit + 1
+    previous = list(range(len(second) + 1))
+    for row, letter in enumerate(first, 1):
+        start = max(1, row - limit)
+        stop = min(len(second), row + limit)
+        current = [far] * (len(second) + 1)
+        current[0] = row if row <= limit else far
+        for column in range(start, stop + 1):
+            current[column] = min(
+                previous[column] + 1, current[column - 1] + 1,
+                previous[column - 1] + (letter != second[column - 1])
+                )
+        if min(current[start - 1:stop + 1]) > limit:
+            return far
+        previous = current
+    return min(previous[-1], far)
+
+
+class TrigramIndex:
+    """
+    Trigram index of names:
+        length of name -> (trigram, position) -> numbers of names
+    names can be added and removed, removed names leave a hole that is
+    cleaned when holes are half of the index.
+    """
+
+    def __init__(self, names=()):
+        # number -> name (None for removed names)
+        self.names = list()
+        # name -> number
+        self.numbers = dict()
+        # length of name -> (trigram, position) -> numbers of names
+        self.postings = dict()
+        self.holes = 0
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __contains__(self, name) -> bool:
+        return name in self.numbers
+
+    def add(self, name: str):
+        """add name to index."""
+        if name in self.numbers:
+            return
+        number = len(self.names)
+        self.names.append(name)
+        self.numbers[name] = number
+        postings = self.postings.get(len(name))
+        if postings is None:
+            postings = self.postings[len(name)] = dict()
+        for key in trigrams(name.lower()):
+            numbers = postings.get(key)
+            if numbers is None:
+                numbers = postings[key] = array('I')
+            numbers.append(number)
+
+    def remove(self, name: str):
+        """remove name from index."""
+        number = self.numbers.pop(name, None)
+        if number is None:
+            return
+        self.names[number] = None
+        self.holes += 1
+        if self.holes > len(self.numbers):
+            self._compact()
+
+    def _compact(self):
+        names = [name for name in self.names if name is not None]
+        self.names, self.numbers, self.postings = list(), dict(), dict()
+        self.holes = 0
+        for name in names:
+            self.add(name)
+
+    def _candidates(self, text: str, typos: int):
+        # numbers of names that can be `typos` edits away from text
+        padded = f"${text}$"
+        size = len(padded) // (typos + 1)
+        if size < 4:
+            return self._counted_candidates(text, typos)
+        # text is split into (typos + 1) pieces, one of them has no typo.
+        # so the name has every trigram of that piece, all moved by the
+        # same shift (typos at most)
+        bounds = [size * number for number in range(typos + 1)]
+        bounds.append(len(padded))
+        pieces = [
+            [(padded[index:index + 3], index)
+             for index in range(start, stop - 2)]
+            for start, stop in zip(bounds, bounds[1:])
+            ]
+        candidates = set()
+        for length in range(len(text) - typos, len(text) + typos + 1):
+            postings = self.postings.get(length)
+            if postings is None:
+                continue
+            for piece in pieces:
+                for shift in range(-typos, typos + 1):
+                    lists = list()
+                    for trigram, position in piece:
+                        numbers = postings.get((trigram, position + shift))
+                        if numbers is None:
+                            break
+                        lists.append(numbers)
+                    else:
+                        lists.sort(key=len)
+                        found = set(lists[0])
+                        for numbers in lists[1:]:
+                            found.intersection_update(numbers)
+                            if not found:
+                                break
+                        candidates.update(found)
+        if len(candidates) > CANDIDATES:
+            return self._counted_candidates(text, typos, candidates)
+        return candidates
+
+    def _counted_candidates(self, text: str, typos: int,
+                            among: set = None) -> list:
+        # names (of among) with most trigrams of text. the name has every
+        # trigram of text, except 3 * typos, at most `typos` positions away
+        keys = trigrams(text)
+        needed = len(keys) - 3 * typos
+        candidates = list()
+        for length in range(len(text) - typos, len(text) + typos + 1):
+            postings = self.postings.get(length)
+            if postings is None:
+                continue
+            counts = Counter()
+            for trigram, position in keys:
+                for shifted in range(position - typos, position + typos + 1):
+                    numbers = postings.get((trigram, shifted))
+                    if numbers is None:
+                        continue
+                    if among is None:
+                        counts.update(numbers)
+                    else:
+                        counts.update(among.intersection(numbers))
+            candidates.extend(
+                (hits, number) for number, hits in counts.items()
+                if hits >= needed
+                )
+        return [number for _, number in heapq.nlargest(CANDIDATES, candidates)] # noqa E501
+
+    def similar(self, text: str, limit: int = SEARCH_LIMIT,
+                typos: int = None) -> list:
+        """
+        Names that are at most `typos` edits away from text.
+        names with one typo are searched first, more typos are only
+        searched if nothing is found.
+
+        Parameters
+        ----------
+        text: str : searched text
+
+        limit: int : most names (Default value = SEARCH_LIMIT)
+
+        typos: int : most edits (Default value = None, typos_allowed(text))
+
+
+        Returns
+        -------
+        list of names (closest first)
+        """
+        text = text.lower()
+        typos = typos_allowed(text) if typos is None else typos
+        found = list()
+        for allowed in range(1, typos + 1):
+            for number in self._candidates(text, allowed):
+                name = self.names[number]
+                if name is None:
+                    continue
+                distance = edit_distance(text, name.lower(), allowed)
+                if distance <= allowed:
+                    found.append((distance, name))
+            if found:
+                break
+        found.sort()
+        return [name for _, name in found[:limit]]
+
+
+def names_with_prefix(catalog, prefix: str, limit: int = SEARCH_LIMIT):
+    """names of catalog that start with prefix (sorted, limit at most)."""
+    names = catalog.names
+    start = bisect_left(names, prefix)
+    for name in names[start:start + limit]:
+        if not name.startswith(prefix):
+            break
+        yield name
+
+
+def search_products(catalog, text: str, limit: int = SEARCH_LIMIT) -> list:
+    """
+    Search products by name and category.
+
+    Parameters
+    ----------
+    catalog : Catalog of products
+
+    text: str : searched text
+
+    limit: int : most results (Default value = SEARCH_LIMIT)
+
+
+    Returns
+    -------
+    list of names: names that start with text, then products of categories
+    that start with text, then names with typos.
+    """
+    text = text.strip().lower()
+    if not text:
+        return list()
+    found = dict.fromkeys(names_with_prefix(catalog, text, limit))
+    # there are a few categories, checking all of them is cheap
+    for category in catalog.categories:
+        if len(found) >= limit:
+            break
+        if category.lower().startswith(text):
+            found.update(dict.fromkeys(islice(
+                catalog.names_of_category(category), limit - len(found)
+                )))
+    if len(found) < limit:
+        found.update(dict.fromkeys(
+            catalog.search_index.similar(text, limit - len(found))
+            ))
+    return list(found)[:limit]
+
+
+def suggestions(catalog, text: str, limit: int = 3) -> list:
+    """names of products that look like text (for 'did you mean')."""
+    text = text.strip().lower()
+    if not text:
+        return list()
+    return catalog.search_index.similar(text, limit)
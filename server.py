@@ -0,0 +1,322 @@
+import sys
+import json
+import asyncio
+import logging
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import shopping_list as shop
+from reservations import SWEEP_INTERVAL
+from render import PAGE_SIZE
+from metrics import metrics
+from commands import Command, CommandTable, ParsedCommand, parse_command
+from search import search_products, suggestions
+from discounts import UNKNOWN
+# Server mode of shopping list: many store sessions over a line protocol.
+#
+# every request is one line, every response is one line that starts with
+# 'OK' or 'ERR'.
+#   LOGIN <username> <password>
+#   PRODUCTS [page]
+#   SEARCH <text>
+#   ADD <product name> <amount>
+#   DELETE <product name>
+#   SHOW
+#   ADDMONEY <amount>
+#   BUY [discount code]
+#   STATS
+#   QUIT
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+logger = logging.getLogger()
+
+# storage calls run one at a time, outside of the event loop
+storage_executor = ThreadPoolExecutor(max_workers=1)
+
+
+async def run_storage(function, *args):
+    """run given storage function in the storage thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage_executor, function, *args)
+
+
+def cart_line(session: shop.Session) -> str:
+    """cart of session in one line."""
+    items = ', '.join(
+        f"{name}={amount}" for name, amount in session.choosen_items.items()
+        )
+    total = session.choosen_items.total_price
+    return f"cart [{items}] total={total} balance={session.balance}"
+
+
+async def wrong_input(session, command: ParsedCommand):
+    """response of unknown commands."""
+    return session, "ERR wrong input"
+
+
+# commands of server (verb -> async handler that returns
+# (session, response line))
+server_commands = CommandTable(default=wrong_input)
+
+# commands that can be used before login
+PUBLIC_COMMANDS = ('login', 'products', 'search')
+
+
+@server_commands.register('login')
+async def login_command(session, command: ParsedCommand):
+    """LOGIN <username> <password>"""
+    if len(command.arguments) != 2:
+        return await wrong_input(session, command)
+    username, password = (word.lower() for word in command.arguments)
+    record = shop.context.users.get(username)
+    # hashing runs in a thread, not in the event loop
+    status = await asyncio.get_running_loop().run_in_executor(
+        None, shop.authenticator.check, username, password,
+        record['password'] if record else None
+        )
+    if status == shop.LIMITED:
+        logger.warning("Too many login attempts of %s.", username)
+        metrics.increment('login.limited')
+        return session, "ERR too many login attempts"
+    if status != shop.OK:
+        logger.warning("Incorrect Username/Pass combination Entered.")
+        metrics.increment('login.failed')
+        return session, "ERR username / password combination is incorrect"
+    await run_storage(
+        shop.upgrade_password, username, password, shop.context.users
+        )
+    logger.info("User %s logged in. (server)", username, extra={'user': username}) # noqa E501
+    if session is not None:
+        shop.release_cart(session)
+    session = shop.Session(
+        username, shop.context.users[username]['balance']
+        )
+    # saved cart of user (lines that can't be taken again are dropped)
+    await run_storage(shop.restore_cart, session)
+    return session, f"OK welcome {username} " + cart_line(session)
+
+
+@server_commands.register('products')
+async def products_command(session, command: ParsedCommand):
+    """PRODUCTS [page] (PAGE_SIZE products)"""
+    arguments = command.arguments
+    page = int(arguments[0]) if arguments and arguments[0].isdigit() else 1
+    start = (max(page, 1) - 1) * PAGE_SIZE
+    products = shop.context.products
+    return session, "OK " + ', '.join(
+        f"{name}:{products[name]['price']}:{products[name]['amount']}"
+        for name in islice(products, start, start + PAGE_SIZE)
+        )
+
+
+@server_commands.register('search')
+async def search_command(session, command: ParsedCommand):
+    """SEARCH <text>"""
+    if not command.arguments:
+        return await wrong_input(session, command)
+    products = shop.context.products
+    return session, "OK " + ', '.join(
+        f"{name}:{products[name]['price']}:{products[name]['amount']}"
+        for name in search_products(products, ' '.join(command.arguments)) # noqa E501
+        )
+
+
+@server_commands.register('stats')
+async def stats_command(session, command: ParsedCommand):
+    """STATS (after login)"""
+    return session, "OK " + json.dumps(metrics.snapshot())
+
+
+@server_commands.register('add')
+async def add_command(session, command: ParsedCommand):
+    """ADD <product name> <amount>"""
+    arguments = command.arguments
+    if len(arguments) != 2 or not arguments[1].isdigit():
+        return await wrong_input(session, command)
+    name, amount = arguments[0].lower(), int(arguments[1])
+    if name not in shop.context.products:
+        similar = suggestions(shop.context.products, name)
+        if similar:
+            return session, f"ERR '{name}' is not available in store (did you mean {', '.join(similar)}?)" # noqa E501
+        return session, f"ERR '{name}' is not available in store"
+    status = await run_storage(shop.add_to_cart, session, name, amount)
+    if status != 'added':
+        return session, f"ERR {status}"
+    return session, "OK " + cart_line(session)
+
+
+@server_commands.register('delete')
+async def delete_command(session, command: ParsedCommand):
+    """DELETE <product name>"""
+    if len(command.arguments) != 1:
+        return await wrong_input(session, command)
+    name = command.arguments[0]
+    if not await run_storage(shop.delete_from_cart, session, name.lower()):
+        return session, f"ERR {name} is not in the shopping list"
+    return session, "OK " + cart_line(session)
+
+
+@server_commands.register('show')
+async def show_command(session, command: ParsedCommand):
+    """SHOW"""
+    return session, "OK " + cart_line(session)
+
+
+@server_commands.register('history')
+async def history_command(session, command: ParsedCommand):
+    """HISTORY [page] (PAGE_SIZE orders, newest first)"""
+    arguments = command.arguments
+    page = int(arguments[0]) if arguments and arguments[0].isdigit() else 1
+    start = (max(page, 1) - 1) * PAGE_SIZE
+
+    def read_page():
+        return list(islice(
+            shop.context.ledger.orders(session.username, start), PAGE_SIZE
+            ))
+    orders = await run_storage(read_page)
+    return session, "OK " + ', '.join(
+        f"{int(order['time'])}:{order['paid']}:" + '+'.join(
+            f"{line['item']}={line['amount']}" for line in order['lines']
+            )
+        for order in orders
+        )
+
+
+@server_commands.register('lowstock')
+async def lowstock_command(session, command: ParsedCommand):
+    """LOWSTOCK (admins): restock plan of low products"""
+    if not shop.is_admin(session.username):
+        return session, "ERR admins only"
+    plan = shop.context.stock_monitor.restock_plan(PAGE_SIZE)
+    return session, "OK " + ', '.join(
+        f"{name}:{amount}:{restock}" for name, amount, restock in plan
+        )
+
+
+@server_commands.register('restock')
+async def restock_command(session, command: ParsedCommand):
+    """RESTOCK <name> <amount> (admins)"""
+    if not shop.is_admin(session.username):
+        return session, "ERR admins only"
+    arguments = command.arguments
+    if len(arguments) != 2 or arguments[0] not in shop.context.products \
+            or not arguments[1].isdigit() or int(arguments[1]) <= 0:
+        return await wrong_input(session, command)
+    name, amount = arguments[0], int(arguments[1])
+    await run_storage(shop.restock, [(name, amount)])
+    session.log.info("User: %s Restocked %s %s. (server)", session.username, amount, name) # noqa E501
+    return session, f"OK {name}={shop.product_amount(name)}"
+
+
+@server_commands.register('addmoney')
+async def addmoney_command(session, command: ParsedCommand):
+    """ADDMONEY <amount>"""
+    arguments = command.arguments
+    if len(arguments) != 1 or not arguments[0].isdigit():
+        return await wrong_input(session, command)
+    await run_storage(shop.add_money, session, int(arguments[0]))
+    return session, f"OK balance={session.balance}"
+
+
+@server_commands.register('buy')
+async def buy_command(session, command: ParsedCommand):
+    """BUY [discount code]"""
+    arguments = command.arguments
+    if len(arguments) > 1:
+        return await wrong_input(session, command)
+    if not session.choosen_items:
+        return session, "ERR your shopping cart is empty"
+    code = None
+    if arguments:
+        code = arguments[0].lower()
+        code_status = shop.context.discount_codes.check(code)
+        if code_status == UNKNOWN:
+            return session, "ERR incorrect code"
+        if code_status != shop.VALID:
+            return session, f"ERR {code_status} code"
+    purchase = await run_storage(shop.finish_purchase, session, code)
+    if purchase != 'done':
+        return session, f"ERR {shop.PURCHASE_ERRORS[purchase]}"
+    session.log.info("User: %s Finished the buy. (server)", session.username) # noqa E501
+    return session, f"OK thanks for your purchase balance={session.balance}" # noqa E501
+
+
+async def handle_command(session, command: ParsedCommand):
+    """
+    Run one command of a client.
+
+    Parameters
+    ----------
+    session : session of client (None before login)
+
+    command: ParsedCommand : command line of client
+
+
+    Returns
+    -------
+    (session, response line)
+    """
+    if session is None and command.verb not in PUBLIC_COMMANDS:
+        return session, "ERR login first"
+    return await server_commands.dispatch(session, command)
+
+
+async def sweep_holds(interval: float = SWEEP_INTERVAL):
+    """
+    release expired cart holds. expired items are removed from carts in
+    the storage thread, where the other changes of carts run.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await run_storage(shop.context.reservations.sweep)
+
+
+async def handle_client(reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter):
+    """serve one client until it quits or disconnects."""
+    session = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            # one command per line (';' isn't a separator here, every
+            # request has one response)
+            command = parse_command(line.decode())
+            if not command.verb:
+                continue
+            if command.verb in Command.EXIT.value:
+                writer.write(b"OK bye\n")
+                break
+            with metrics.timer(f"server.{command.verb}"):
+                session, response = await handle_command(session, command)
+            writer.write(response.encode() + b"\n")
+            await writer.drain()
+    finally:
+        # items of unfinished cart go back to the stock
+        if session is not None:
+            shop.release_cart(session)
+        writer.close()
+
+
+async def serve(host: str = HOST, port: int = PORT):
+    """start the server and serve forever."""
+    server = await asyncio.start_server(handle_client, host, port)
+    sweeper = asyncio.create_task(sweep_holds())
+    logger.info("Server started on %s:%s", host, port)
+    print(f"Serving on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+    sweeper.cancel()
+
+
+if __name__ == '__main__':
+    # python server.py [host] [port]
+    shop.configure_logging()
+    host = sys.argv[1] if len(sys.argv) > 1 else HOST
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else PORT
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
@@ -1,56 +1,150 @@
-import os
-import json
 import logging
-import logging.config
-from enum import Enum
+import threading
+from typing import NamedTuple
+from itertools import islice
+from functools import cached_property
+from contextlib import contextmanager
+from storage import storage_backend
+from log_setup import configure_logging, SessionLogger
+from metrics import metrics, session_profile
+from catalog import Catalog
+from cart import Cart, ORDERS
+from pricing import to_tomans
+from discounts import (
+    DiscountBook, DiscountRule, VALID, EXPIRED, USED_UP
+    )
+from auth import (
+    Authenticator, hash_password, needs_rehash, is_admin, OK, LIMITED
+    )
+from reservations import ReservationBook, PersistedStock
+from cart_store import CartStore, CART, LIST
+from ledger import OrderLedger
+from inventory import StockMonitor
+from render import (
+    Pager, product_rows, cart_rows, list_rows, order_rows, stock_rows,
+    write_rows, clear_screen, message
+    )
+from search import search_products, suggestions
+from commands import (
+    Command, CommandTable, ParsedCommand, VERBS, LEAVE, QUIT, tokenize
+    )
 # Shopping list by Bobby zare (Functional Version)
 
-# Configuration logging using Custom TOML config file
-logging.config.fileConfig(fname='log_configuration.toml', disable_existing_loggers=False) # noqa E501
-
-# Creating a logger
+# Creating a logger (configured in main())
 logger = logging.getLogger()
 
-# database of users for shopping list program.
-with open('./json_files/users.json', mode='r') as f:
-    users: dict = json.load(f)
-
-# Discount codes database
-with open('./json_files/discount_codes.json', mode='r') as f:
-    DISCOUNT_CODE_DATABASE: dict = json.load(f)
-
-# Database of products available. iclude price and amount.
-with open('./json_files/products.json', mode='r') as f:
-    products: dict = json.load(f)
-
-
-# Commands of program (Using Enum)
-class Command(Enum):
-    EXIT = ('quit', 'q', 'ex', 'exit')
-    PRODUCTS = ('prods', 'products', 'product')
-    DELETE = "delete"
-    SHOW = "show"
-    HELP = "help"
-    BUY = 'buy'
-    ADDMONEY = "addmoney"
-    CATEGORY = ('category', 'categories')
-    LOGOUT = 'logout'
 
+class ShopContext:
+    """
+    Shared data of the shop (storage and databases).
+    nothing is loaded until the first access of each attribute.
+    """
 
-# an dictionary that contains in the shopping list
-choosen_items = dict()
-
-# order of showing items in cart (only in store mode)
-order = 'default'
+    def __init__(self, storage=None):
+        self._storage = storage
+
+    @cached_property
+    def storage(self):
+        """storage of users and products databases."""
+        if self._storage is None:
+            return storage_backend()
+        return self._storage
+
+    @cached_property
+    def users(self) -> dict:
+        """database of users for shopping list program."""
+        with metrics.timer('storage.load_users'):
+            return self.storage.load_users()
+
+    @cached_property
+    def products(self) -> Catalog:
+        """Database of products available. iclude price and amount."""
+        with metrics.timer('storage.load_products'):
+            products = self.storage.load_products()
+        # binary storage gives a catalog that builds its indexes lazily
+        if not isinstance(products, Catalog):
+            products = Catalog(products)
+        # warnings of low stock from the first sale
+        return self.stock_monitor.watch(products).catalog
+
+    @cached_property
+    def reservations(self) -> ReservationBook:
+        """holds of stock that items in carts have."""
+        return ReservationBook(on_expire=expire_hold)
+
+    @cached_property
+    def discount_codes(self) -> DiscountBook:
+        """Discount codes database (rules and counters of uses)"""
+        return DiscountBook.load()
+
+    @cached_property
+    def carts(self) -> CartStore:
+        """saved carts and shopping lists of users."""
+        return CartStore()
+
+    @cached_property
+    def cart_sessions(self) -> dict:
+        """session that has the saved cart of user (username -> Session)."""
+        return dict()
+
+    @cached_property
+    def ledger(self) -> OrderLedger:
+        """ledger of finished purchases (history command)."""
+        return OrderLedger()
+
+    @cached_property
+    def stock_monitor(self) -> StockMonitor:
+        """
+        low stock of products (follows every change of stock of products
+        after they're loaded).
+        """
+        return StockMonitor.load()
+
+
+class ListItem(NamedTuple):
+    """Item of shopping list (list mode), as small as a tuple."""
+    price: float
+    amount: int
+
+
+class Session:
+    """State of one logged in user."""
+
+    def __init__(self, username, balance: float = 0, mode: str = 'store'):
+        self.username = username
+        self.balance = balance
+        # balance of user at the start of purchase
+        self.first_balance = balance
+        self.mode = mode
+        # cart of items that user added (store mode)
+        self.choosen_items = Cart(price_of=product_price)
+        # an dictionary that contains in the shopping list (list mode)
+        self.shopping_list = dict()
+        # order of showing items in cart (only in store mode)
+        self.order = 'default'
+        # listing that is shown page by page (products, category, show)
+        self.pager = None
+        # logger that adds the username to records
+        self.log = SessionLogger(logger, {'user': username})
+        # guards cart and balance (the reservation sweeper runs in another
+        # thread)
+        self.lock = threading.RLock()
+
+
+# context of the running shop (loaded lazily)
+context = ShopContext()
+
+# checks logins (verify cache and login rate limit)
+authenticator = Authenticator()
+
+# one lock per product, so changing the stock is atomic (server mode)
+stock_locks = dict()
+stock_locks_guard = threading.Lock()
 
 # Functions Defined Here...
 
 
-def clear_screen():
-    """clear the terminal."""
-    return os.system('clear')
-
-
+@metrics.timed('storage.update_user_balance')
 def update_user_balance(user_balance: float, username, users_database):
     """
     Update the user's balance in database.
@@ -69,11 +163,11 @@ def update_user_balance(user_balance: float, username, users_database):
 
     """
     users_database[username]['balance'] = user_balance
-    with open('./json_files/users.json', mode='w') as f:
-        json.dump(users_database, f, indent=4)
+    context.storage.save_user(username, users_database)
 
 
-def update_products(products_database: dict):
+@metrics.timed('storage.update_products')
+def update_products(products_database: dict, names=None):
     """
     Update the database of products.
 
@@ -81,21 +175,54 @@ def update_products(products_database: dict):
     ----------
     products_database: dict : database of products.
 
+    names : names of changed products (Default value = None)
+        None means all of products.
+
 
     Returns
     -------
 
     """
-    with open('./json_files/products.json', mode='w') as f:
-        json.dump(products_database, f, indent=4)
+    context.storage.save_products(products_database, names)
+
+
+@metrics.timed('storage.checkout')
+def checkout(user_balance: float, username, users_database: dict,
+             products_database: dict, cart: dict) -> bool:
+    """
+    Save the new balance of user and the stock of purchased items
+    in one step (single transaction in sqlite storage).
+
+    Parameters
+    ----------
+    user_balance: float : balance of user after the purchase
+
+    username : username of user
+
+    users_database: dict : users database
+
+    products_database: dict : database of products.
+
+    cart: dict : purchased items (name -> amount)
+
+
+    Returns
+    -------
+    Return True if the purchase has been saved.
+    """
+    users_database[username]['balance'] = user_balance
+    return context.storage.checkout(
+        username, users_database, products_database, cart
+        )
 
 
+@metrics.timed('storage.load_users_database')
 def load_users_database():
     """load / Reload users database."""
-    with open('./json_files/users.json', mode='r') as f:
-        return json.load(f)
+    return context.storage.load_users()
 
 
+@metrics.timed('storage.create_account')
 def create_account(username, password, users_database: dict):
     """
     adding new account to users database.
@@ -117,11 +244,13 @@ def create_account(username, password, users_database: dict):
     if username in users_database:
         return False
     users_database[username] = {
-            "password": password,
+            "password": hash_password(password),
             "balance": 30000
         }
-    with open('./json_files/users.json', mode='w') as f:
-        json.dump(users_database, f, indent=3, separators=(', ', ': '))
+    # username may have been taken by another process
+    if not context.storage.create_user(username, users_database):
+        del users_database[username]
+        return False
     return True
 
 
@@ -140,24 +269,95 @@ def show_cart(cart: dict, showing_order: str = 'default'):
     -------
 
     """
-    showing_order = showing_order.upper()
     if len(cart) > 0:
-        print(f"**(Order: {showing_order}) Items in your Cart: \n")
-        all_items_price = float()
-        index = 0  # indexing the items in shopping list
-        for name, amount in cart.items():  # (in choosen_list)
-            pure_item_price = product_price(name)
-            price = (pure_item_price * amount)  # Price of item
-            index += 1  # starts from 1
-            name = name.capitalize()
-            all_items_price += price
-            print(f"{index}. Name: {name} ][ Price: {pure_item_price} tomans ][ amount: {amount} | Total Price: {price}") # noqa E501
-        print("\n===========================================================")
-        print(f"Total items: {len(cart)} | Total price: {all_items_price}")
+        pager = cart_pager(cart, showing_order)
+        print(pager.header)
+        write_rows(pager.rows(0))
+        print(pager.footer)
     else:
         print("Oops! Your cart is empty.\n")
 
 
+def cart_pager(cart: dict, showing_order: str = 'default') -> Pager:
+    """
+    Pages of items in cart. (store mode)
+
+    Parameters
+    ----------
+    cart: dict : cart of user (Cart or dictionary of name -> amount)
+
+    showing_order : order of showing items in cart
+         (Default value = 'Default')
+
+    Returns
+    -------
+    Pager of cart
+    """
+    if isinstance(cart, Cart):
+        # cart keeps every order and the total price up to date
+        names = cart.names_in_order
+        price_of = cart.prices.__getitem__
+        all_items_price = float(cart.total_price)
+    else:
+        names = cart.__iter__
+        price_of = product_price
+        all_items_price = float(sum(
+            product_price(name) * amount for name, amount in cart.items()
+            ))
+        showing_order = 'default'
+    return Pager(
+        lambda start: cart_rows(
+            islice(names(showing_order), start, None), cart, price_of, start
+            ),
+        len(cart),
+        header=f"**(Order: {showing_order.upper()}) Items in your Cart: \n",
+        footer="\n===========================================================\n" # noqa E501
+               f"Total items: {len(cart)} | Total price: {all_items_price}"
+        )
+
+
+def products_pager(database_of_products: dict, header: str,
+                   category_name=None) -> Pager:
+    """
+    Pages of products (products / category commands).
+
+    Parameters
+    ----------
+    database_of_products: dict : a database that contains the products
+
+    header: str : header of pages
+
+    category_name : only show products of this category
+        (Default value = None)
+
+    Returns
+    -------
+    Pager of products
+    """
+    if category_name is None:
+        def names(start):
+            return islice(database_of_products, start, None)
+        total_rows = len(database_of_products)
+    elif isinstance(database_of_products, Catalog):
+        def names(start):
+            return islice(
+                database_of_products.names_of_category(category_name),
+                start, None
+                )
+        total_rows = database_of_products.count_of_category(category_name)
+    else:
+        category = products_by_category(category_name, database_of_products)
+
+        def names(start):
+            return islice(category, start, None)
+        total_rows = len(category)
+    return Pager(
+        lambda start: product_rows(names(start), database_of_products),
+        total_rows,
+        header=header
+        )
+
+
 def show_list(shopping_list: dict):
     """Showing Shopping List (list mode)
 
@@ -173,16 +373,10 @@ def show_list(shopping_list: dict):
     """
     if len(shopping_list) > 0:
         print("** Items in your Cart: \n")
-        all_items_price = float()
-        index = 0  # indexing the items in shopping list
-        for name, information in shopping_list.items():  # (in choosen_list)
-            pure_item_price = information[0]
-            amount = information[1]
-            price = (pure_item_price * amount)  # Price of item
-            index += 1  # starts from 1
-            name = name.capitalize()
-            all_items_price += price
-            print(f" {index}. Name: {name} | Price: {pure_item_price} tomans | amount: {amount} | Total Price: {price}") # noqa E501
+        write_rows(list_rows(shopping_list))
+        all_items_price = float(sum(
+            price * amount for price, amount in shopping_list.values()
+            ))
         print("\n===========================================================") # noqa E501
         print(f"Total items: {len(shopping_list)} | Total price: {all_items_price}") # noqa E501
     else:
@@ -203,6 +397,9 @@ def products_by_category(category_name, database_of_products: dict) -> dict:
     -------
     dictionary of products in given category
     """
+    # catalog has an index of categories
+    if isinstance(database_of_products, Catalog):
+        return database_of_products.by_category(category_name)
     result = dict()
     for name, information in database_of_products.items():
         if information['category'] == category_name:
@@ -223,15 +420,10 @@ def order_by_amount(shopping_list: dict) -> dict:
     shopping list sorted by amount (increasing)
 
     """
-
-    values_sorted = sorted(list(shopping_list.values()))
-
-    result = dict()
-    for value in values_sorted:
-        for name, amount in shopping_list.items():
-            if value == amount:
-                result[name] = amount
-    return result
+    # cart keeps its items sorted
+    if isinstance(shopping_list, Cart):
+        return shopping_list.ordered('amount')
+    return dict(sorted(shopping_list.items(), key=lambda item: item[1]))
 
 
 def order_by_name(shopping_list: dict) -> dict:
@@ -248,18 +440,14 @@ def order_by_name(shopping_list: dict) -> dict:
 
 
     """
+    # cart keeps its items sorted
+    if isinstance(shopping_list, Cart):
+        return shopping_list.ordered('name')
+    return dict(sorted(shopping_list.items()))
 
-    keys_sorted = sorted(list(shopping_list.keys()))
 
-    result = dict()
-    for key in keys_sorted:
-        for name, amount in shopping_list.items():
-            if key == name:
-                result[name] = amount
-    return result
-
-
-def buy(balance: float, product_name: str, amount: int):
+def buy(balance: float, product_name: str, amount: int,
+        price: int = None):
     """
     return user's balance after decreasing the price of product.
 
@@ -271,6 +459,9 @@ def buy(balance: float, product_name: str, amount: int):
 
     amount: int : amount of product that user wants to buy
 
+    price: int : price of each unit, current price of product if None
+        (Default value = None)
+
     Returns
     -------
     if the user balance after decraesing is less than zero(
@@ -278,9 +469,9 @@ def buy(balance: float, product_name: str, amount: int):
     if the decreasing was successful, Return Balance
 
     """
-    price = float()
-    price += (product_price(product_name) * amount)
-    balance -= price
+    if price is None:
+        price = product_price(product_name)
+    balance -= float(price * amount)
 
     if balance < 0:  # if the balance at the end is less than 0
         return False
@@ -309,10 +500,8 @@ def refund(balance: float, item_price: float, amount: int) -> float:
 
 
 def show_help():
-    """Read and Print the program's help from file"""
-    with open('./message_files/help_message.txt', mode='r') as help_file:
-        help_message = help_file.read()
-    print(help_message)
+    """Print the program's help (read once from file)"""
+    print(message('help_message'))
 
 
 def add_item(item_name: str, amount: int, shopping_list: dict):
@@ -332,7 +521,7 @@ def add_item(item_name: str, amount: int, shopping_list: dict):
     adding name of item and amount of it to the shopping list.
     (dictionary of shopping list)
     """
-    shopping_list[item_name] = amount
+    shopping_list[item_name] = shopping_list.get(item_name, 0) + amount
 
 
 def remove_item(item_name: str, shopping_list: dict):
@@ -369,7 +558,7 @@ def product_price(product_name: str):
 
 
     """
-    price = products[product_name]['price']
+    price = context.products[product_name]['price']
     return price
 
 
@@ -386,7 +575,7 @@ def product_amount(product_name: str) -> int:
     -------
     return amount of given product available in stock.
     """
-    amount = products[product_name]['amount']
+    amount = context.products[product_name]['amount']
     return amount
 
 
@@ -404,7 +593,8 @@ def increase_stock(amount: int, product_name: str):
     -------
     increase the amount of product in the database.
     """
-    products[product_name]['amount'] += amount
+    with stock_lock(product_name):
+        context.products[product_name]['amount'] += amount
 
 
 def decrease_stock(amount: int, product_name: str):
@@ -423,13 +613,374 @@ def decrease_stock(amount: int, product_name: str):
 
 
     """
-    if (product_amount(product_name) - amount) > 0:
-        products[product_name]['amount'] -= amount
-        return True
+    with stock_lock(product_name):
+        if (product_amount(product_name) - amount) > 0:
+            context.products[product_name]['amount'] -= amount
+            return True
+
+
+@metrics.timed('storage.restock')
+def restock(plan: list):
+    """
+    Add stock of products and save them with one write.
+
+    Parameters
+    ----------
+    plan: list : (name of product, amount to add)
+    """
+    for product_name, amount in plan:
+        increase_stock(amount, product_name)
+    # amounts held by carts are still in stock
+    context.storage.save_products(
+        PersistedStock(context.products, context.reservations),
+        [product_name for product_name, _ in plan]
+        )
+
+
+def stock_lock(product_name: str) -> threading.Lock:
+    """lock that guards the stock of given product."""
+    lock = stock_locks.get(product_name)
+    if lock is None:
+        with stock_locks_guard:
+            lock = stock_locks.setdefault(product_name, threading.Lock())
+    return lock
+
+
+def add_to_cart(session: Session, product_name: str, amount: int,
+                save: bool = True) -> str:
+    """
+    Take given amount of product from stock and add it to the cart.
+
+    Parameters
+    ----------
+    session: Session : session of user
+
+    product_name: str : name of product
+
+    amount: int : amount of product
+
+    save: bool : save the new line of cart (Default value = True)
+
+
+    Returns
+    -------
+    'added' if the item has been added,
+    'no money' if user havn't enough money,
+    'no stock' if we don't have enough of product in stock.
+    """
+    with session.lock:
+        # more units of a line in cart are charged with the price of line
+        new_balance = buy(session.balance, product_name, amount,
+                          session.choosen_items.prices.get(product_name))
+        # if user have enough money
+        if not new_balance:
+            return 'no money'
+        # if decreasing from store finished correctly
+        if not decrease_stock(amount, product_name):
+            return 'no stock'
+        context.reservations.hold(session, product_name, amount)
+        session.balance = new_balance
+        add_item(product_name, amount, session.choosen_items)
+        if save:
+            context.carts.save_line(
+                session.username, CART, product_name,
+                session.choosen_items[product_name]
+                )
+        return 'added'
+
+
+def delete_from_cart(session: Session, product_name: str,
+                     save: bool = True) -> bool:
+    """
+    Remove product from the cart, refund its price and return it to stock.
+
+    Parameters
+    ----------
+    session: Session : session of user
+
+    product_name: str : name of product
+
+    save: bool : remove the line from saved cart too (Default value = True)
+
+
+    Returns
+    -------
+    Return False if the product wasn't in the cart.
+    """
+    with session.lock:
+        if product_name not in session.choosen_items:
+            return False
+        # Last parameter is the amount of product
+        #  that user have in his/her shopping list.
+        session.balance = refund(
+            session.balance,
+            session.choosen_items.prices[product_name],
+            session.choosen_items[product_name]
+            )
+        context.reservations.drop(session, product_name)
+        if save:
+            context.carts.remove_line(session.username, CART, product_name)
+        return remove_item(product_name, session.choosen_items)
+
+
+def release_cart(session: Session):
+    """
+    return all items of cart to the stock. (quit / logout)
+    the saved cart is kept, it's restored at the next login.
+    """
+    with session.lock:
+        for product_name in list(session.choosen_items):
+            delete_from_cart(session, product_name, save=False)
+    if context.cart_sessions.get(session.username) is session:
+        del context.cart_sessions[session.username]
+
+
+def add_money(session: Session, amount: int):
+    """
+    Add money to the balance of user and save it.
+    the saved balance doesn't have the held prices of cart, because the
+    cart is restored (and paid again) at the next login.
+
+    Parameters
+    ----------
+    session: Session : session of user
+
+    amount: int : money to add (tomans)
+    """
+    with session.lock:
+        session.balance += amount
+        session.first_balance += amount
+        update_user_balance(
+            session.first_balance, session.username, context.users
+            )
+
+
+def restore_cart(session: Session) -> dict:
+    """
+    Put the saved cart of user back in the cart (after login).
+    stock and money are taken again, lines that can't be taken are
+    removed from the saved cart.
+    only one session of user has the saved cart: the cart of an older
+    session (e.g. another connection) goes back to the stock first, so
+    stock and money aren't taken twice.
+
+    Parameters
+    ----------
+    session: Session : session of user
+
+
+    Returns
+    -------
+    lines that couldn't be restored (name -> 'no stock', 'no money' or
+    'not in store')
+    """
+    failed = dict()
+    previous = context.cart_sessions.get(session.username)
+    if previous is session:
+        # already restored
+        return failed
+    if previous is not None:
+        release_cart(previous)
+    context.cart_sessions[session.username] = session
+    saved = context.carts.load(session.username)[CART]
+    for product_name, record in saved.items():
+        if product_name not in context.products:
+            status = 'not in store'
+        else:
+            status = add_to_cart(
+                session, product_name, record['amount'], save=False
+                )
+        if status != 'added':
+            failed[product_name] = status
+            context.carts.remove_line(session.username, CART, product_name)
+    return failed
+
+
+def restore_list(session: Session):
+    """put the saved shopping list of user back (list mode)."""
+    saved = context.carts.load(session.username)[LIST]
+    for item_name, record in saved.items():
+        session.shopping_list[item_name] = ListItem(
+            record['price'], record['amount']
+            )
+
+
+def expire_hold(session: Session, product_name: str, amount: int):
+    """
+    remove the item whose hold has been expired from the cart.
+    (called by the reservation sweeper)
+    the line stays in saved cart, it's taken again at the next login.
+    """
+    # the sweeper runs in another thread, the cart may have been bought
+    # or changed since the hold has been popped
+    with session.lock:
+        if delete_from_cart(session, product_name, save=False):
+            session.log.info("Hold of %s %s expired.", amount, product_name, extra={'item': product_name, 'amount': amount}) # noqa E501
+
+
+def capped_discount(discount_code, cart: Cart):
+    """
+    discount price of given code for a purchase.
+
+    Parameters
+    ----------
+    discount_code : given discount code (must be in database)
+
+    cart: Cart : cart of purchase
+
+
+    Returns
+    -------
+    discount price (cap of code, 300,000 tomans by default, at most)
+    """
+    # discount is calculated in integer minor units by the pricing engine,
+    # only for items of the categories of code.
+    return to_tomans(context.discount_codes.discount(
+        discount_code, cart.pricing, product_category
+        ))
+
+
+def product_category(product_name: str):
+    """category of given product."""
+    return context.products[product_name]['category']
+
+
+def finish_purchase(session: Session, discount_code=None) -> str:
+    """
+    Save the purchase of items in cart and empty the cart.
+
+    Parameters
+    ----------
+    session: Session : session of user
+
+    discount_code : code of discount (Default value = None)
+
+
+    Returns
+    -------
+    'done' if the purchase has been saved,
+    'cart empty' if holds of all items have expired,
+    'code used up' if discount code can't be used anymore,
+    'sold out' if some items are sold out.
+    """
+    # cart and balance don't change (the sweeper waits) from the check of
+    # cart until the holds are committed
+    with session.lock:
+        # holds may have expired while user was confirming the purchase,
+        # so the discount is calculated for the cart as it is now
+        if not session.choosen_items:
+            return 'cart empty'
+        discounts = context.discount_codes
+        discount_price = 0
+        if discount_code is not None:
+            if not discounts.redeem(discount_code, session.username):
+                return 'code used up'
+            discount_price = capped_discount(
+                discount_code, session.choosen_items
+                )
+        # amounts held by other carts are still in stock
+        products_database = PersistedStock(
+            context.products, context.reservations, buyer=session
+            )
+        if not checkout(session.balance + discount_price,
+                        session.username,
+                        context.users,
+                        products_database,
+                        session.choosen_items):
+            metrics.increment('checkout.sold_out')
+            if discount_code is not None:
+                discounts.release(discount_code, session.username)
+            return 'sold out'
+        metrics.increment('checkout.done')
+        context.reservations.commit(session)
+        cart = session.choosen_items
+        context.ledger.record(
+            session.username,
+            [(name, amount, cart.prices[name])
+             for name, amount in cart.items()],
+            cart.total_price, discount_price, discount_code
+            )
+        # lines that are added later (other sessions) are kept
+        context.carts.remove_lines(session.username, CART, list(cart))
+        session.balance += discount_price
+        session.first_balance = session.balance
+        session.choosen_items.clear()
+        return 'done'
+
+
+# messages of failed purchases
+PURCHASE_ERRORS = {
+    'cart empty': "Sorry! Your cart has expired, items are back in store.",
+    'sold out': "Sorry! Some items are sold out.",
+    'code used up': "Sorry! This discount code can't be used anymore.",
+}
+
+
+def command_name(command: ParsedCommand) -> str:
+    """
+    name of given command (for metrics and logs).
 
+    Parameters
+    ----------
+    command: ParsedCommand : command of user
+
+
+    Returns
+    -------
+    name of Command, 'item' (name of product) or 'other'
+    """
+    found = VERBS.get(command.verb)
+    if found is not None:
+        return found.name.lower()
+    if command.verb in context.products:
+        return 'item'
+    return 'other'
+
+
+@contextmanager
+def command_timer(session: Session, command: ParsedCommand):
+    """
+    time the dispatch of a command and log it with its latency.
+
+    Parameters
+    ----------
+    session: Session : session of user
+
+    command: ParsedCommand : command of user
+    """
+    name = command_name(command)
+    with metrics.timer(f"command.{name}") as timing:
+        yield
+    session.log.info("User: %s| Command: '%s'", session.username, command.text, extra={'command': name, 'latency': round(timing['latency'], 6)}) # noqa E501
+
+
+def run_script(table: CommandTable, session: Session, user_input: str):
+    """
+    Run the commands of input one by one. ('apple 3; tea 2; show')
 
-def mode_status() -> str:
-    """ """
+    Parameters
+    ----------
+    table: CommandTable : commands of mode
+
+    session: Session : session of user
+
+    user_input : input of user
+
+
+    Returns
+    -------
+    LEAVE or QUIT if a command stopped the script, otherwise None.
+    """
+    for command in tokenize(user_input):
+        with command_timer(session, command):
+            signal = table.dispatch(session, command)
+        if signal is not None:
+            return signal
+    return None
+
+
+def mode_status(mode: str) -> str:
+    """status line of given mode"""
     return f"\n<{mode.upper()} MODE>"
 
 
@@ -449,10 +1000,50 @@ def is_authenticated(username, password, users_database):
     -------
     return True if authenication was successful, otherwise False.
     """
-    if username in users_database.keys():
-        if password == users_database.get(username)['password']:
-            return True
-    return False
+    return login_status(username, password, users_database) == OK
+
+
+def login_status(username, password, users_database) -> str:
+    """
+    check the login of user and hash its password if it's plaintext.
+
+    Parameters
+    ----------
+    username : entered username
+
+    password : entered password
+
+    users_database : database that contains the information of users
+
+
+    Returns
+    -------
+    OK, DENIED or LIMITED (too many login attempts)
+    """
+    record = users_database.get(username)
+    status = authenticator.check(
+        username, password, record['password'] if record else None
+        )
+    if status == OK:
+        upgrade_password(username, password, users_database)
+    elif status == LIMITED:
+        metrics.increment('login.limited')
+    return status
+
+
+@metrics.timed('storage.upgrade_password')
+def upgrade_password(username, password, users_database):
+    """
+    replace plaintext (or old) password of user with a new hash.
+    (after a successful login)
+    """
+    if needs_rehash(users_database[username]['password']):
+        new_hash = hash_password(password)
+        users_database[username]['password'] = new_hash
+        context.storage.save_user(username, users_database)
+        # verify cache is keyed to the stored value, so the next login
+        # is a hit instead of another scrypt
+        authenticator.cache.add(username, password, new_hash)
 
 
 def discount(discount_code, total_price, discount_code_database) -> float:
@@ -471,383 +1062,571 @@ def discount(discount_code, total_price, discount_code_database) -> float:
     return the total price after decreasing discount.
     """
     persent_of_discount = discount_code_database[discount_code]
+    if isinstance(persent_of_discount, DiscountRule):
+        persent_of_discount = persent_of_discount.percent
     return (persent_of_discount * total_price) / 100
 
 
-# Main block of code here
+# Commands of list mode
+
 
-clear_screen()
+def list_add(session: Session, command: ParsedCommand):
+    """add item to the shopping list: <name> <price> <amount>"""
+    if len(command.arguments) != 2 or \
+            not all(word.isdigit() for word in command.arguments):
+        print(input("WRONG FORMAT! Hit enter to continue..."))
+        return
+    product_name = command.verb
+    price, amount = (int(word) for word in command.arguments)
+    if product_name in session.shopping_list:
+        print(f"{amount}  '{product_name}' is already in shopping list.")
+    else:
+        session.shopping_list[product_name] = ListItem(price, amount)
+        context.carts.save_line(
+            session.username, LIST, product_name, amount, price
+            )
+        print(f"""
+        {amount}  '{product_name}' has been added to shopping list.
+        """)
+
+
+list_commands = CommandTable(default=list_add)
+
+
+@list_commands.register(Command.EXIT)
+def list_exit(session: Session, command: ParsedCommand):
+    """show the shopping list and leave list mode."""
+    if session.shopping_list:  # If session.shopping_list isn't empty
+        print("Your shopping list items:\n")
+        show_list(session.shopping_list)
+    return LEAVE
+
+
+@list_commands.register(Command.DELETE)
+def list_delete(session: Session, command: ParsedCommand):
+    """delete item from the shopping list: delete <product name>"""
+    if len(command.arguments) != 1:   # checking input format
+        print("Wrong Input!. Check this --> <Delete> <product name> .")
+        return
+    pure_item_name = command.arguments[0]
+    # if item was exist and has been deleted successfully
+    # (items of shopping list aren't taken from stock)
+    if session.shopping_list.pop(pure_item_name, None) is not None:
+        context.carts.remove_line(session.username, LIST, pure_item_name)
+        print(f"""
+        '{pure_item_name}' has been fully deleted successfully.
+        """)
+        show_list(session.shopping_list)
+    else:
+        print(f"{pure_item_name} is not in the shopping list.")
 
-# Starting message (loaded from ./message_file/help_message.txt)
-with open('./message_files/banner.txt', mode='r') as banner_file:
-    banner = banner_file.read()
-    print(banner)
 
-while True:
+@list_commands.register(Command.SHOW)
+def list_show(session: Session, command: ParsedCommand):
+    """show items of the shopping list."""
+    show_list(session.shopping_list)
 
-    while True:
-        print("if you have account, Please login. Or create an account.")
-        print("For quit the app, Enter 'quit' .")
-        ask_user_to_login = input("Login / Create: ").strip().lower()
 
-        if ask_user_to_login == 'login':
-            break
+# Commands of store mode
 
-        elif ask_user_to_login == 'create':
-            logger.info("User Entered create account state.")
-            clear_screen()
-            print("Creating new Account...")
-            new_username = input("Username: ").strip().lower()
-            new_password = input("Password: ").strip().lower()
-            if create_account(new_username,
-                              new_password,
-                              users):
-                logger.info(f"An account has been created. USERNAME: {new_username}") # noqa E501
+
+def store_item(session: Session, command: ParsedCommand):
+    """add product to the cart: <name> [amount]"""
+    product_name = command.verb
+    # if user input is in Products keys (name of the products)
+    if product_name not in context.products or len(command.arguments) > 1:
+        print(
+            f"""'{command.text}' is not available in store.
+            check products by 'products' command.""")
+        similar = suggestions(context.products, product_name)
+        if similar:
+            print(f"Did you mean: {', '.join(similar)}?")
+        return
+    session.log.info("User: %s Selected 'item:%s'", session.username, product_name, extra={'item': product_name}) # noqa E501
+    if command.arguments:
+        given_amount = command.arguments[0]
+    else:
+        given_amount = input(f"Enter the amount of '{product_name}'s that you want: ").strip() # noqa E501
+    if not given_amount.isdigit():
+        print("Wrong amount!")
+        return
+    preferred_amount = int(given_amount)
+    session.log.info("User: %s Selected 'amount':%s", session.username, preferred_amount, extra={'item': product_name, 'amount': preferred_amount}) # noqa E501
+    status = add_to_cart(session, product_name, preferred_amount)
+    if status == 'added':
+        session.log.info("User: %s Added %s %s to the cart.", session.username, preferred_amount, product_name, extra={'item': product_name, 'amount': preferred_amount}) # noqa E501
+        clear_screen()
+        print(f"{preferred_amount} '{product_name}' Has been added successfully.") # noqa E501
+        print("Has been added successfully.")
+    elif status == 'no stock':
+        print(f"""
+    Sorry!
+    We don't have {preferred_amount} of {product_name} in stock.
+        """)
+    else:
+        print(f"""
+    You havn't enough money for {preferred_amount} {product_name}'s.
+    * You can use 'addmoney' command for increasing your balance.
+        """)
+
+
+store_commands = CommandTable(default=store_item)
+
+
+@store_commands.register(Command.EXIT)
+def store_exit(session: Session, command: ParsedCommand):
+    """leave store mode (quit the program if cart isn't empty)."""
+    if not session.choosen_items:
+        return LEAVE
+    clear_screen()
+    print("Your cart will be kept for your next login. Are you sure?")
+    exit_confirmation = input("Enter <yes> if you want to exit: ")
+    if exit_confirmation.strip().lower() == 'yes':
+        release_cart(session)
+        print("Hope you come back soon. Have a nice day.")
+        return QUIT  # Exit the program
+    print("Canceled.")
+
+
+@store_commands.register(Command.LOGOUT)
+def store_logout(session: Session, command: ParsedCommand):
+    """logout (items of cart go back to the stock)."""
+    clear_screen()
+    user_logout_confirmation = input("Are you sure you want to logout? ").strip().lower() # noqa E501
+    if user_logout_confirmation == 'yes':
+        release_cart(session)
+        clear_screen()
+        print("Logglogger out.")
+        session.log.info("User: %s Logged out.", session.username)
+        return LEAVE
+
+
+@store_commands.register(Command.ADDMONEY)
+def store_addmoney(session: Session, command: ParsedCommand):
+    """add money to the balance of user: addmoney [amount]"""
+    if command.arguments:
+        given_balance = command.arguments[0]
+    else:
+        given_balance = input("How much money you want to add? Enter: ").strip() # noqa E501
+    if not given_balance.lstrip('-').isdigit():
+        print("Wrong input!")
+        return
+    given_balance = int(given_balance)
+    if given_balance < 0:
+        session.log.warning("User: %s wrong input at addbalance: Input: %s", session.username, given_balance, extra={'amount': given_balance}) # noqa E501
+        print("Wrong input! You can't decrease your money!")
+        return
+    session.log.info("User: %s Added %s$ to his/her wallet.", session.username, given_balance, extra={'amount': given_balance}) # noqa E501
+    add_money(session, given_balance)
+
+
+@store_commands.register(Command.PRODUCTS)
+def store_products(session: Session, command: ParsedCommand):
+    """show the products page by page."""
+    clear_screen()
+    session.pager = products_pager(
+        context.products, "***** List of our products ***** \n"
+        )
+    session.pager.show(1)
+
+
+@store_commands.register(Command.CATEGORY)
+def store_category(session: Session, command: ParsedCommand):
+    """show the products of a category: category [name]"""
+    clear_screen()
+    if command.arguments:
+        category = ' '.join(command.arguments)
+    else:
+        category = input("Category: ")
+    session.log.info("User: %s | input:'%s'", session.username, category)
+    session.pager = products_pager(
+        context.products, f"***** {category} *****\n", category
+        )
+    session.pager.show(1)
+    session.log.info("User: %s| Showing %s category.", session.username, category) # noqa E501
+
+
+@store_commands.register(Command.SEARCH)
+def store_search(session: Session, command: ParsedCommand):
+    """search products by name or category (typos are found): search <text>"""
+    if not command.arguments:
+        print("Wrong Input!. Check this --> <search> <text> .")
+        return
+    text = ' '.join(command.arguments)
+    found = search_products(context.products, text)
+    session.log.info("User: %s| Searched '%s': %s results.", session.username, text, len(found)) # noqa E501
+    if not found:
+        print(f"Nothing found for '{text}'.")
+        return
+    session.pager = Pager(
+        lambda start: product_rows(islice(found, start, None), context.products), # noqa E501
+        len(found),
+        header=f"***** search: {text} *****\n"
+        )
+    session.pager.show(1)
+
+
+@store_commands.register(Command.HISTORY)
+def store_history(session: Session, command: ParsedCommand):
+    """show the purchases of user page by page (newest first)."""
+    clear_screen()
+    username = session.username
+    total_orders = context.ledger.count(username)
+    session.log.info("User: %s | Showing history (%s orders).", username, total_orders) # noqa E501
+    if not total_orders:
+        print("You haven't bought anything yet.\n")
+        return
+    session.pager = Pager(
+        lambda start: order_rows(context.ledger.orders(username, start), start), # noqa E501
+        total_orders,
+        header="***** Your purchases ***** \n"
+        )
+    session.pager.show(1)
+
+
+@store_commands.register(Command.LOWSTOCK)
+def store_lowstock(session: Session, command: ParsedCommand):
+    """show low products and their restock plan (admins)."""
+    if not is_admin(session.username):
+        print("Only admins can use this command.")
+        return
+    clear_screen()
+    plan = context.stock_monitor.restock_plan()
+    session.log.info("User: %s | Showing low stock (%s products).", session.username, len(plan)) # noqa E501
+    if not plan:
+        print("No product is low in stock.\n")
+        return
+    session.pager = Pager(
+        lambda start: stock_rows(islice(plan, start, None), start),
+        len(plan),
+        header="***** Low stock (restock plan) ***** \n",
+        footer="('restock all' adds the whole plan)"
+        )
+    session.pager.show(1)
+
+
+@store_commands.register(Command.RESTOCK)
+def store_restock(session: Session, command: ParsedCommand):
+    """add stock of product (admins): restock <name> <amount> / restock all"""
+    if not is_admin(session.username):
+        print("Only admins can use this command.")
+        return
+    arguments = command.arguments
+    if arguments == ('all',):
+        plan = [(name, restock) for name, _, restock
+                in context.stock_monitor.restock_plan() if restock > 0]
+    elif len(arguments) == 2 and arguments[0] in context.products \
+            and arguments[1].isdigit() and int(arguments[1]) > 0:
+        plan = [(arguments[0], int(arguments[1]))]
+    else:
+        print("Wrong Input!. Check this --> <restock> <name> <amount> .")
+        return
+    if not plan:
+        print("No product is low in stock.")
+        return
+    restock(plan)
+    session.log.info("User: %s Restocked %s products.", session.username, len(plan)) # noqa E501
+    for name, amount in plan:
+        print(f"{amount} '{name}' added, {product_amount(name)} in stock.")
+
+
+@store_commands.register(Command.PAGE)
+def store_page(session: Session, command: ParsedCommand):
+    """show page N of last listing: page <number>"""
+    if len(command.arguments) != 1:
+        print("Wrong Input!. Check this --> <page> <number> .")
+        return
+    page_number = command.arguments[0]
+    if session.pager is None:
+        print("Nothing to show. use 'products', 'category' or 'show' first.") # noqa E501
+    elif not (page_number.isdigit() and
+              session.pager.show(int(page_number))):
+        print(f"There isn't page {page_number}.")
+
+
+@store_commands.register(Command.NEXT)
+def store_next(session: Session, command: ParsedCommand):
+    """show next page of last listing."""
+    if session.pager is None or not session.pager.next():
+        print("There isn't more pages.")
+
+
+@store_commands.register(Command.DELETE)
+def store_delete(session: Session, command: ParsedCommand):
+    """delete item from the cart: delete <product name>"""
+    if len(command.arguments) != 1:
+        print("Wrong Input!. Check this --> <Delete> <product name> .")
+        return
+    pure_item_name = command.arguments[0]
+    session.log.info("User: %s Trying to delete: %s", session.username, pure_item_name, extra={'item': pure_item_name}) # noqa E501
+    # if item was exist and has been deleted successfully
+    if delete_from_cart(session, pure_item_name):
+        session.log.info("User: %s Deleted item: %s", session.username, pure_item_name, extra={'item': pure_item_name}) # noqa E501
+        print(f"'{pure_item_name}' has been fully deleted successfully.")
+    else:
+        print(f"{pure_item_name} is not in the shopping list.")
+
+
+@store_commands.register(Command.ORDER)
+def store_order(session: Session, command: ParsedCommand):
+    """set the order of cart: order <order name>"""
+    # if it was pure Order command:
+    if not command.arguments:
+        clear_screen()
+        print("in case of using order command, see the help. enter <help>")
+        return
+    session.log.info("User: %s: Command: 'order'", session.username)
+    session.order = command.arguments[0]
+    if session.order in ORDERS:
+        print(f"your list order will be shown by '{session.order}'.")
+    else:
+        session.log.warning("User: %s |Invalid order type: %s", session.username, session.order) # noqa E501
+        print("invalid order.")
+        session.order = 'default'  # set the order to the default
+
+
+@store_commands.register(Command.SHOW)
+def store_show(session: Session, command: ParsedCommand):
+    """show the cart page by page."""
+    session.log.info("User: %s | Showing Cart.", session.username)
+    if session.choosen_items:
+        session.pager = cart_pager(session.choosen_items, session.order)
+        session.pager.show(1)
+    else:
+        print("Oops! Your cart is empty.\n")
+
+
+@store_commands.register(Command.BUY)
+def store_buy(session: Session, command: ParsedCommand):
+    """buy the cart (with or without discount code)."""
+    clear_screen()
+    if not session.choosen_items:
+        print("Your shopping Cart is empty.")
+        return
+    username = session.username
+    # calculating total price of items
+    total_price = session.choosen_items.total_price
+    print(f"You are paying {total_price} tomans")
+    while True:
+        have_discount_code = input("Do you have Discount code? ")
+        # if user have discount code
+        if have_discount_code.strip().lower() == 'yes':
+            discount_code = input("Enter Discount code: ").strip().lower()
+            session.log.info("User: %s Entered discount code:'%s'", username, discount_code) # noqa E501
+            code_status = context.discount_codes.check(discount_code)
+            # if the discount code is correct
+            if code_status == VALID:
+                percent = context.discount_codes[discount_code].percent
+                discount_price = capped_discount(discount_code, session.choosen_items) # noqa E501
                 clear_screen()
-                print(f"Your username: {new_username}")
-                print(f"Password: {new_password}")
-                print("\nPlease do not forget you account's information.")
-                users = load_users_database()
-                print("\nACCOUNT HAS BEEN CREATED SUCCESSFULLY.")
-                break
+                print(f"You have {percent}% OFF!")
+                print(f"total price has been decreased {discount_price} tomans.") # noqa E501
+                print("____________________________")
+                show_cart(session.choosen_items, session.order)
+                print("==============================================")
+                print(f"Final price: {total_price - discount_price} | {percent}% OFF") # noqa E501
+                buy_confirmation = input("Enter 'Finish' to buy items (you can 'Cancel' anytime.): ")  # noqa E501
+                if buy_confirmation.strip().lower() == 'finish':
+                    session.log.info("User: %s Finished the buy.", username) # noqa E501
+                    purchase = finish_purchase(session, discount_code)
+                    if purchase != 'done':
+                        print(PURCHASE_ERRORS[purchase])
+                        return
+                    session.log.info("User: %s Has been logged out.", username) # noqa E501
+                    clear_screen()
+                    print("Thanks for your Purchase.")
+                    return LEAVE
+                elif buy_confirmation.strip().lower() == 'cancel':
+                    session.log.info("User: %s Canceled the buy.", username) # noqa E501
+                    return
+            elif code_status == EXPIRED:
+                print("This code has been expired!")
+            elif code_status == USED_UP:
+                print("This code can't be used anymore!")
             else:
-                logger.warning(f"Trying to create an taken username: {new_username}") # noqa E501
+                print("Incorrect code!")
+        # if user havn't discount code
+        elif have_discount_code.strip().lower() == 'no':
+            session.log.info("User: %s Havn't Discount code.", username)
+            clear_screen()
+            show_cart(session.choosen_items)
+            buy_confirmation = input("Enter 'Finish' to buy items (you can 'Cancel' anytime.): ")  # noqa E501
+            session.log.info("User: %s | input:'%s'", username, buy_confirmation) # noqa E501
+            if buy_confirmation.strip().lower() == 'finish':
+                session.log.info("User: %s Finished the buy.", username)
+                purchase = finish_purchase(session)
+                if purchase != 'done':
+                    print(PURCHASE_ERRORS[purchase])
+                    return
                 clear_screen()
-                print("This username is already taken.")
+                print("Thanks for your Purchase.")
+                return LEAVE
+            elif buy_confirmation.strip().lower() == 'cancel':
+                session.log.info("User: %s Canceled the buy.", username)
+                print("Canceled.")
+                return
+        else:
+            session.log.warning("User: %s| Invalid input: %s", username, have_discount_code) # noqa E501
+            print("ERROR! Invalid input.")
 
-        elif ask_user_to_login in ('q', 'quit', 'ex', 'exit'):
-            logger.info("Quited from app in login state.")
-            print("Quited.")
-            exit()
 
-        else:
-            logger.warning(f"Wrong input in login state: {ask_user_to_login}")
-            print('WRONG INPUT!')
-    # User authenication (Login Feature)
-
-    user_logged_in = False
-
-    while user_logged_in is False:
-        logger.info("Entered in login page.")
-        print("Login to your Account...")
-        # stripped and lowercased version of given username and password
-        username = (input("Username: ").strip()).lower()
-        logger.info("User trying to login.")
-        password = (input("Password: ").strip()).lower()
-        # if authenication was successfully
-        if is_authenticated(username, password, users):
-            clear_screen()
-            logger.info(f"User {username} logged in.")
-            user_logged_in = True
-            print(f'Hello {username}! Welcome back.')
-            break
-        else:
-            logger.warning("Incorrect Username/Pass combination Entered.")
-            clear_screen()
-            print("username / password combination is incorrect.")
-            print("Try again.")
+# Commands of both modes
 
-    # Catching user balance from the USERS Database
-    user_balance = users.get(username)['balance']
-    first_balance = user_balance
 
-    # Choose mode of program
+@list_commands.register(Command.STATS)
+@store_commands.register(Command.STATS)
+def stats_command(session: Session, command: ParsedCommand):
+    """latency of commands and storage."""
+    print(metrics.report())
+
+
+@list_commands.register(Command.HELP)
+@store_commands.register(Command.HELP)
+def help_command(session: Session, command: ParsedCommand):
+    """show the help of program."""
+    session.log.info("User: %s | Showing help.", session.username)
+    clear_screen()
+    show_help()
+
+
+def main():
+    """Run the shopping list program. (login loop and modes)"""
+    configure_logging()
+    # items of carts are released after the hold time
+    context.reservations.start_sweeper()
+    # metrics are dumped periodically (SHOPPING_LIST_METRICS_FILE)
+    metrics.start_dumper()
+
+    clear_screen()
+
+    # Starting message (loaded from ./message_files/banner.txt)
+    print(message('banner'))
+
     while True:
-        mode = (
-            input("Choose mode ('store' / 'list') : ")
-                ).strip().lower()
-        # Check if user input for mode is correct.
-        if mode not in ('store', 'list'):
-            logger.warning(f"Wrong input in selecting mode state. Input: {mode}") # noqa E501
-            print("Wrong input!")
-        else:
-            logger.info(f"User {username} Entered '{mode}' mode.")
-            clear_screen()
-            break
 
-    # While shopping list program is running. <LIST MODE>
-    while (mode == 'list') and (user_logged_in is True):
-        print(mode_status())
-        # striped version of input
-        user_input = input("Enter product like this '<name> <price> <amount>': ").strip().lower() # noqa E501
-        clear_screen()
+        while True:
+            print("if you have account, Please login. Or create an account.")
+            print("For quit the app, Enter 'quit' .")
+            ask_user_to_login = input("Login / Create: ").strip().lower()
 
-        # EXIT command
-        if user_input in Command.EXIT.value:
-            if choosen_items:  # If choosen_items isn't empty
-                print("Your shopping list items:\n")
-                show_list(choosen_items)
-            break  # Exit the loop
-
-        # DELETE command
-        elif (user_input).startswith(Command.DELETE.value):
-            while True:
-                if len(user_input.split()) < 1:   # checking input format
-                    print("Wrong Input!. Check this --> <Delete> <product name> .") # noqa E501
-                else:
-                    # scrape pure item name from user_input
-                    pure_item_name = ((user_input.split())[1])
-                    # if item was exist and has been deleted successfully
-                    if remove_item(pure_item_name, choosen_items):
-                        print(f"""
-                        '{pure_item_name}' has been fully deleted successfully.
-                        """)
-                        show_list(choosen_items)
-                        break
-                    else:
-                        print(f"{pure_item_name} is not in the shopping list.")
-                        break
-
-        # HELP command
-        elif user_input == Command.HELP.value:
-            clear_screen()
-            show_help()
+            if ask_user_to_login == 'login':
+                break
 
-        # SHOW items
-        elif user_input == Command.SHOW.value:
-            show_list(choosen_items)
+            elif ask_user_to_login == 'create':
+                logger.info("User Entered create account state.")
+                clear_screen()
+                print("Creating new Account...")
+                new_username = input("Username: ").strip().lower()
+                new_password = input("Password: ").strip().lower()
+                if create_account(new_username,
+                                  new_password,
+                                  context.users):
+                    logger.info("An account has been created. USERNAME: %s", new_username, extra={'user': new_username}) # noqa E501
+                    clear_screen()
+                    print(f"Your username: {new_username}")
+                    print(f"Password: {new_password}")
+                    print("\nPlease do not forget you account's information.")
+                    context.users = load_users_database()
+                    print("\nACCOUNT HAS BEEN CREATED SUCCESSFULLY.")
+                    break
+                else:
+                    logger.warning("Trying to create an taken username: %s", new_username) # noqa E501
+                    clear_screen()
+                    print("This username is already taken.")
 
-        # checking user input format for adding item to the shopping list
-        elif len(user_input.split()) != 3:
-            print(input("WRONG FORMAT! Hit enter to continue..."))
+            elif ask_user_to_login in ('q', 'quit', 'ex', 'exit'):
+                logger.info("Quited from app in login state.")
+                print("Quited.")
+                return
 
-        # add item to shopping list
-        else:
-            product_name = (user_input.split())[0]
-            price = int((user_input.split())[1])
-            amount = int((user_input.split())[2])
-            if product_name in choosen_items:
-                print(f"{amount}  '{product_name}' is already in shopping list.") # noqa E501
             else:
-                choosen_items[product_name] = [price, amount]
-                print(f"""
-                {amount}  '{product_name}' has been added to shopping list.
-                """)
-
-    # while the Online shop program is running  <STORE MODE>
-    while (mode == 'store') and (user_logged_in is True):
-        # Getting input from user
-        print(f"({username})", f"$$ {user_balance} tomans", mode_status())
-        # striped version of input
-        user_input = (input("\nEnter name of product: ").strip()).lower()
-        clear_screen()
-        logger.info(f"User: {username}| Command: '{user_input}'")
-        # EXIT command
-        if user_input in Command.EXIT.value:
-            if choosen_items:  # If choosen_items isn't empty
+                logger.warning("Wrong input in login state: %s", ask_user_to_login) # noqa E501
+                print('WRONG INPUT!')
+        # User authenication (Login Feature)
+
+        user_logged_in = False
+
+        while user_logged_in is False:
+            logger.info("Entered in login page.")
+            print("Login to your Account...")
+            # stripped and lowercased version of given username and password
+            username = (input("Username: ").strip()).lower()
+            logger.info("User trying to login.")
+            password = (input("Password: ").strip()).lower()
+            status = login_status(username, password, context.users)
+            # if authenication was successfully
+            if status == OK:
                 clear_screen()
-                print("you'll leave everything unsaved. Are you sure?")
-                exit_confirmation = input("Enter <yes> if you want to exit: ")
-                if exit_confirmation.strip().lower() == 'yes':
-                    print("Hope you come back soon. Have a nice day.")
-                    exit()  # Exit the program
-                else:
-                    print("Canceled.")
+                logger.info("User %s logged in.", username, extra={'user': username}) # noqa E501
+                user_logged_in = True
+                print(f'Hello {username}! Welcome back.')
+                break
+            elif status == LIMITED:
+                logger.warning("Too many login attempts of %s.", username)
+                clear_screen()
+                print("Too many login attempts. Please wait a moment.")
             else:
+                logger.warning("Incorrect Username/Pass combination Entered.")
+                metrics.increment('login.failed')
+                clear_screen()
+                print("username / password combination is incorrect.")
+                print("Try again.")
+
+        # Catching user balance from the USERS Database
+        session = Session(username, context.users.get(username)['balance'])
+
+        # Choose mode of program
+        while True:
+            mode = (
+                input("Choose mode ('store' / 'list') : ")
+                    ).strip().lower()
+            # Check if user input for mode is correct.
+            if mode not in ('store', 'list'):
+                session.log.warning("Wrong input in selecting mode state. Input: %s", mode) # noqa E501
+                print("Wrong input!")
+            else:
+                session.log.info("User %s Entered '%s' mode.", username, mode)
+                session.mode = mode
+                clear_screen()
                 break
 
-        elif user_input in Command.LOGOUT.value:
-            clear_screen()
-            user_logout_confirmation = input("Are you sure you want to logout? ").strip().lower() # noqa E501
-            if user_logout_confirmation == 'yes':
+        # saved cart / shopping list of user (only the file of this user)
+        if mode == 'store':
+            failed = restore_cart(session)
+            if session.choosen_items:
+                print(f"Your cart has been restored ({len(session.choosen_items)} items).") # noqa E501
+            for product_name, status in failed.items():
+                print(f"'{product_name}' couldn't be added again ({status}).") # noqa E501
+        else:
+            restore_list(session)
+            if session.shopping_list:
+                print(f"Your shopping list has been restored ({len(session.shopping_list)} items).") # noqa E501
+
+        # profile of session (SHOPPING_LIST_PROFILE)
+        with session_profile(username):
+            # While shopping list program is running. <LIST MODE>
+            while (mode == 'list') and (user_logged_in is True):
+                print(mode_status(mode))
+                # striped version of input
+                user_input = input("Enter product like this '<name> <price> <amount>': ").strip().lower() # noqa E501
                 clear_screen()
-                print("Logglogger out.")
-                user_logged_in = False
-                logger.info(f"User: {username} Logged out.")
-                break
 
-        # AddBalance will add preferred balance to user_balance
-        elif user_input in Command.ADDMONEY.value:
-            given_balance = int(input("How much money you want to add? Enter: ")) # noqa E501
-            while True:
-                if given_balance < 0:
-                    logger.warning(f"User: {username} wrong input at addbalance: Input: {given_balance}") # noqa E501
-                    print("Wrong input! You can't decrease your money!")
-                else:
-                    logger.info(f"User: {username} Added {given_balance}$ to his/her wallet.") # noqa E501
-                    user_balance += given_balance
-                    first_balance = user_balance
-                    # assining new balance to users database
-                    update_user_balance(user_balance, username, users)
+                if run_script(list_commands, session, user_input) == LEAVE:
                     break
 
-        # PRODUCTS command
-        elif user_input in Command.PRODUCTS.value:
-            clear_screen()
-            print("***** List of our products ***** \n")
-            for name, info in products.items():
-                print(f"Name: {name.capitalize()} | Price: {info['price']} tomans | {info['amount']} in stock")  # noqa E501
-                print("______________________________________________________")
-        # Category command: show the products to user by category
-        elif user_input in Command.CATEGORY.value:
-            clear_screen()
-            category = input("Category: ")
-            logger.info(f"User: {username} | input:'{given_balance}'")
-            for name, info in products_by_category(category, products).items():
-                print(f"Name: {name.capitalize()} | Price: {info['price']} tomans | {info['amount']} in stock")  # noqa E501
-                print("______________________________________________________")
-            logger.info(f"User: {username}| Showing {category} category.")
-        # DELETE command
-        elif (user_input).startswith(Command.DELETE.value):
-            # scrape pure item name from user_input
-            pure_item_name = ((user_input.split())[1])
-            logger.info(f"User: {username} Trying to delete: {pure_item_name}") # noqa E501
-            # Last parameter is the amount of product
-            #  that user have in his/her shopping list.
-            user_balance = refund(
-                user_balance,
-                product_price(pure_item_name),
-                choosen_items[pure_item_name]
-                )
-            # if item was exist and has been deleted successfully
-            if remove_item(pure_item_name, choosen_items):
-                logger.info(f"User: {username} Deleted item: {pure_item_name}") # noqa E501
-                print(f"'{pure_item_name}' has been fully deleted successfully.") # noqa E501
-            else:
-                print(f"{pure_item_name} is not in the shopping list.")
-        # ^^^^
-        # Order command
-        elif len(user_input.split()) > 1:
-            if (user_input.split())[0] == 'order':
-                logger.info(f"User: {username}: Command: 'order'")
-                order = (user_input.split())[1]
-                if order == 'amount':
-                    print("your list order will be shown by 'amount'.")
-                elif order == 'name':
-                    print("your list order will be shown by 'name'.")
-                elif order == 'default':
-                    print("your list order is now on 'default'.")
-                else:
-                    logger.warning(f"User: {username} |Invalid order type: {order}") # noqa E501
-                    print("invalid order.")
-                    order = 'default'  # set the order to the default
-        # if it was pure Order command:
-        elif user_input == 'order':
-            clear_screen()
-            print("in case of using order command, see the help. enter <help>")
-
-        # SHOW items
-        elif user_input == Command.SHOW.value:
-            logger.info(f"User: {username} | Showing Cart.")
-            # if the order is set to 'amount', show the cart by amount
-            if order == 'amount':
-                show_cart(order_by_amount(choosen_items), order)
-            # if the order is set to 'name', show the cart by name
-            elif order == 'name':
-                show_cart(order_by_name(choosen_items), order)
-            else:
-                show_cart(choosen_items, order)
+            # while the Online shop program is running  <STORE MODE>
+            while (mode == 'store') and (user_logged_in is True):
+                # Getting input from user
+                print(f"({username})", f"$$ {session.balance} tomans", mode_status(mode)) # noqa E501
+                # striped version of input
+                user_input = (input("\nEnter name of product: ").strip()).lower() # noqa E501
+                clear_screen()
+                signal = run_script(store_commands, session, user_input)
+                if signal == QUIT:
+                    return  # Exit the program
+                if signal == LEAVE:
+                    break
 
-        # HELP command
-        elif user_input == Command.HELP.value:
-            logger.info(f"User: {username} | Showing help.")
-            clear_screen()
-            show_help()
 
-        # BUY command
-        elif user_input == Command.BUY.value:
-            clear_screen()
-            if choosen_items:
-                # calculating total price of items
-                total_price = first_balance - user_balance
-                print(f"You are paying {total_price} tomans")
-                while True:
-                    have_discount_code = input("Do you have Discount code? ")
-                    # if user have discount code
-                    if have_discount_code.strip().lower() == 'yes':
-                        discount_code = input("Enter Discount code: ").strip().lower() # noqa E501
-                        logger.info(f"User: {username} Entered discount code:'{discount_code}'") # noqa E501
-                        # if the discount code is correct
-                        if discount_code in DISCOUNT_CODE_DATABASE:
-                            # calculating discount price useing discount() function # noqa E501
-                            discount_price = discount(discount_code,
-                                                      total_price,
-                                                      DISCOUNT_CODE_DATABASE)
-                            # if the discount price is more than 300,000 tomans. # noqa E501
-                            # set the discount price to 300,000.
-                            # because user shouln't have more than 300,000 tomans --> # noqa E501
-                            #   --> discount.
-                            if discount_price > 300000:
-                                discount_price = 300000
-                            clear_screen()
-                            print(f"You have {DISCOUNT_CODE_DATABASE[discount_code]}% OFF!")    # noqa E501
-                            print(f"total price has been decreased {discount_price} tomans.")   # noqa E501
-                            print("____________________________")
-                            show_cart(choosen_items, order)
-                            print("==============================================") # noqa E501
-                            print(f"Final price: {total_price - discount_price} | {DISCOUNT_CODE_DATABASE[discount_code]}% OFF") # noqa E501
-                            buy_confirmation = input("Enter 'Finish' to buy items (you can 'Cancel' anytime.): ")  # noqa E501
-                            if buy_confirmation.strip().lower() == 'finish':
-                                logger.info(f"User: {username} Finished the buy.") # noqa E501
-                                user_balance += discount_price
-                                update_user_balance(user_balance, username, users) # noqa E501
-                                update_products(products)
-                                user_logged_in = False
-                                logger.info(f"User: {username} Has been logged out.") # noqa E501
-                                clear_screen()
-                                print("Thanks for your Purchase.")
-                                break
-                            elif buy_confirmation.strip().lower() == 'cancel':
-                                logger.info(f"User: {username} Canceled the buy.") # noqa E501
-                                break
-                        else:
-                            print("Incorrect code!")
-                    # if user havn't discount code
-                    elif have_discount_code.strip().lower() == 'no':
-                        logger.info(f"User: {username} Havn't Discount code.")
-                        clear_screen()
-                        show_cart(choosen_items)
-                        buy_confirmation = input("Enter 'Finish' to buy items (you can 'Cancel' anytime.): ")  # noqa E501
-                        logger.info(f"User: {username} | input:'{buy_confirmation}'") # noqa E501
-                        if buy_confirmation.strip().lower() == 'finish':
-                            logger.info(f"User: {username} Finished the buy.")
-                            update_products(products)
-                            update_user_balance(user_balance, username, users)
-                            clear_screen()
-                            print("Thanks for your Purchase.")
-                            user_logged_in = False
-                            break
-                        elif buy_confirmation.strip().lower() == 'cancel':
-                            logger.info(f"User: {username} Canceled the buy.")
-                            print("Canceled.")
-                            break
-                    else:
-                        logger.warning(f"User: {username}| Invalid input: {have_discount_code}") # noqa E501
-                        print("ERROR! Invalid input.")
-            else:
-                print("Your shopping Cart is empty.")
-        # procces of adding or removing product
-        else:
-            # if user input is in Products keys (name of the products)
-            if user_input in products.keys():
-                logger.info(f"User: {username} Selected 'item:{user_input}'")
-                preferred_amount = int(input(f"Enter the amount of '{user_input}'s that you want: ")) # noqa E501
-                logger.info(f"User: {username} Selected 'amount':{preferred_amount}") # noqa E501
-                # if user have enough money
-                if buy(user_balance, user_input, preferred_amount):
-                    # if decreasing from store finished correctly
-                    if decrease_stock(preferred_amount, user_input):
-                        user_balance = buy(
-                            user_balance,
-                            user_input,
-                            preferred_amount
-                            )
-                        add_item(user_input, preferred_amount, choosen_items)
-                        logger.info(f"User: {username} Added {preferred_amount} {user_input} to the cart.") # noqa E501
-                        clear_screen()
-                        print(f"{preferred_amount} '{user_input}' Has been added successfully.") # noqa E501
-                        print("Has been added successfully.")
-                    else:
-                        print(f"""
-                    Sorry!
-                    We don't have {preferred_amount} of {user_input} in stock.
-                        """)
-                else:
-                    print(f"""
-                You havn't enough money for {preferred_amount} {user_input}'s.
-                * You can use 'addmoney' command for increasing your balance.
-                    """)
-            else:
-                print(
-                    f"""'{user_input}' is not available in store.
-                    check products by 'products' command.""")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,819 @@
+import os
+import sys
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from binary_catalog import (
+    BinaryCatalog, build_binary_catalog, BINARY_CATALOG_PATH
+    )
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks (Windows): processes must not share the files
+    fcntl = None
+# Storage backends of shopping list (users and products databases)
+
+# Paths of JSON databases
+USERS_DATABASE_PATH = './json_files/users.json'
+PRODUCTS_DATABASE_PATH = './json_files/products.json'
+
+# Path of SQLite database (used by 'sqlite' backend)
+SQLITE_DATABASE_PATH = os.environ.get(
+    'SHOPPING_LIST_DB', './json_files/shop.db'
+    )
+
+# Path of write-ahead journal (used by 'journal' backend)
+JOURNAL_PATH = os.environ.get(
+    'SHOPPING_LIST_JOURNAL', './json_files/journal.jsonl'
+    )
+
+# journal size (bytes) that starts the compaction into snapshot files
+JOURNAL_COMPACT_SIZE = int(
+    os.environ.get('SHOPPING_LIST_JOURNAL_COMPACT_SIZE', 1024 * 1024)
+    )
+
+# Name of storage backend ('json' / 'sqlite' / 'journal' / 'binary')
+STORAGE_BACKEND = os.environ.get('SHOPPING_LIST_STORAGE', 'json').lower()
+
+logger = logging.getLogger()
+
+
+class JSONStorage:
+    """
+    Storage backend that keeps each database in one JSON file.
+    every write rewrites the whole file (atomically).
+
+    many processes can share the files: every write locks the file
+    (fcntl), reads it again if another process has changed it (etag) and
+    merges the changes of this process into it. balances and amounts are
+    merged as differences (another purchase isn't lost), other fields
+    are overwritten only if this process has changed them.
+    """
+
+    def __init__(self, users_path: str = USERS_DATABASE_PATH,
+                 products_path: str = PRODUCTS_DATABASE_PATH):
+        self.users_path = users_path
+        self.products_path = products_path
+        # path -> (etag, records) as the file was last read / written
+        self.disk = dict()
+        # path -> records as this process has seen them (at load or at
+        # its last write), the base of merges
+        self.base = dict()
+
+    def _read(self, path: str) -> dict:
+        # the records of file, read again only if the file has changed
+        etag, records = self.disk.get(path, (None, None))
+        if etag is None or etag != file_etag(path):
+            with open(path, mode='r') as f:
+                records = json.load(f)
+            if etag is not None:
+                logger.info("%s has been changed by another process, merging.", path) # noqa E501
+            self.disk[path] = (file_etag(path), records)
+        return records
+
+    def _load(self, path: str) -> dict:
+        records = self._read(path)
+        self.base[path] = records
+        # callers get their own copy
+        return {key: dict(record) for key, record in records.items()}
+
+    def _merge(self, path: str, database, keys, counter: str) -> dict:
+        """
+        merge the records of given keys into the file (lock must be held).
+
+        Returns
+        -------
+        the merged records of file (not written yet)
+        """
+        disk = dict(self._read(path))
+        base = self.base.setdefault(path, dict())
+        for key in keys:
+            disk[key] = merge_record(
+                base.get(key), database[key], disk.get(key), counter
+                )
+        return disk
+
+    def _write(self, path: str, records: dict, database, keys):
+        write_json_atomic(path, records)
+        self.disk[path] = (file_etag(path), records)
+        # base isn't shared with the disk records anymore
+        base = self.base[path]
+        for key in keys:
+            base[key] = dict(database[key])
+
+    def load_users(self) -> dict:
+        """load / Reload users database."""
+        return self._load(self.users_path)
+
+    def load_products(self) -> dict:
+        """load / Reload products database."""
+        return self._load(self.products_path)
+
+    def create_user(self, username, users_database: dict) -> bool:
+        """
+        Save a new user.
+
+        Parameters
+        ----------
+        username : username of new user
+
+        users_database: dict : database of users (contains the new user)
+
+
+        Returns
+        -------
+        Return False if the username has been taken (by another process).
+        """
+        with file_locks(self.users_path):
+            if username in self._read(self.users_path):
+                return False
+            self._write_users(users_database, [username])
+        return True
+
+    def _write_users(self, users_database: dict, usernames):
+        usernames = list(usernames)
+        records = self._merge(
+            self.users_path, users_database, usernames, 'balance'
+            )
+        self._write(self.users_path, records, users_database, usernames)
+
+    def _write_products(self, products_database, names,
+                        check_stock: bool = False) -> bool:
+        names = list(names)
+        records = self._merge(
+            self.products_path, products_database, names, 'amount'
+            )
+        if check_stock and \
+                any(records[name]['amount'] < 0 for name in names):
+            # other processes have sold the stock
+            return False
+        self._write(self.products_path, records, products_database, names)
+        return True
+
+    def save_user(self, username, users_database: dict):
+        """
+        Save the record of given user.
+
+        Parameters
+        ----------
+        username : username of user
+
+        users_database: dict : database of users
+
+
+        Returns
+        -------
+
+        """
+        with file_locks(self.users_path):
+            self._write_users(users_database, [username])
+
+    def save_users(self, users_database: dict, usernames):
+        """
+        Save the records of given users in one write.
+
+        Parameters
+        ----------
+        users_database: dict : database of users
+
+        usernames : usernames of changed users
+
+
+        Returns
+        -------
+
+        """
+        with file_locks(self.users_path):
+            self._write_users(users_database, usernames)
+
+    def save_products(self, products_database: dict, names=None):
+        """
+        Save the products database.
+
+        Parameters
+        ----------
+        products_database: dict : database of products.
+
+        names : names of changed products (Default value = None)
+            None means every product may have been changed.
+
+
+        Returns
+        -------
+
+        """
+        if names is None:
+            names = list(products_database.keys())
+        with file_locks(self.products_path):
+            self._write_products(products_database, names)
+
+    def checkout(self, username, users_database: dict,
+                 products_database: dict, cart: dict) -> bool:
+        """
+        Save the balance of user and the stock of purchased products.
+
+        Parameters
+        ----------
+        username : username of buyer
+
+        users_database: dict : database of users
+
+        products_database: dict : database of products (stock already
+            decreased by the cart)
+
+        cart: dict : purchased items (name -> amount)
+
+
+        Returns
+        -------
+        Return True if the purchase has been saved, False if other
+        processes have sold the stock (nothing is saved in that case).
+        """
+        with file_locks(self.products_path, self.users_path):
+            if not self._write_products(
+                    products_database, cart.keys(), check_stock=True):
+                return False
+            self._write_users(users_database, [username])
+        return True
+
+    def close(self):
+        """nothing to release for JSON files."""
+
+
+def file_etag(path: str) -> tuple:
+    """
+    version of file (changes with every write of file).
+    atomic writes replace the file, so the inode changes too.
+    """
+    status = os.stat(path)
+    return status.st_ino, status.st_mtime_ns, status.st_size
+
+
+@contextmanager
+def file_locks(*paths):
+    """
+    Hold exclusive advisory locks (fcntl) of given files.
+    locks are taken in the same order in every process (no deadlock).
+    the lock of a file is a separate '.lock' file, because atomic writes
+    replace the file itself.
+    """
+    files = list()
+    try:
+        for path in sorted(set(paths)):
+            lock_file = open(f"{path}.lock", mode='a')
+            files.append(lock_file)
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+    finally:
+        # closing the file releases its lock
+        for lock_file in reversed(files):
+            lock_file.close()
+
+
+def merge_record(base, ours, theirs, counter: str) -> dict:
+    """
+    Three-way merge of one record.
+
+    Parameters
+    ----------
+    base : record as this process saw it (None if it's new)
+
+    ours : record of this process
+
+    theirs : record in file now (None if it isn't there)
+
+    counter : field that is merged as a difference ('balance' / 'amount')
+
+
+    Returns
+    -------
+    merged record
+    """
+    if base is None or theirs is None:
+        return dict(ours)
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if key == counter:
+            merged[key] = theirs[key] + (value - base[key])
+        elif value != base.get(key):
+            merged[key] = value
+    return merged
+
+
+def write_json_atomic(path: str, data: dict):
+    """
+    Write data to a temporary file and rename it over the given path,
+    so a crash in the middle of json.dump can't truncate the database.
+
+    Parameters
+    ----------
+    path: str : path of JSON file
+
+    data: dict : data that will be saved
+
+
+    Returns
+    -------
+
+    """
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, mode='w') as f:
+        # records of Catalog are mappings, they are written as objects
+        json.dump(data, f, indent=4, default=dict)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+class JournalStorage(JSONStorage):
+    """
+    Storage backend that appends every mutation as one line to a journal.
+    state is the last JSON snapshot plus replay of the journal.
+    a background thread folds the journal into fresh snapshots when it
+    grows bigger than `compact_size`.
+
+    journal records:
+        {"op": "create", "user": ..., "record": {...}}
+        {"op": "user", "user": ..., "record": {...}}
+        {"op": "balance", "user": ..., "balance": ...}
+        {"op": "product", "product": ..., "record": {...}}
+        {"op": "stock", "product": ..., "delta": ..., "amount": ...}
+    records hold the resulting values, so replaying them twice is harmless.
+    """
+
+    def __init__(self, users_path: str = USERS_DATABASE_PATH,
+                 products_path: str = PRODUCTS_DATABASE_PATH,
+                 journal_path: str = JOURNAL_PATH,
+                 compact_size: int = JOURNAL_COMPACT_SIZE):
+        super().__init__(users_path, products_path)
+        self.journal_path = journal_path
+        self.compact_size = compact_size
+        self.lock = threading.Lock()
+        self.compactor = None
+        # persisted state (snapshot + journal)
+        self.users = super().load_users()
+        self.products = dict(super().load_products())
+        # journal of an interrupted compaction is replayed first
+        for path in (f"{journal_path}.old", journal_path):
+            if os.path.exists(path):
+                self._replay(path)
+        self.journal = open(journal_path, mode='a')
+
+    def _replay(self, path: str):
+        with open(path, mode='r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # line of a crashed write
+                self._apply(record)
+
+    def _apply(self, record: dict):
+        op = record['op']
+        if op in ('create', 'user'):
+            self.users[record['user']] = dict(record['record'])
+        elif op == 'balance':
+            self.users[record['user']]['balance'] = record['balance']
+        elif op == 'product':
+            self.products[record['product']] = dict(record['record'])
+        elif op == 'stock':
+            self.products[record['product']]['amount'] = record['amount']
+
+    def _append(self, records: list):
+        with self.lock:
+            size = self._write_journal(records)
+        self._compact_if_big(size)
+
+    def _write_journal(self, records: list) -> int:
+        """
+        apply and append records (lock must be held).
+
+        Returns
+        -------
+        size of journal after the write
+        """
+        if records:
+            lines = ''.join(json.dumps(record) + '\n' for record in records)
+            for record in records:
+                self._apply(record)
+            self.journal.write(lines)
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+        return self.journal.tell()
+
+    def _compact_if_big(self, size: int):
+        if size > self.compact_size:
+            self.start_compaction()
+
+    def _user_records(self, username, users_database: dict) -> list:
+        record = users_database[username]
+        saved = self.users.get(username)
+        if saved is None:
+            return [{"op": "create", "user": username, "record": record}]
+        if saved['password'] != record['password']:
+            return [{"op": "user", "user": username, "record": record}]
+        if saved['balance'] != record['balance']:
+            return [{"op": "balance", "user": username,
+                     "balance": record['balance']}]
+        return []
+
+    def _product_records(self, products_database: dict, names) -> list:
+        records = list()
+        for name in names:
+            record = products_database[name]
+            saved = self.products.get(name)
+            if saved is None or \
+                    saved['category'] != record['category'] or \
+                    saved['price'] != record['price']:
+                records.append(
+                    {"op": "product", "product": name, "record": dict(record)}
+                    )
+            elif saved['amount'] != record['amount']:
+                records.append({
+                    "op": "stock",
+                    "product": name,
+                    "delta": record['amount'] - saved['amount'],
+                    "amount": record['amount']
+                    })
+        return records
+
+    def load_users(self) -> dict:
+        """load / Reload users database."""
+        with self.lock:
+            return {name: dict(record) for name, record in self.users.items()}
+
+    def load_products(self) -> dict:
+        """load / Reload products database."""
+        with self.lock:
+            return {
+                name: dict(record) for name, record in self.products.items()
+            }
+
+    def create_user(self, username, users_database: dict) -> bool:
+        """Append a new user. (see JSONStorage.create_user)"""
+        # the check and the write are one step, so a username can't be
+        # taken twice by concurrent sign-ups
+        with self.lock:
+            if username in self.users:
+                return False
+            size = self._write_journal(
+                self._user_records(username, users_database)
+                )
+        self._compact_if_big(size)
+        return True
+
+    def save_user(self, username, users_database: dict):
+        """Append the change of given user. (see JSONStorage.save_user)"""
+        self._append(self._user_records(username, users_database))
+
+    def save_users(self, users_database: dict, usernames):
+        """Append changes of given users. (see JSONStorage.save_users)"""
+        records = list()
+        for username in usernames:
+            records.extend(self._user_records(username, users_database))
+        self._append(records)
+
+    def save_products(self, products_database: dict, names=None):
+        """Append stock changes. (see JSONStorage.save_products)"""
+        if names is None:
+            names = list(products_database.keys())
+        self._append(self._product_records(products_database, names))
+
+    def checkout(self, username, users_database: dict,
+                 products_database: dict, cart: dict) -> bool:
+        """
+        Append the purchase as one write. (see JSONStorage.checkout)
+
+        Returns
+        -------
+        Return False if the saved stock isn't enough for the cart
+        (nothing is saved in that case).
+        """
+        with self.lock:
+            if any(name not in self.products or
+                   self.products[name]['amount'] < amount
+                   for name, amount in cart.items()):
+                return False
+            size = self._write_journal(
+                self._product_records(products_database, cart.keys()) +
+                self._user_records(username, users_database)
+                )
+        self._compact_if_big(size)
+        return True
+
+    def start_compaction(self):
+        """start the compaction in background (if it isn't running)."""
+        with self.lock:
+            if self.compactor is not None and self.compactor.is_alive():
+                return
+            self.compactor = threading.Thread(
+                target=self.compact, name='journal-compactor', daemon=True
+                )
+            self.compactor.start()
+
+    def compact(self):
+        """
+        Fold the journal into fresh users.json / products.json snapshots.
+        the journal is moved aside first, new mutations go to a new journal
+        while the snapshots are written.
+        """
+        old_journal_path = f"{self.journal_path}.old"
+        with self.lock:
+            self.journal.close()
+            os.replace(self.journal_path, old_journal_path)
+            self.journal = open(self.journal_path, mode='a')
+            users_snapshot = {
+                name: dict(record) for name, record in self.users.items()
+            }
+            products_snapshot = {
+                name: dict(record) for name, record in self.products.items()
+            }
+        write_json_atomic(self.users_path, users_snapshot)
+        write_json_atomic(self.products_path, products_snapshot)
+        os.remove(old_journal_path)
+
+    def close(self):
+        """wait for the compactor and close the journal."""
+        if self.compactor is not None:
+            self.compactor.join()
+        with self.lock:
+            self.journal.close()
+
+
+class SQLiteStorage:
+    """
+    Storage backend on an embedded SQLite database (WAL mode).
+    writes touch only the changed rows. stock is written as the change
+    since this process has read it (amount = amount + ?), so changes of
+    other processes aren't overwritten.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT NOT NULL,
+        balance REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS products (
+        name TEXT PRIMARY KEY,
+        category TEXT NOT NULL,
+        price INTEGER NOT NULL,
+        amount INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS products_category ON products (category);
+    """
+
+    def __init__(self, path: str = SQLITE_DATABASE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+        # name -> amount as this process has seen it (at load or at its
+        # last write), the base of stock changes
+        self.base = dict()
+
+    def load_users(self) -> dict:
+        """load / Reload users database."""
+        rows = self.connection.execute(
+            'SELECT username, password, balance FROM users'
+            )
+        return {
+            username: {"password": password, "balance": balance}
+            for username, password, balance in rows
+        }
+
+    def load_products(self) -> dict:
+        """load / Reload products database."""
+        rows = self.connection.execute(
+            'SELECT name, category, price, amount FROM products'
+            )
+        products = {
+            name: {"category": category, "price": price, "amount": amount}
+            for name, category, price, amount in rows
+        }
+        self.base = {
+            name: record['amount'] for name, record in products.items()
+        }
+        return products
+
+    def _upsert_user(self, username, record: dict):
+        self.connection.execute(
+            """INSERT INTO users (username, password, balance)
+            VALUES (?, ?, ?)
+            ON CONFLICT (username) DO UPDATE SET
+            password = excluded.password, balance = excluded.balance""",
+            (username, record['password'], record['balance'])
+            )
+
+    def _upsert_products(self, products_database: dict, names):
+        self.connection.executemany(
+            """INSERT INTO products (name, category, price, amount)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+            category = excluded.category, price = excluded.price,
+            amount = excluded.amount""",
+            (
+                (name,
+                 products_database[name]['category'],
+                 products_database[name]['price'],
+                 products_database[name]['amount'])
+                for name in names
+            )
+            )
+
+    def create_user(self, username, users_database: dict) -> bool:
+        """Insert a new user. (see JSONStorage.create_user)"""
+        record = users_database[username]
+        try:
+            with self.connection:
+                self.connection.execute(
+                    """INSERT INTO users (username, password, balance)
+                    VALUES (?, ?, ?)""",
+                    (username, record['password'], record['balance'])
+                    )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def save_user(self, username, users_database: dict):
+        """Save the row of given user. (see JSONStorage.save_user)"""
+        with self.connection:
+            self._upsert_user(username, users_database[username])
+
+    def save_users(self, users_database: dict, usernames):
+        """Save rows of given users. (see JSONStorage.save_users)"""
+        with self.connection:
+            for username in usernames:
+                self._upsert_user(username, users_database[username])
+
+    def _update_products(self, products_database, names):
+        # new products are inserted, the stock of known products is
+        # changed by the difference from base
+        for name in names:
+            record = products_database[name]
+            base = self.base.get(name)
+            if base is None:
+                self._upsert_products(products_database, [name])
+            else:
+                change = record['amount'] - base
+                cursor = self.connection.execute(
+                    """UPDATE products SET category = ?, price = ?,
+                    amount = amount + ? WHERE name = ? AND amount + ? >= 0""",
+                    (record['category'], record['price'], change, name, change)
+                    )
+                if cursor.rowcount != 1:
+                    logger.warning("Stock of %s hasn't been saved, other processes have sold it.", name, extra={'item': name}) # noqa E501
+            self.base[name] = record['amount']
+
+    def save_products(self, products_database: dict, names=None):
+        """Save rows of given products. (see JSONStorage.save_products)"""
+        if names is None:
+            names = list(products_database.keys())
+        with self.connection:
+            self._update_products(products_database, names)
+
+    def checkout(self, username, users_database: dict,
+                 products_database: dict, cart: dict) -> bool:
+        """
+        Save the purchase in a single transaction.
+        stock is decreased in the database itself, so purchases of other
+        processes are not overwritten. (see JSONStorage.checkout)
+
+        Returns
+        -------
+        Return False if the database hasn't enough stock for the cart
+        (nothing is saved in that case).
+        """
+        try:
+            with self.connection:
+                for name, amount in cart.items():
+                    cursor = self.connection.execute(
+                        """UPDATE products SET amount = amount - ?
+                        WHERE name = ? AND amount >= ?""",
+                        (amount, name, amount)
+                        )
+                    if cursor.rowcount != 1:
+                        raise sqlite3.IntegrityError(f'not enough {name}')
+                self._upsert_user(username, users_database[username])
+        except sqlite3.IntegrityError:
+            return False
+        for name in cart:
+            if name in self.base:
+                self.base[name] = products_database[name]['amount']
+        return True
+
+    def close(self):
+        """close the database connection."""
+        self.connection.close()
+
+
+class BinaryStorage(JSONStorage):
+    """
+    Storage backend that keeps users in JSON file and products in a
+    memory mapped binary catalog (see binary_catalog.py).
+    stock and prices of changed products are written in place, the file
+    is never rewritten.
+    """
+
+    def __init__(self, users_path: str = USERS_DATABASE_PATH,
+                 catalog_path: str = BINARY_CATALOG_PATH):
+        # writes of products lock the binary catalog
+        super().__init__(users_path, catalog_path)
+        self.catalog = None
+
+    def load_products(self) -> BinaryCatalog:
+        """open the binary catalog (only its header is read)."""
+        if self.catalog is not None:
+            self.catalog.close()
+        self.catalog = BinaryCatalog(self.products_path)
+        return self.catalog
+
+    def _write_products(self, products_database, names,
+                        check_stock: bool = False) -> bool:
+        # records are written in place, stock is merged with the file
+        if self.catalog is None:
+            self.load_products()
+        return self.catalog.products.write_fields(
+            products_database, names, check_stock
+            )
+
+    def close(self):
+        """close the binary catalog."""
+        if self.catalog is not None:
+            self.catalog.close()
+
+
+def migrate_json_to_sqlite(db_path: str = SQLITE_DATABASE_PATH,
+                           users_path: str = USERS_DATABASE_PATH,
+                           products_path: str = PRODUCTS_DATABASE_PATH):
+    """
+    Import the JSON databases into SQLite database.
+
+    Parameters
+    ----------
+    db_path: str : path of SQLite database
+
+    users_path: str : path of users JSON database
+
+    products_path: str : path of products JSON database
+
+
+    Returns
+    -------
+    the SQLite storage that contains the imported data.
+    """
+    source = JSONStorage(users_path, products_path)
+    target = SQLiteStorage(db_path)
+    users_database = source.load_users()
+    products_database = source.load_products()
+    with target.connection:
+        for username in users_database:
+            target._upsert_user(username, users_database[username])
+        target._upsert_products(products_database, products_database.keys())
+    return target
+
+
+def storage_backend(name: str = STORAGE_BACKEND):
+    """
+    Create the storage backend with given name.
+
+    Parameters
+    ----------
+    name: str : 'json', 'sqlite', 'journal' or 'binary'
+        (Default value = STORAGE_BACKEND)
+
+
+    Returns
+    -------
+    storage backend object.
+    """
+    if name == 'json':
+        return JSONStorage()
+    if name == 'sqlite':
+        # first run: import the JSON databases
+        if not os.path.exists(SQLITE_DATABASE_PATH):
+            return migrate_json_to_sqlite()
+        return SQLiteStorage()
+    if name == 'journal':
+        return JournalStorage()
+    if name == 'binary':
+        # first run: convert products.json
+        if not os.path.exists(BINARY_CATALOG_PATH):
+            with open(PRODUCTS_DATABASE_PATH, mode='r') as f:
+                build_binary_catalog(json.load(f), BINARY_CATALOG_PATH)
+        return BinaryStorage()
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+if __name__ == '__main__':
+    # python storage.py migrate [db_path]
+    if sys.argv[1:2] == ['migrate']:
+        path = sys.argv[2] if len(sys.argv) > 2 else SQLITE_DATABASE_PATH
+        migrate_json_to_sqlite(path).close()
+        print(f"JSON databases imported into {path}")
+    else:
+        print("usage: python storage.py migrate [db_path]")